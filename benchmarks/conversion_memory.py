@@ -0,0 +1,72 @@
+"""
+Compares the memory taken by the conversion of a markdown file when the renderables are
+created as they are laid out and when all of them are created beforehand.
+
+    python benchmarks/conversion_memory.py report.md
+
+Every mode runs in a new process, which reports its peak resident set size and, with
+--traced, the peak of the memory allocated by Python during the layout, as traced by
+tracemalloc (several times slower). The memory of lxml elements isn't traced, it's only
+included in the resident set size.
+"""
+import os
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from md2gost.parser_ import Parser  # noqa: E402
+from md2gost.renderer import Renderer  # noqa: E402
+from md2gost.template_cache import load_template  # noqa: E402
+
+_MODES = ("streamed", "eager")
+
+
+def _convert(filename: str, template: str, mode: str, traced: bool):
+    with open(filename, encoding="utf-8") as f:
+        text = f.read()
+    document = load_template(template)
+    parser = Parser(document, text)
+    renderer = Renderer(document)
+
+    if traced:
+        tracemalloc.start()
+    start = time.perf_counter()
+    renderables = parser.parse()
+    if mode == "eager":
+        renderables = list(renderables)
+    renderer.process(renderables)
+    elapsed = time.perf_counter() - start
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # KiB on Linux
+    report = f"{mode}: {renderer.page_count} pages, peak RSS {max_rss / 1024:.0f} MiB, {elapsed:.2f} s"
+    if traced:
+        report += f", traced peak {tracemalloc.get_traced_memory()[1] / 2 ** 20:.1f} MiB"
+    print(report)
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("filename")
+    parser.add_argument("-t", "--template", default=os.path.join(os.path.dirname(__file__), "..", "md2gost",
+                                                                 "Template.docx"))
+    parser.add_argument("--mode", choices=_MODES, help="converts in this process in the mode")
+    parser.add_argument("--traced", action="store_true", help="traces the memory allocated by Python")
+    args = parser.parse_args()
+
+    os.environ["WORKING_DIR"] = os.path.dirname(os.path.abspath(args.filename))
+    if args.mode:
+        _convert(args.filename, args.template, args.mode, args.traced)
+        return
+
+    for mode in _MODES:
+        subprocess.run([sys.executable, __file__, args.filename, "-t", args.template, "--mode", mode]
+                       + (["--traced"] if args.traced else []), check=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Measures the memory taken by the layout records during the pagination of a markdown file.
+
+    python benchmarks/layout_records.py report.md
+
+Reports the size of one LayoutState, RenderedInfo and SubRenderable, the peak memory allocated
+by Renderer per top level renderable above the memory before it, the memory the layout
+takes after the pagination, as traced by tracemalloc, and the time of the pagination without tracing.
+"""
+import os
+import sys
+import time
+import tracemalloc
+from argparse import ArgumentParser
+from copy import copy
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from docx.shared import Mm  # noqa: E402
+
+from md2gost.layout_tracker import LayoutState  # noqa: E402
+from md2gost.parser_ import Parser  # noqa: E402
+from md2gost.renderable.page_break import PageBreak  # noqa: E402
+from md2gost.rendered_info import RenderedInfo  # noqa: E402
+from md2gost.renderer import Renderer  # noqa: E402
+from md2gost.sub_renderable import SubRenderable  # noqa: E402
+from md2gost.template_cache import load_template  # noqa: E402
+
+
+def _size(create, count: int = 10000) -> float:
+    """Returns the memory taken by one of the objects created by create"""
+    tracemalloc.start()
+    objects = [create() for _ in range(count)]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (size - sys.getsizeof(objects)) / len(objects)
+
+
+def _record_sizes() -> dict[str, float]:
+    state = LayoutState(Mm(297), Mm(210))
+    document = load_template(None)
+    renderable = PageBreak(document._body)
+    height = Mm(1)
+    return {
+        "LayoutState": _size(lambda: copy(state)),
+        "RenderedInfo": _size(lambda: RenderedInfo(document, height)),
+        "SubRenderable": _size(lambda: SubRenderable(renderable, True)),
+    }
+
+
+def _lay_out(text: str, template: str, traced: bool) -> tuple[float, int, int]:
+    """
+    Returns the time of the pagination, the peak memory allocated per renderable on average and
+    the memory taken after the pagination, the latter two if traced
+    """
+    document = load_template(template)
+    renderables = list(Parser(document, text).parse())
+    renderer = Renderer(document)
+
+    if traced:
+        tracemalloc.start()
+    allocated = 0
+    start = time.perf_counter()
+    for renderable in renderables:
+        if traced:
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        renderer.render(renderable)
+        if traced:
+            allocated += tracemalloc.get_traced_memory()[1] - before
+    renderer.process([])
+    elapsed = time.perf_counter() - start
+
+    retained = 0
+    if traced:
+        retained = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+    return elapsed, allocated // len(renderables), retained
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("filename")
+    parser.add_argument("-t", "--template", default=os.path.join(os.path.dirname(__file__), "..", "md2gost",
+                                                                 "Template.docx"))
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    os.environ["WORKING_DIR"] = os.path.dirname(args.filename)
+    with open(args.filename, encoding="utf-8") as f:
+        text = f.read()
+
+    for name, size in _record_sizes().items():
+        print(f"{name}: {size:.0f} B")
+
+    _lay_out(text, args.template, False)  # measures the words and loads the fonts
+    elapsed = min(_lay_out(text, args.template, False)[0] for _ in range(args.repeat))
+    _, allocated, retained = _lay_out(text, args.template, True)
+    print(f"peak per renderable: {allocated / 1024:.1f} KiB")
+    print(f"taken after the pagination: {retained / 1024:.0f} KiB")
+    print(f"pagination: {elapsed:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
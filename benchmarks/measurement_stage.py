@@ -0,0 +1,76 @@
+"""
+Compares the layout of a markdown file with and without MeasurementStage.
+
+    python benchmarks/measurement_stage.py report.md -j 8
+
+Reports the time of the pagination (Renderer) alone and along with the stage, and the
+processor time of the stage's workers. On a machine with fewer cores than jobs the workers
+don't run at once, so the time of the stage there is also estimated as the time of this
+process plus the workers' processor time spread over the jobs.
+"""
+import os
+import sys
+import time
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from md2gost.measurement_stage import MeasurementStage  # noqa: E402
+from md2gost.parser_ import Parser  # noqa: E402
+from md2gost.renderable.paragraph_sizer import word_width_cache  # noqa: E402
+from md2gost.renderer import Renderer  # noqa: E402
+from md2gost.template_cache import load_template  # noqa: E402
+
+
+def _lay_out(text: str, template: str, jobs: int) -> tuple[float, float, float, float]:
+    """Returns the time of the stage, of its process and of its workers and the time of the pagination"""
+    # every run measures the words anew, as a single conversion does
+    word_width_cache.clear()
+    document = load_template(template)
+    renderables = list(Parser(document, text).parse())
+
+    children_before = os.times()
+    start, start_cpu = time.perf_counter(), time.process_time()
+    if jobs > 1:
+        MeasurementStage(document, template, jobs).process(renderables)
+    stage, stage_cpu = time.perf_counter() - start, time.process_time() - start_cpu
+    children = os.times()
+    workers_cpu = children.children_user + children.children_system \
+        - children_before.children_user - children_before.children_system
+
+    start = time.perf_counter()
+    Renderer(document).process(renderables)
+    return stage, stage_cpu, workers_cpu, time.perf_counter() - start
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("filename")
+    parser.add_argument("-t", "--template", default=os.path.join(os.path.dirname(__file__), "..", "md2gost",
+                                                                 "Template.docx"))
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count())
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    os.environ["WORKING_DIR"] = os.path.dirname(args.filename)
+    os.environ.setdefault("MEASUREMENT", "exact")
+    with open(args.filename, encoding="utf-8") as f:
+        text = f.read()
+
+    _lay_out(text, args.template, 1)  # loads the fonts and the template
+    sequential = min((_lay_out(text, args.template, 1) for _ in range(args.repeat)), key=lambda times: times[3])
+    staged = min((_lay_out(text, args.template, args.jobs) for _ in range(args.repeat)), key=sum)
+    stage, stage_cpu, workers_cpu, pagination = staged
+
+    print(f"pagination:                {sequential[3]:.2f} s")
+    print(f"stage, {args.jobs:>2} jobs:             {stage:.2f} s "
+          f"(this process {stage_cpu:.2f} s, workers {workers_cpu:.2f} s)")
+    print(f"pagination after stage:    {pagination:.2f} s")
+    print(f"speedup:                   {sequential[3] / (stage + pagination):.2f}x")
+    if (os.cpu_count() or 1) < args.jobs:
+        estimate = stage_cpu + workers_cpu / args.jobs + pagination
+        print(f"speedup on {args.jobs:>2} cores:       {sequential[3] / estimate:.2f}x (estimated)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Compares the page estimate of markdown files with their layout by Renderer.
+
+    python benchmarks/page_estimate.py report.md other.md
+
+For every file reports the time and the page count of the layout (Renderer, exact measurement) and of
+PageEstimator, which lays the document out without building it, with the exact and the draft measurement,
+along with the difference of the draft pages from the exact ones, in total and in the chapters that differ.
+The time of parsing the markdown, which both of them take, is reported separately. By default the example
+document is used.
+"""
+import os
+import sys
+import time
+from argparse import ArgumentParser
+
+from docx.document import Document
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from md2gost.page_estimator import PageEstimator  # noqa: E402
+from md2gost.parser_ import Parser  # noqa: E402
+from md2gost.renderable.heading import Heading  # noqa: E402
+from md2gost.renderable.paragraph_sizer import word_width_cache  # noqa: E402
+from md2gost.renderer import Renderer  # noqa: E402
+from md2gost.template_cache import load_template  # noqa: E402
+
+
+def _lay_out(document: Document, parser: Parser) -> list[tuple[str, int]]:
+    renderables = list(parser.parse())
+    renderer = Renderer(document)
+    renderer.process(renderables)
+    chapters = [("", 1)] + [(renderable.text, renderable.rendered_page) for renderable in renderables
+                            if isinstance(renderable, Heading) and renderable.level == 1]
+    ends = [first_page for _, first_page in chapters[1:]] + [renderer.page_count + 1]
+    return [(title, end - first_page) for (title, first_page), end in zip(chapters, ends)
+            if title or end > first_page]
+
+
+def _estimate(document: Document, parser: Parser) -> list[tuple[str, int]]:
+    return PageEstimator(document, parser).estimate()
+
+
+def _timed(function, text: str, template: str, measurement: str, repeat: int) -> tuple[float, float, list]:
+    """Returns the time of parsing the text, of the function and the chapters it returns"""
+    os.environ["MEASUREMENT"] = measurement
+    times = []
+    for _ in range(repeat):
+        # every run measures the words anew, as a single conversion does
+        word_width_cache.clear()
+        document = load_template(template)
+        start = time.perf_counter()
+        parser = Parser(document, text)
+        parsed = time.perf_counter()
+        chapters = function(document, parser)
+        times.append((parsed - start, time.perf_counter() - parsed))
+    return *min(times, key=lambda run_times: run_times[1]), chapters
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("filenames", nargs="*", default=[os.path.join(os.path.dirname(__file__), "..", "examples",
+                                                                      "example.md")])
+    parser.add_argument("-t", "--template", default=os.path.join(os.path.dirname(__file__), "..", "md2gost",
+                                                                 "Template.docx"))
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for filename in args.filenames:
+        os.environ["WORKING_DIR"] = os.path.dirname(filename)
+        with open(filename, encoding="utf-8") as f:
+            text = f.read()
+        _timed(_estimate, text, args.template, "exact", 1)  # loads the fonts and the template
+
+        print(filename)
+        runs = {}
+        for name, function, measurement in (("layout, exact", _lay_out, "exact"),
+                                            ("estimate, exact", _estimate, "exact"),
+                                            ("estimate, draft", _estimate, "draft")):
+            parse_time, elapsed, chapters = runs[name] = \
+                _timed(function, text, args.template, measurement, args.repeat)
+            print(f"  {name + ':':<18}{sum(pages for _, pages in chapters):>6} pages {elapsed:>7.2f} s")
+        print(f"  {'parsing:':<18}{'':>12} {parse_time:>7.2f} s")
+
+        exact, draft = runs["estimate, exact"][2], runs["estimate, draft"][2]
+        if exact != runs["layout, exact"][2]:
+            print("  the exact estimate differs from the layout")
+        differing = [(title, exact_pages, draft_pages) for (title, exact_pages), (_, draft_pages) in zip(exact, draft)
+                     if exact_pages != draft_pages]
+        print(f"  draft - exact:    {sum(pages for _, pages in draft) - sum(pages for _, pages in exact):>+6} pages, "
+              f"{len(differing)} of {len(exact)} chapters differ")
+        for title, exact_pages, draft_pages in differing:
+            print(f"    {title or '(до первой главы)'}: {exact_pages} -> {draft_pages}")
+
+
+if __name__ == "__main__":
+    main()
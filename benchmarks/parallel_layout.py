@@ -0,0 +1,78 @@
+"""
+Compares the layout of a markdown file by Renderer and by ParallelRenderer.
+
+    python benchmarks/parallel_layout.py report.md -j 8
+
+Reports the time of the sequential layout and of the chapters laid out in a process pool,
+along with the processor time of this process and of the workers. On a machine with fewer
+cores than jobs the workers don't run at once, so the time of the parallel layout there is
+also estimated as the time of this process plus the workers' processor time spread over
+the jobs.
+"""
+import os
+import sys
+import time
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from md2gost.parallel_renderer import ParallelRenderer  # noqa: E402
+from md2gost.parser_ import Parser  # noqa: E402
+from md2gost.renderable.paragraph_sizer import word_width_cache  # noqa: E402
+from md2gost.renderer import Renderer  # noqa: E402
+from md2gost.template_cache import load_template  # noqa: E402
+
+
+def _lay_out(text: str, template: str, jobs: int) -> tuple[float, float, float, int]:
+    """Returns the time of the layout, of this process and of the workers, and the number of pages"""
+    # every run measures the words anew, as a single conversion does
+    word_width_cache.clear()
+    document = load_template(template)
+    parser = Parser(document, text)
+
+    children_before = os.times()
+    start, start_cpu = time.perf_counter(), time.process_time()
+    if jobs > 1:
+        renderer = ParallelRenderer(document, template, jobs)
+        renderer.process_chapters(parser)
+    else:
+        renderer = Renderer(document)
+        renderer.process(parser.parse(), parser)
+    elapsed, cpu = time.perf_counter() - start, time.process_time() - start_cpu
+    children = os.times()
+    workers_cpu = children.children_user + children.children_system \
+        - children_before.children_user - children_before.children_system
+    return elapsed, cpu, workers_cpu, renderer.page_count
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("filename")
+    parser.add_argument("-t", "--template", default=os.path.join(os.path.dirname(__file__), "..", "md2gost",
+                                                                 "Template.docx"))
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count())
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    os.environ["WORKING_DIR"] = os.path.dirname(args.filename)
+    os.environ.setdefault("MEASUREMENT", "exact")
+    with open(args.filename, encoding="utf-8") as f:
+        text = f.read()
+
+    _lay_out(text, args.template, 1)  # loads the fonts and the template
+    sequential = min((_lay_out(text, args.template, 1) for _ in range(args.repeat)), key=lambda times: times[0])
+    parallel = min((_lay_out(text, args.template, args.jobs) for _ in range(args.repeat)), key=lambda times: times[0])
+    elapsed, cpu, workers_cpu, pages = parallel
+
+    print(f"pages:                     {pages}" + ("" if pages == sequential[3] else f" (sequential {sequential[3]})"))
+    print(f"sequential:                {sequential[0]:.2f} s")
+    print(f"parallel, {args.jobs:>2} jobs:          {elapsed:.2f} s "
+          f"(this process {cpu:.2f} s, workers {workers_cpu:.2f} s)")
+    print(f"speedup:                   {sequential[0] / elapsed:.2f}x")
+    if (os.cpu_count() or 1) < args.jobs:
+        estimate = cpu + workers_cpu / args.jobs
+        print(f"speedup on {args.jobs:>2} cores:       {sequential[0] / estimate:.2f}x (estimated)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Compares the time taken to build runs with python-docx property setters and with create_run.
+
+    python benchmarks/run_builder.py -n 1000000
+
+The runs are added to paragraphs of 100 runs, cycling through the formatting of the
+markdown text: plain, bold, italic, struck through and colored. Both ways build the same
+runs, but python-docx adds an empty rPr to the runs with no formatting.
+"""
+import os
+import sys
+import time
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from docx.shared import RGBColor  # noqa: E402
+
+from md2gost.template_cache import load_template  # noqa: E402
+from md2gost.util import create_run  # noqa: E402
+
+_FORMATS = [
+    (None, None, None, None),
+    (True, None, None, None),
+    (None, True, None, None),
+    (True, True, None, None),
+    (None, None, None, True),
+    (None, None, RGBColor.from_string("FF0000"), None),
+]
+_RUNS_PER_PARAGRAPH = 100
+
+
+def _build_docx(document, count: int):
+    paragraph = None
+    for i in range(count):
+        if i % _RUNS_PER_PARAGRAPH == 0:
+            paragraph = document.add_paragraph()
+        bold, italic, color, strike = _FORMATS[i % len(_FORMATS)]
+        run = paragraph.add_run(f"word{i % 10} ")
+        run.bold = bold
+        run.italic = italic
+        run.font.color.rgb = color
+        run.font.strike = strike
+
+
+def _build_lxml(document, count: int):
+    p = None
+    for i in range(count):
+        if i % _RUNS_PER_PARAGRAPH == 0:
+            p = document.add_paragraph()._p
+        bold, italic, color, strike = _FORMATS[i % len(_FORMATS)]
+        p.append(create_run(f"word{i % 10} ", None, bold, italic, color, strike))
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", "--runs", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    times = {}
+    for name, build in (("python-docx", _build_docx), ("lxml", _build_lxml)):
+        document = load_template(None)
+        start = time.perf_counter()
+        build(document, args.runs)
+        times[name] = time.perf_counter() - start
+        print(f"{name}: {times[name]:.2f} s, {args.runs / times[name]:,.0f} runs/s")
+    print(f"speedup: {times['python-docx'] / times['lxml']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
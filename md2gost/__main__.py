@@ -7,6 +7,8 @@ from docxcompose.composer import Composer
 from docx import Document
 
 from .converter import Converter
+from .incremental_renderer import default_journal_path
+from .renderable.measurement_cache import default_cache_path
 
 
 def main():
@@ -25,12 +27,54 @@ def main():
                         action=BooleanOptionalAction)
     parser.add_argument("--debug", help="Добавляет отладочные данные в документ",
                         action="store_true")
+    parser.add_argument("--font-dir", help="Директория с дополнительными шрифтами (можно указать несколько раз)",
+                        action="append", default=[])
+    parser.add_argument("--font-metrics", help="Путь до файла метрик шрифтов, созданного md2gost-metrics")
+    parser.add_argument("--line-breaker", help="Способ подсчета строк в абзацах (numpy требует установленного numpy)",
+                        choices=["python", "numpy"], default="python")
+    parser.add_argument("--measurement", help="Способ измерения текста: exact - точный, draft - приблизительный \
+                            по средней ширине символов (по умолчанию draft для --estimate-pages, иначе exact)",
+                        choices=["exact", "draft"])
+    parser.add_argument("--measurement-cache", help="Сохранять размеры абзацев между запусками в указанном файле \
+                            (по умолчанию в папке кэша пользователя)", nargs="?", const=default_cache_path(),
+                        metavar="PATH")
+    parser.add_argument("-j", "--jobs", help="Количество процессов для параллельной верстки глав \
+                            (по умолчанию 1)", type=int, default=1)
+    parser.add_argument("--measure-jobs", help="Количество процессов для предварительного подсчета строк \
+                            в абзацах перед разбиением на страницы (по умолчанию 1)", type=int, default=1)
+    parser.add_argument("--incremental", help="Сохранять верстку в указанном файле (по умолчанию в папке кэша \
+                            пользователя) и при следующем запуске верстать заново только измененные блоки",
+                        nargs="?", const="", metavar="PATH")
+    parser.add_argument("--export-layout", help="Сохранить расположение элементов документа на страницах \
+                            в указанный JSON-файл", metavar="PATH")
+    parser.add_argument("--estimate-pages", help="Только оценить количество страниц в каждой главе, \
+                            не создавая документ", action="store_true")
 
     args = parser.parse_args()
+    # the chapters laid out in parallel and the changed blocks aren't measured beforehand, the chapters
+    # aren't journaled, and the debugger marks up the elements the sequential layout adds
+    if args.jobs > 1 and args.incremental is not None:
+        parser.error("argument -j/--jobs: not allowed with argument --incremental")
+    if args.jobs > 1 and args.measure_jobs > 1:
+        parser.error("argument -j/--jobs: not allowed with argument --measure-jobs")
+    if args.incremental is not None and args.measure_jobs > 1:
+        parser.error("argument --measure-jobs: not allowed with argument --incremental")
+    if args.debug and args.jobs > 1:
+        parser.error("argument --debug: not allowed with argument -j/--jobs")
+    if args.debug and args.incremental is not None:
+        parser.error("argument --debug: not allowed with argument --incremental")
     filename, output, template, debug = \
         args.filename, args.output, args.template, args.debug
     if args.syntax_highlighting:
         os.environ["SYNTAX_HIGHLIGHTING"] = "1"
+    if args.font_dir:
+        os.environ["FONT_DIRS"] = os.pathsep.join(os.path.abspath(font_dir) for font_dir in args.font_dir)
+    if args.font_metrics:
+        os.environ["FONT_METRICS"] = os.path.abspath(args.font_metrics)
+    os.environ["LINE_BREAKER"] = args.line_breaker
+    if args.measurement_cache:
+        os.environ["MEASUREMENT_CACHE"] = os.path.abspath(args.measurement_cache)
+    os.environ["MEASUREMENT"] = args.measurement or ("draft" if args.estimate_pages else "exact")
 
     if not filename.endswith(".md"):
         print("Error: filename must have md format")
@@ -38,6 +82,16 @@ def main():
 
     os.environ["WORKING_DIR"] = os.path.dirname(filename)
 
+    if not template:
+        template = os.path.join(os.path.dirname(__file__), "Template.docx")
+
+    if args.estimate_pages:
+        chapters = Converter(filename, None, template).estimate_pages()
+        for title, pages in chapters:
+            print(f"{pages:>5}  {title or '(до первой главы)'}")
+        print(f"{sum(pages for _, pages in chapters):>5}  Всего страниц")
+        return
+
     if output:
         if not output.endswith(".docx"):
             print("Error: output must have docx format")
@@ -45,10 +99,11 @@ def main():
     else:
         output = os.path.basename(filename).replace(".md", ".docx")
 
-    if not template:
-        template = os.path.join(os.path.dirname(__file__), "Template.docx")
+    journal_path = None
+    if args.incremental is not None:
+        journal_path = os.path.abspath(args.incremental) if args.incremental else default_journal_path(filename)
 
-    converter = Converter(filename, output, template, debug)
+    converter = Converter(filename, output, template, debug, args.jobs, args.measure_jobs, journal_path)
     converter.convert()
 
     document = converter.document
@@ -67,6 +122,9 @@ def main():
     document.save(output)
     print(f"Generated document: {os.path.abspath(output)}")
 
+    if args.export_layout:
+        converter.placements.save(args.export_layout)
+
     if debug:
         import platform
         if platform.system() == 'Darwin':       # macOS
@@ -1,34 +1,70 @@
-import docx
 from docx.document import Document
 
 from .debugger import Debugger
+from .incremental_renderer import IncrementalRenderer
+from .measurement_stage import MeasurementStage
+from .page_estimator import PageEstimator
+from .parallel_renderer import ParallelRenderer
 from .parser_ import Parser
-from .toc_processor import TocProcessor
+from .placement_journal import PlacementJournal
 from .renderer import Renderer
+from .template_cache import load_template
 
 
 class Converter:
     """Converts markdown file to docx file"""
 
     def __init__(self, input_path: str, output_path: str,
-                 template_path: str = None, debug: bool = False):
+                 template_path: str = None, debug: bool = False, jobs: int = 1, measure_jobs: int = 1,
+                 journal_path: str | None = None):
         self._output_path = output_path
-        self._document: Document = docx.Document(template_path)
-        self._document._body.clear_content()
+        self._template_path = template_path
+        self._jobs = jobs
+        self._measure_jobs = measure_jobs
+        self._journal_path = journal_path
+        self._document: Document = load_template(template_path)
         self._debugger = Debugger(self._document) if debug else None
         with open(input_path, encoding="utf-8") as f:
             self.parser = Parser(self._document, f.read())
+        # places of the elements on the pages, filled by convert
+        self.placements: PlacementJournal | None = None
 
     def convert(self):
-        renderables = list(self.parser.parse())
+        """
+        Lays the document out: in parallel if jobs > 1, otherwise incrementally if journal_path is
+        given, otherwise sequentially, counting the lines beforehand if measure_jobs > 1. The debugger
+        needs the sequential layout, the options the chosen layout doesn't use are ignored.
+        """
+        if self._jobs > 1 and not self._debugger:
+            # chapters are laid out in worker processes, see ParallelRenderer
+            renderer = ParallelRenderer(self._document, self._template_path, self._jobs)
+            renderer.process_chapters(self.parser)
+            self.placements = renderer.placements
+            return
+        if self._journal_path and not self._debugger:
+            # only the changed blocks are laid out, see IncrementalRenderer
+            renderer = IncrementalRenderer(self._document, self._journal_path)
+            renderer.process_blocks(self.parser)
+            self.placements = renderer.placements
+            return
 
-        processors = [
-            Renderer(self._document, self._debugger),
-            TocProcessor()
-        ]
+        renderer = Renderer(self._document, self._debugger)
+        self.placements = renderer.placements
+        # the renderables are created from the parsed markdown as they are laid out, so
+        # each of them is freed once added, unless the lines are counted beforehand
+        renderables = self.parser.parse()
+        if self._measure_jobs > 1:
+            renderables = list(renderables)
+            MeasurementStage(self._document, self._template_path, self._measure_jobs).process(renderables)
+        renderer.process(renderables, self.parser)
 
-        for processor in processors:
-            processor.process(renderables)
+    def estimate_pages(self) -> list[tuple[str, int]]:
+        """
+        Lays the document out without building it, see PageEstimator, and returns the
+        titles of the chapters (level 1 headings) with their page counts. Pages before
+        the first chapter are returned with an empty title.
+        """
+        return PageEstimator(self._document, self.parser).estimate()
 
     @property
     def document(self) -> Document:
@@ -4,6 +4,7 @@ from docx.oxml import CT_Tbl
 from docx.shared import Parented, Length
 from docx.table import Table, _Row, _Cell
 
+from md2gost.renderable.style_resolver import get_style_resolver
 from md2gost.util import create_element
 
 
@@ -16,11 +17,12 @@ __all__ = [
 
 def create_table(parent: Parented, rows: int, cols, width: Length, style="Table Grid"):
     table = Table(CT_Tbl.new_tbl(rows, cols, width), parent)
-    table.style = style
+    style_resolver = get_style_resolver(parent.part)
+    style_resolver.set_table_style(table, style)
 
     # google docs fix
     table._tbl.tblPr.append(
-        deepcopy(parent.part.styles[style]._element.xpath("w:tblPr/w:tblBorders")[0]))
+        deepcopy(style_resolver.get_style(style).xpath("w:tblPr/w:tblBorders")[0]))
     for i in range(rows):
         for j in range(cols):
             cell = table.cell(i, j)
@@ -12,4 +12,4 @@ class Image(Image_):
 
         if self.title and (m := re.match(r"\%(\w+)( (.+))?", self.title)):
             self.unique_name = m.group(1)
-            self.title = m.group(2)
+            self.title = m.group(3)
@@ -7,7 +7,7 @@ class Reference(InlineElement):
 
     Syntax: @Type:label"""
 
-    pattern = r"\@([^ ]+):([^ ]+)"
+    pattern = r"\@([^\s:]+):(\w+)"
 
     def __init__(self, match: Match[str]):
         self.type = match.group(1)
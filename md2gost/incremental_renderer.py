@@ -0,0 +1,341 @@
+import hashlib
+import json
+import logging
+import os
+from collections.abc import Iterator
+from copy import copy
+from dataclasses import dataclass, replace
+from itertools import islice
+
+from docx.document import Document
+from docx.shared import Length, Parented
+from requests import RequestException
+
+from .layout_tracker import LayoutState
+from .parser_ import Block, Parser
+from .renderable.image import read_image
+from .renderable.measurement_cache import make_key
+from .renderable.paragraph_sizer import ParagraphSizer
+from .renderable.reference import Reference
+from .renderable.toc import ToC
+from .rendered_info import RenderedInfo
+from .renderer import Checkpoint, Renderer, serialize_elements, serialize_references
+from .util import cache_dir
+
+# bumped whenever the layout or the format of the journal changes, so stale journals are not used
+JOURNAL_VERSION = 5
+
+
+def default_journal_path(input_path: str) -> str:
+    name = hashlib.blake2b(os.path.abspath(input_path).encode(), digest_size=16).hexdigest()
+    return cache_dir("layouts", f"{name}.json")
+
+
+@dataclass
+class BlockLayout:
+    """Layout of a block saved to the journal: the elements it added to the body and the state after it"""
+    digest: str | None
+    # elements serialized by serialize_elements, their heights and the relationships they refer to,
+    # which hold the digests of the images instead of their content, see IncrementalRenderer._images
+    elements: bytes
+    heights: list[int]
+    relationships: list[tuple[str, str, str, bool]]
+    # numbering of the renderables the elements are added for
+    numbering: list[tuple[str, int] | None]
+    # numbers of the elements labeled in the block and the places of the references, see serialize_references
+    labels: dict[str, tuple[str, int]]
+    references: list[tuple[int, int, str, str]]
+    # index of the element the next block follows, None if it follows an element of a previous block
+    previous_index: int | None
+    headings: list[tuple[int, str, int, bool]]
+    has_toc: bool
+    checkpoint: Checkpoint
+
+    def with_page_offset(self, page_offset: int) -> "BlockLayout":
+        """The same layout on the pages shifted by page_offset"""
+        if not page_offset:
+            return self
+        layout_state = copy(self.checkpoint.layout_state)
+        layout_state.add_height(layout_state.max_height * page_offset)
+        return replace(self, headings=[(level, text, page + page_offset, numbered)
+                                       for level, text, page, numbered in self.headings],
+                       checkpoint=replace(self.checkpoint, layout_state=layout_state))
+
+    def to_json(self) -> dict:
+        layout_state = self.checkpoint.layout_state
+        return {
+            "digest": self.digest,
+            "elements": self.elements.decode(),
+            "heights": self.heights,
+            "relationships": self.relationships,
+            "numbering": self.numbering,
+            "labels": self.labels,
+            "references": self.references,
+            "previous_index": self.previous_index,
+            "headings": self.headings,
+            "has_toc": self.has_toc,
+            "checkpoint": {
+                "layout_state": (layout_state.max_height, layout_state.max_width,
+                                 (layout_state.page - 1) * layout_state.max_height + layout_state.current_page_height),
+                "numbers": self.checkpoint.numbers,
+                "previous_style": self.checkpoint.previous_style,
+                "pending": self.checkpoint.pending,
+            },
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "BlockLayout":
+        checkpoint = data["checkpoint"]
+        max_height, max_width, height = checkpoint["layout_state"]
+        layout_state = LayoutState(Length(max_height), Length(max_width))
+        layout_state.add_height(Length(height))
+        previous_style = checkpoint["previous_style"]
+        return cls(
+            digest=data["digest"],
+            elements=data["elements"].encode(),
+            heights=data["heights"],
+            relationships=[tuple(relationship) for relationship in data["relationships"]],
+            numbering=[tuple(numbering) if numbering is not None else None for numbering in data["numbering"]],
+            labels={label: tuple(labeled) for label, labeled in data["labels"].items()},
+            references=[tuple(reference) for reference in data["references"]],
+            previous_index=data["previous_index"],
+            headings=[tuple(heading) for heading in data["headings"]],
+            has_toc=data["has_toc"],
+            checkpoint=Checkpoint(layout_state, checkpoint["numbers"],
+                                  tuple(previous_style) if previous_style is not None else None,
+                                  checkpoint["pending"]),
+        )
+
+
+@dataclass
+class LayoutJournal:
+    """Layouts of the blocks of a document saved by the previous conversion"""
+    # identifies the template, the fonts and the options the layouts were made with
+    context: str
+    blocks: list[BlockLayout]
+    # layout of the renderables waiting for a new page after the last block
+    end: BlockLayout
+
+    @classmethod
+    def load(cls, path: str, context: str) -> "LayoutJournal | None":
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data["context"] != context:
+                return None
+            return cls(context, [BlockLayout.from_json(block) for block in data["blocks"]],
+                       BlockLayout.from_json(data["end"]))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logging.warning(f"Can't load the layout journal {path}: {e}")
+            return None
+
+    def save(self, path: str):
+        data = json.dumps({"context": self.context, "blocks": [block.to_json() for block in self.blocks],
+                           "end": self.end.to_json()})
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logging.warning(f"Can't save the layout journal {path}: {e}")
+
+
+class IncrementalRenderer(Renderer):
+    """
+    Renders the blocks of a document (see Parser.blocks) reusing the layout of the previous conversion.
+
+    The layout of every block is saved to a journal along with the checkpoint after it. The blocks
+    before the first changed one are added from the journal up to the last checkpoint with no
+    renderables waiting for a new page, the layout continues from there. Once the blocks after
+    the changed ones are the same as before and the checkpoint after a rendered block matches
+    the one after its counterpart in the previous layout, the rest of the layout is the same,
+    possibly shifted by whole pages, so it's added from the journal. The table of contents is
+    filled with the pages of the headings after the layout, so it's always rendered again,
+    reserving the lines of the headings it was filled with before.
+    """
+
+    def __init__(self, document: Document, journal_path: str):
+        super().__init__(document)
+        self._journal_path = journal_path
+        self._added: list[tuple[Parented, Length]] = []
+        # references rendered in the block and the number of the labels before it
+        self._references: list[Reference] = []
+        self._labels_start = 0
+        # layouts of the blocks and of the renderables waiting for a new page after them
+        self._layouts: list[BlockLayout] = []
+        self._end: BlockLayout | None = None
+        # content of the images by their digests, which the journal holds instead, and the images
+        # of the markdown not loaded yet
+        self._images: dict[str, bytes] = {}
+        self._image_paths: Iterator[str] = iter(())
+        # blocks added from the journal instead of being rendered, the first ones up to _reused_start
+        self.reused_blocks = 0
+        self._reused_start = 0
+
+    def process_blocks(self, parser: Parser):
+        blocks = parser.blocks()
+        context = make_key(JOURNAL_VERSION, *ParagraphSizer.measurement_context(self._document.part),
+                           os.environ.get("SYNTAX_HIGHLIGHTING", "")).hex()
+        journal = LayoutJournal.load(self._journal_path, context)
+        previous = journal.blocks if journal else []
+
+        common = min(len(previous), len(blocks))
+        start = 0
+        while start < common and blocks[start].digest is not None and blocks[start].digest == previous[start].digest:
+            start += 1
+        # the blocks whose images can't be found are rendered again
+        self._image_paths = parser.image_paths()
+        start = next((i for i in range(start) if not self._find_images([previous[i]])), start)
+        while start and previous[start - 1].checkpoint.pending:
+            start -= 1
+        unchanged_end = 0
+        while unchanged_end < common - start and blocks[-1 - unchanged_end].digest is not None \
+                and blocks[-1 - unchanged_end].digest == previous[-1 - unchanged_end].digest:
+            unchanged_end += 1
+
+        if (toc := next((i for i, layout in enumerate(previous) if layout.has_toc), None)) is not None:
+            items = [heading for layout in previous[toc + 1:] for heading in layout.headings]
+            if [(level, title, numbered) for level, title, _, numbered in items] == \
+                    [(level, title, numbered) for level, title, _, numbered in parser.estimate_toc()]:
+                # the table of contents reserves the lines of the headings with the pages it was filled with
+                self._toc_items = items
+
+        layouts = self._layouts
+        for block, layout in zip(blocks[:start], previous):
+            layouts.append(self._restore_block(parser, block, layout))
+            if layout.has_toc and layouts[-1].checkpoint != layout.checkpoint:
+                # the table of contents takes other lines, the following blocks are moved
+                start = len(layouts)
+                break
+        self._reused_start = start
+        offset = len(previous) - len(blocks)
+        for i in range(start, len(blocks)):
+            layouts.append(self._render_block(parser, blocks[i]))
+            if i + 1 >= len(blocks) - unchanged_end and i + offset >= 0 and (page_offset := self._page_offset(
+                    layouts[-1].checkpoint, previous[i + offset].checkpoint)) is not None \
+                    and self._find_images([*previous[i + 1 + offset:], journal.end]):
+                # the layout converged with the previous one
+                layouts.extend(self._restore_block(parser, block, previous[j + offset].with_page_offset(page_offset))
+                               for j, block in enumerate(blocks[i + 1:], i + 1))
+                self._end = self._restore_block(parser, None, journal.end.with_page_offset(page_offset))
+                break
+        if self._end is None:
+            self._flush_end()
+
+        self.fill_toc(parser)
+        self._resolve_forward_references()
+        LayoutJournal(context, self._layouts, self._end).save(self._journal_path)
+
+    def _find_images(self, layouts: list[BlockLayout]) -> bool:
+        """
+        Whether the content of the images the layouts refer to is known, the images of the markdown
+        are loaded until it is. The ones changed since the journal was saved can't be added from it.
+        """
+        missing = {target for layout in layouts for _, _, target, is_external in layout.relationships
+                   if not is_external} - self._images.keys()
+        while missing and (path := next(self._image_paths, None)) is not None:
+            try:
+                content = read_image(path)
+            except (OSError, RequestException):
+                continue
+            digest = hashlib.sha1(content).hexdigest()
+            self._images[digest] = content
+            missing.discard(digest)
+        return not missing
+
+    def _add_relationships(self, relationships: list[tuple[str, str, str | bytes, bool]]) -> dict[str, str]:
+        return super()._add_relationships([(r_id, reltype, target if is_external else self._images[target], is_external)
+                                           for r_id, reltype, target, is_external in relationships])
+
+    def _flush_end(self):
+        """Adds the renderables waiting for a new page after the last block"""
+        self._start_block()
+        self._flush_to_new_screen()
+        self._end = self._block_layout(None, [], False)
+
+    def _lay_out_from_toc(self, parser: Parser):
+        """Renders the blocks from the table of contents again, none of them is added from the journal"""
+        toc = next(i for i, layout in enumerate(self._layouts) if layout.has_toc)
+        self._layouts[toc:] = [self._render_block(parser, block) for block in parser.blocks()[toc:]]
+        self._flush_end()
+        self.reused_blocks = min(self._reused_start, toc)
+
+    @staticmethod
+    def _page_offset(checkpoint: Checkpoint, previous: Checkpoint) -> int | None:
+        """
+        Number of pages the layout following the checkpoint is shifted by from the one following
+        the previous checkpoint, None if the layouts differ. The layout depends on the page only
+        through whether it's the first one, besides the pages of the headings.
+        """
+        state, previous_state = checkpoint.layout_state, previous.layout_state
+        if checkpoint.pending or previous.pending or checkpoint.numbers != previous.numbers \
+                or checkpoint.previous_style != previous.previous_style \
+                or (state.max_height, state.max_width, state.current_page_height) != \
+                (previous_state.max_height, previous_state.max_width, previous_state.current_page_height) \
+                or (state.page == 1) != (previous_state.page == 1):
+            return None
+        return state.page - previous_state.page
+
+    def _start_block(self):
+        self._added = []
+        self._references = []
+        self._labels_start = len(self._numberer.labels)
+
+    def _render_block(self, parser: Parser, block: Block) -> BlockLayout:
+        self._start_block()
+        headings_start, has_toc = len(self._headings), False
+        for renderable in parser.parse(block.elements):
+            self.render(renderable)
+            self._add_contents(renderable)
+            has_toc = has_toc or isinstance(renderable, ToC)
+        return self._block_layout(block.digest, self._headings[headings_start:], has_toc)
+
+    def _restore_block(self, parser: Parser, block: Block | None, layout: BlockLayout) -> BlockLayout:
+        """Adds the layout of the block from the journal, the table of contents is rendered again"""
+        if layout.has_toc:
+            return self._render_block(parser, block)
+
+        added = self._add_serialized(layout.elements, layout.heights, layout.relationships, layout.numbering)
+        self._add_references(added, layout.references, layout.labels)
+        if layout.previous_index is not None:
+            self.previous_rendered = RenderedInfo(added[layout.previous_index],
+                                                  Length(layout.heights[layout.previous_index]))
+        self.restore(layout.checkpoint)
+        self._headings.extend(layout.headings)
+        self.reused_blocks += block is not None
+        return layout
+
+    def _block_layout(self, digest: str | None, headings: list[tuple[int, str, int, bool]],
+                      has_toc: bool) -> BlockLayout:
+        """Layout of the rendered block with its headings and the checkpoint after it"""
+        added = [element for element, _ in self._added]
+        elements, relationships = serialize_elements(added)
+        for i, (r_id, reltype, target, is_external) in enumerate(relationships):
+            if not is_external:
+                digest = hashlib.sha1(target).hexdigest()
+                self._images[digest] = target
+                relationships[i] = (r_id, reltype, digest, is_external)
+        previous_index = None
+        if self.previous_rendered is not None:
+            previous_index = next((i for i in range(len(self._added) - 1, -1, -1)
+                                   if self._added[i][0]._element is self.previous_rendered.docx_element._element),
+                                  None)
+
+        start = len(self.placements) - len(self._added)
+        return BlockLayout(digest, elements, [int(height) for _, height in self._added], relationships,
+                           [self.placements.numbering(i) for i in range(start, len(self.placements))],
+                           dict(islice(self._numberer.labels.items(), self._labels_start, None)),
+                           serialize_references(added, self._references),
+                           previous_index, headings, has_toc, self.checkpoint)
+
+    def _add(self, element: Parented, height: Length):
+        super()._add(element, height)
+        self._added.append((element, height))
+
+    def _resolve(self, reference: Reference):
+        super()._resolve(reference)
+        self._references.append(reference)
@@ -0,0 +1,26 @@
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+from .layout_tracker import LayoutState
+from .rendered_info import RenderedInfo
+if TYPE_CHECKING:
+    from .sub_renderable import SubRenderable
+
+
+@dataclass(slots=True)
+class LayoutPlan:
+    """
+    Layout of a renderable measured from layout_state following previous_rendered:
+    the rendered infos and sub renderables it adds to the document, see Renderable.measure
+    """
+    previous_rendered: RenderedInfo | None
+    layout_state: LayoutState
+    items: list["RenderedInfo | SubRenderable"] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class ParagraphPlan(LayoutPlan):
+    """Layout of a paragraph along with the page break decisions the commit applies to its properties"""
+    page_break_before: bool = False
+    remove_space_before: bool = False
+    page: int = 0
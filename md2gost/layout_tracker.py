@@ -4,28 +4,45 @@ from docx.shared import Length
 
 
 class LayoutState:
+    """
+    Position in the layout of the pages max_height high: the page, starting from 1,
+    and the height taken on it. Copied for every renderable, so it's kept small.
+    """
+    __slots__ = ("max_height", "max_width", "page", "current_page_height")
+
     def __init__(self, max_height: Length, max_width: Length):
         self.max_height: Length = max_height
         self.max_width: Length = max_width
-        self._current_height: Length = Length(0)
+        self.page: int = 1
+        self.current_page_height: int = 0
 
-    def new_page(self):
-        self._current_height += self.remaining_page_height
+    def __copy__(self) -> "LayoutState":
+        state = object.__new__(type(self))
+        state.max_height, state.max_width, state.page, state.current_page_height = \
+            self.max_height, self.max_width, self.page, self.current_page_height
+        return state
 
-    @property
-    def current_page_height(self):
-        return self._current_height % self.max_height
+    def new_page(self):
+        self.page += 1
+        self.current_page_height = 0
 
     @property
-    def remaining_page_height(self) -> Length:
+    def remaining_page_height(self) -> int:
         return self.max_height - self.current_page_height
 
-    @property
-    def page(self):
-        return self._current_height // self.max_height + 1
-
     def add_height(self, height: Length):
-        self._current_height += height
+        height += self.current_page_height
+        if 0 <= height < self.max_height:
+            self.current_page_height = height
+        else:
+            pages, self.current_page_height = divmod(height, self.max_height)
+            self.page += int(pages)
+
+    def __eq__(self, other):
+        if not isinstance(other, LayoutState):
+            return NotImplemented
+        return (self.max_height, self.max_width, self.page, self.current_page_height) == \
+            (other.max_height, other.max_width, other.page, other.current_page_height)
 
 
 class LayoutTracker:
@@ -51,3 +68,8 @@ class LayoutTracker:
 
     def new_page(self):
         self._state.new_page()
+
+    def restore(self, state: LayoutState):
+        """Continues the layout from the state, e.g. one saved by a previous layout"""
+        self._state = copy(state)
+        self._is_new_page = False
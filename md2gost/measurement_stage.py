@@ -0,0 +1,74 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from docx.document import Document
+from docx.oxml import parse_xml
+from docx.shared import Length
+from docx.text.paragraph import Paragraph as DocxParagraph
+from lxml import etree
+
+from .numberer import Numberer
+from .renderable import Renderable, Paragraph
+from .renderable.paragraph_sizer import ParagraphSizer, font_cache, get_measured_lines
+from .renderable.requires_numbering import RequiresNumbering
+from .renderable.template_profile import get_template_profile
+from .template_cache import load_template
+
+# batches sent to each worker, so the slower ones are helped by the others
+_BATCHES_PER_JOB = 4
+
+# empty document of the worker the measured paragraphs are parsed into
+_document: Document | None = None
+
+
+def _init_worker(template_path: str | None):
+    global _document
+    _document = load_template(template_path)
+
+
+def _measure_lines(paragraph: bytes, max_width: Length) -> tuple[tuple, int]:
+    return ParagraphSizer(DocxParagraph(parse_xml(paragraph), _document._body), None, max_width).measure_lines()
+
+
+class MeasurementStage:
+    """
+    Counts the lines of the paragraphs of the renderables in a process pool before they are rendered.
+
+    The lines of a paragraph depend on its text, style and the width it's laid out in, not on
+    its position on the page, so they are counted for all the paragraphs, list items, table
+    cells and captions at once, and the renderer only adds the heights up when it breaks the
+    pages. Captions are measured with the numbers they are expected to get, if the renderer
+    numbers one otherwise (e.g. an image moved to the next page), it counts its lines itself.
+    """
+
+    def __init__(self, document: Document, template_path: str | None, jobs: int):
+        self._document = document
+        self._template_path = template_path
+        self._jobs = jobs
+
+    def process(self, renderables: list[Renderable]):
+        self._number(renderables)
+        max_width = get_template_profile(self._document.part).text_width
+        # the same paragraphs (e.g. table cells) are measured once
+        paragraphs = list(dict.fromkeys((etree.tostring(docx_paragraph._p), width)
+                                        for renderable in renderables
+                                        for docx_paragraph, width in renderable.text_paragraphs(max_width)))
+        if not paragraphs:
+            return
+
+        font_cache.load_style_fonts(get_template_profile(self._document.part))
+        measured_lines = get_measured_lines(self._document.part)
+        with ProcessPoolExecutor(self._jobs, initializer=_init_worker, initargs=(self._template_path,)) as executor:
+            measured_lines.update(executor.map(
+                _measure_lines, *zip(*paragraphs),
+                chunksize=max(1, len(paragraphs) // (self._jobs * _BATCHES_PER_JOB))))
+
+    @staticmethod
+    def _number(renderables: list[Renderable]):
+        """Numbers the renderables in the order they are numbered by the renderer unless they are moved"""
+        numberer = Numberer()
+        for renderable in renderables:
+            for numbered in [renderable, *renderable.images] if isinstance(renderable, Paragraph) else [renderable]:
+                if isinstance(numbered, RequiresNumbering):
+                    number = numberer.get_current_number(numbered.numbering_category) + 1
+                    numbered.set_number(number)
+                    numberer.save_number(numbered.numbering_category, number)
@@ -0,0 +1,59 @@
+from argparse import ArgumentParser
+from itertools import product
+import logging
+import os.path
+
+import docx
+from docx.document import Document
+
+from .renderable.find_font import find_font
+from .renderable.font_metrics import FontMetrics, get_font_metrics, save_snapshot
+from .renderable.template_profile import get_template_profile, load_template_profile
+
+
+def referenced_fonts(document: Document) -> tuple[list[str], list[float]]:
+    """Returns font names and sizes referenced by the document's styles and defaults"""
+    profile = get_template_profile(document.part)
+    return list(profile.font_names), list(profile.font_sizes)
+
+
+def compile_metrics(template_path: str, output_path: str):
+    document = docx.Document(template_path)
+    load_template_profile(document, template_path)
+    names, sizes = referenced_fonts(document)
+
+    fonts: dict[tuple[str, bool, bool], FontMetrics] = {}
+    for name, bold, italic in product(names, (False, True), (False, True)):
+        try:
+            fonts[(name, bold, italic)] = get_font_metrics(find_font(name, bold, italic))
+        except ValueError:
+            logging.warning(f"Font {name} (bold={bold}, italic={italic}) not found, skipping...")
+
+    save_snapshot(output_path, fonts, sizes)
+    return fonts, sizes
+
+
+def main():
+    parser = ArgumentParser(
+        prog="md2gost-metrics",
+        description="Компилирует метрики шрифтов, используемых в стилях шаблона, в бинарный файл, \
+                который можно передать md2gost через --font-metrics."
+    )
+    parser.add_argument("template", nargs="?", help="Путь до шаблона .docx",
+                        default=os.path.join(os.path.dirname(__file__), "Template.docx"))
+    parser.add_argument("-o", "--output", help="Путь до файла метрик")
+    parser.add_argument("--font-dir", help="Директория с дополнительными шрифтами (можно указать несколько раз)",
+                        action="append", default=[])
+
+    args = parser.parse_args()
+    output = args.output or os.path.basename(args.template).replace(".docx", ".metrics")
+    if args.font_dir:
+        os.environ["FONT_DIRS"] = os.pathsep.join(os.path.abspath(font_dir) for font_dir in args.font_dir)
+
+    fonts, sizes = compile_metrics(args.template, output)
+    print(f"Compiled metrics of {len(fonts)} faces for sizes {', '.join(f'{size:g}' for size in sizes)}: "
+          f"{os.path.abspath(output)}")
+
+
+if __name__ == "__main__":
+    main()
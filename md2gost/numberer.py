@@ -4,9 +4,18 @@ from collections import defaultdict
 class Numberer:
     def __init__(self):
         self._categories: dict[str, int] = defaultdict(lambda: 0)
+        # categories and numbers of the labeled elements by label, in the order they are numbered
+        self.labels: dict[str, tuple[str, int]] = {}
 
     def get_current_number(self, category) -> int:
         return self._categories[category]
 
-    def save_number(self, category, number):
+    def save_number(self, category, number, label: str | None = None):
         self._categories[category] = number
+        if label is not None:
+            self.labels[label] = (category, number)
+
+    @property
+    def numbers(self) -> dict[str, int]:
+        """Current numbers of the categories that have numbered elements"""
+        return {category: number for category, number in self._categories.items() if number}
@@ -0,0 +1,41 @@
+from docx.document import Document
+from docx.shared import Length, Parented
+
+from .layout_plan import LayoutPlan
+from .parser_ import Parser
+from .renderable import Renderable
+from .renderable.heading import Heading
+from .rendered_info import RenderedInfo
+from .renderer import Renderer
+from .sub_renderable import SubRenderable
+
+
+class PageEstimator(Renderer):
+    """
+    Lays the document out as Renderer does without building it: the renderables are measured and their
+    plans aren't committed, so e.g. the rows of the tables aren't created, and nothing is added to the body.
+    Only the headings are committed, they record the pages they are laid out on for the table of contents.
+    """
+
+    def __init__(self, document: Document, parser: Parser):
+        super().__init__(document)
+        self._parser = parser
+
+    def estimate(self) -> list[tuple[str, int]]:
+        """
+        Returns the titles of the chapters (level 1 headings) with their page counts,
+        pages before the first chapter are returned with an empty title, see Converter.estimate_pages
+        """
+        self.process(self._parser.parse(), self._parser)
+        chapters = [("", 1)] + [(text, page) for level, text, page, _ in self._headings if level == 1]
+        ends = [first_page for _, first_page in chapters[1:]] + [self.page_count + 1]
+        return [(title, end - first_page) for (title, first_page), end in zip(chapters, ends)
+                if title or end > first_page]
+
+    def _commit(self, renderable: Renderable, plan: LayoutPlan) -> list[RenderedInfo | SubRenderable]:
+        if isinstance(renderable, Heading):
+            return renderable.commit(plan)
+        return plan.items
+
+    def _add(self, element: Parented, height: Length):
+        self._layout_tracker.add_height(height)
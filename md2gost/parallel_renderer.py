@@ -0,0 +1,257 @@
+import os
+from collections import Counter
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+
+from docx.document import Document
+from docx.shared import Length, Parented
+
+from . import extended_markdown
+from .layout_tracker import LayoutState
+from .parser_ import IMAGE_CATEGORY, Parser, count_numbered
+from .renderable.heading import Heading
+from .renderable.measurement_cache import get_measurement_cache
+from .renderable.paragraph import Paragraph
+from .renderable.paragraph_sizer import font_cache
+from .renderable.template_profile import TemplateProfile, assign_template_profile, get_template_profile
+from .rendered_info import RenderedInfo
+from .renderable.reference import Reference
+from .renderer import Renderer, serialize_elements, serialize_references
+from .template_cache import load_template
+
+# empty document of the worker the chapters are laid out into, one after another
+_document: Document | None = None
+
+
+@dataclass
+class _Chapter:
+    """
+    Markdown elements laid out by one worker: the ones following a level 1 heading
+    up to and including the next level 1 heading, or the ones before the first one.
+    """
+    heading: extended_markdown.Heading | None
+    elements: list
+    # numbers of the numbered elements before the chapter, counted in the markdown
+    numbers: dict[str, int]
+
+    @property
+    def has_toc(self) -> bool:
+        return any(isinstance(element, extended_markdown.TOC) for element in self.elements)
+
+
+def _split_chapters(marko_elements: list) -> list[_Chapter]:
+    chapters = [_Chapter(None, [], {})]
+    numbers = Counter()
+    for marko_element in marko_elements:
+        chapters[-1].elements.append(marko_element)
+        counts = count_numbered(marko_element)
+        numbers.update(counts)
+        # the images of a heading follow it, so its chapter doesn't start right after it
+        if isinstance(marko_element, extended_markdown.Heading) and marko_element.level == 1\
+                and not counts[IMAGE_CATEGORY]:
+            chapters.append(_Chapter(marko_element, [], dict(+numbers)))
+    return chapters
+
+
+@dataclass
+class ChapterLayout:
+    """Layout of a chapter made by a worker, assuming the chapter starts from start_state"""
+    start_state: LayoutState
+    # elements added to the body serialized as the children of one element, and their heights
+    elements: bytes
+    heights: list[int]
+    # numbering of the renderables the elements are added for
+    numbering: list[tuple[str, int] | None]
+    # index of the element the next chapter follows, None if it is the heading of this chapter
+    previous_index: int | None
+    numbers: dict[str, int]
+    headings: list[tuple[int, str, int, bool]]
+    # relationships the elements refer to: rId, type, url or image blob, is external
+    relationships: list[tuple[str, str, str | bytes, bool]]
+    # renderables left waiting for a new page
+    pending: int
+    # numbers of the elements labeled in the chapter and the places of the references, see serialize_references
+    labels: dict[str, tuple[str, int]]
+    references: list[tuple[int, int, str, str]]
+
+
+class _ChapterRenderer(Renderer):
+    """Renders a chapter in a worker, recording the elements it adds to the body"""
+
+    def __init__(self, document: Document):
+        super().__init__(document)
+        self.added: list[tuple[Parented, Length]] = []
+        self.references: list[Reference] = []
+
+    def start_after(self, heading: Heading):
+        """
+        Continues the layout after the level 1 heading the way it's mostly laid out: it
+        starts a new page after a body text paragraph. ParallelRenderer checks the
+        assumption against the actual end of the previous chapter.
+        """
+        layout_state = self.layout_state
+        start = layout_state.max_height + layout_state.max_height // 2  # the middle of the second page
+        layout_state.add_height(start)
+        previous = Paragraph(self._document._body)
+        rendered = heading.measure(RenderedInfo(previous._docx_paragraph, Length(0)), layout_state).items[0]
+        self._layout_tracker.add_height(start + rendered.height)
+        self.previous_rendered = rendered
+
+    def start_numbers(self, numbers: dict[str, int]):
+        for category, number in numbers.items():
+            self._numberer.save_number(category, number)
+
+    def finish(self):
+        self._flush_to_new_screen()
+
+    @property
+    def pending(self) -> int:
+        return len(self._to_new_page)
+
+    @property
+    def numbers(self) -> dict[str, int]:
+        return self._numberer.numbers
+
+    @property
+    def previous_index(self) -> int | None:
+        """Index of the added element the next one follows, None if it wasn't added by the renderer"""
+        if self.previous_rendered is None:
+            return None
+        return next((i for i in range(len(self.added) - 1, -1, -1)
+                     if self.added[i][0]._element is self.previous_rendered.docx_element._element), None)
+
+    @property
+    def labels(self) -> dict[str, tuple[str, int]]:
+        return self._numberer.labels
+
+    def _add(self, element: Parented, height: Length):
+        super()._add(element, height)
+        self.added.append((element, height))
+
+    def _resolve(self, reference: Reference):
+        # the references are resolved by ParallelRenderer along with the ones to the previous chapters
+        self.references.append(reference)
+
+
+def _init_worker(template_path: str | None, profile: TemplateProfile):
+    """
+    Prepares the document of the worker with the profile of the template and its fonts
+    loaded by the parent process, so a spawned worker doesn't compute them again
+    """
+    global _document
+    # the connection to the measurement cache can't be shared with the parent process
+    get_measurement_cache.cache_clear()
+    _document = load_template(template_path)
+    assign_template_profile(_document, profile)
+    font_cache.load_style_fonts(profile)
+
+
+def _lay_out_chapter(chapter: _Chapter, last: bool, label_numbers: dict[str, tuple[str, int]]) -> ChapterLayout:
+    # the document is reused along with the styles resolved for it, only the body is laid out anew
+    document = _document
+    body = document._body._element
+    # the elements are appended after the section properties, so clear_content would remove them too
+    for element in list(body):
+        if element is not body.sectPr:
+            body.remove(element)
+    parser = Parser(document, "", label_numbers)
+    renderer = _ChapterRenderer(document)
+    if chapter.heading is not None:
+        renderer.start_after(next(parser.parse([chapter.heading])))
+    start_state = renderer.layout_state
+    renderer.start_numbers(chapter.numbers)
+
+    renderables = list(parser.parse(chapter.elements))
+    for renderable in renderables:
+        renderer.render(renderable)
+    if last:
+        renderer.finish()
+
+    # pool workers exit without running atexit handlers
+    if os.environ.get("MEASUREMENT_CACHE") and \
+            (measurement_cache := get_measurement_cache(os.environ["MEASUREMENT_CACHE"])) is not None:
+        measurement_cache.flush()
+
+    added = [element for element, _ in renderer.added]
+    elements, relationships = serialize_elements(added)
+    return ChapterLayout(
+        start_state=start_state,
+        elements=elements,
+        heights=[int(height) for _, height in renderer.added],
+        numbering=[renderer.placements.numbering(i) for i in range(len(renderer.placements))],
+        previous_index=renderer.previous_index,
+        numbers=renderer.numbers,
+        headings=[(renderable.level, renderable.text, renderable.rendered_page, renderable.is_numbered)
+                  for renderable in renderables if isinstance(renderable, Heading)],
+        relationships=relationships,
+        pending=renderer.pending,
+        labels=renderer.labels,
+        references=serialize_references(added, renderer.references),
+    )
+
+
+class ParallelRenderer(Renderer):
+    """
+    Renders the chapters of a document in a process pool.
+
+    A level 1 heading starts a new page, so a chapter's layout depends on the
+    previous ones only through its position on the page after the heading
+    and the numbers of the numbered elements. Workers lay the chapters out
+    assuming the usual position and the numbers counted in the markdown. The
+    layouts are added to the document in order if the assumptions hold, the
+    other chapters are laid out sequentially in this process, so the result
+    is the same as the one of Renderer. Chapters with a table of contents
+    are laid out in this process too, as it's filled with the pages of the
+    headings after the rest of the document.
+    """
+
+    def __init__(self, document: Document, template_path: str | None, jobs: int):
+        super().__init__(document)
+        self._template_path = template_path
+        self._jobs = jobs
+
+    def process_chapters(self, parser: Parser):
+        chapters = _split_chapters(parser.elements)
+        profile = get_template_profile(self._document.part)
+        font_cache.load_style_fonts(profile)
+        with ProcessPoolExecutor(self._jobs, initializer=_init_worker,
+                                 initargs=(self._template_path, profile)) as executor:
+            futures: list[Future | None] = [
+                None if chapter.has_toc
+                else executor.submit(_lay_out_chapter, chapter, i == len(chapters) - 1, parser.label_numbers)
+                for i, chapter in enumerate(chapters)]
+            for i, (chapter, future) in enumerate(zip(chapters, futures)):
+                if future is None or not self._add_layout(chapter, future.result()):
+                    self._render_chapter(parser, chapter, i == len(chapters) - 1)
+        self.fill_toc(parser)
+        self._resolve_forward_references()
+
+    def _render_chapter(self, parser: Parser, chapter: _Chapter, last: bool):
+        for renderable in parser.parse(chapter.elements):
+            self.render(renderable)
+            self._add_contents(renderable)
+        if last:
+            self._flush_to_new_screen()
+
+    def _add_layout(self, chapter: _Chapter, layout: ChapterLayout) -> bool:
+        """Adds the layout made by a worker if the chapter starts where the worker assumed"""
+        layout_state = self.layout_state
+        start_state = layout.start_state
+        if self._to_new_page or layout.pending \
+                or layout_state.current_page_height != start_state.current_page_height \
+                or (layout_state.page == 1) != (start_state.page == 1) \
+                or self._numberer.numbers != chapter.numbers:
+            return False
+
+        added = self._add_serialized(layout.elements, layout.heights, layout.relationships, layout.numbering)
+        self._add_references(added, layout.references, layout.labels)
+
+        if layout.previous_index is not None:
+            self.previous_rendered = RenderedInfo(added[layout.previous_index],
+                                                  Length(layout.heights[layout.previous_index]))
+        for category, number in layout.numbers.items():
+            self._numberer.save_number(category, number)
+        page_offset = layout_state.page - start_state.page
+        self._headings.extend((level, text, page + page_offset, numbered)
+                              for level, text, page, numbered in layout.headings)
+        return True
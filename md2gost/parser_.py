@@ -1,26 +1,169 @@
-from collections.abc import Generator
+import hashlib
+import os
+from collections import Counter
+from collections.abc import Generator, Iterable
+from dataclasses import dataclass
+from functools import cached_property
 
 from docx import Document
-from marko.block import BlankLine
+from marko.block import BlankLine, BlockElement
 
-from .extended_markdown import markdown, Caption
+from . import extended_markdown
+from .extended_markdown import markdown, Caption, Heading, Image, Reference, TOC
 from .renderable.caption import CaptionInfo
 from .renderable.renderable import Renderable
+from .renderable.toc import ToC
 from .renderable_factory import RenderableFactory
 
 
+@dataclass
+class Block:
+    """Top level markdown elements converted to one renderable: the element along with its caption"""
+    elements: list[BlockElement]
+    # identifies the content of the elements, None if it can't be identified
+    digest: str | None
+
+
+# numbering categories of the block elements, see RequiresNumbering
+NUMBERED_BLOCKS = {
+    extended_markdown.Table: "Таблица",
+    extended_markdown.FencedCode: "Листинг",
+    extended_markdown.CodeBlock: "Листинг",
+    extended_markdown.Equation: "Формула",
+}
+IMAGE_CATEGORY = "Рисунок"
+# inline elements whose children are added to the paragraph, see RenderableFactory._create_runs
+_INLINE_CONTAINERS = (extended_markdown.Link, extended_markdown.Url, extended_markdown.Emphasis,
+                      extended_markdown.StrongEmphasis, extended_markdown.Strikethrough)
+
+
+def _images(inline_elements) -> Generator[Image, None, None]:
+    """Images of the paragraph in the order they are numbered"""
+    for element in inline_elements:
+        if isinstance(element, Image):
+            yield element
+        elif isinstance(element, _INLINE_CONTAINERS):
+            yield from _images(element.children)
+
+
+def count_numbered(marko_element) -> Counter:
+    """Counts the numbered renderables the element is converted to, by category"""
+    counts = Counter()
+    if isinstance(marko_element, (extended_markdown.Paragraph, Heading)):
+        counts[IMAGE_CATEGORY] = sum(1 for _ in _images(marko_element.children))
+    elif (category := NUMBERED_BLOCKS.get(type(marko_element))) is not None:
+        counts[category] = 1
+    return counts
+
+
+def _image_paths(element) -> Generator[str, None, None]:
+    if isinstance(element, Image):
+        yield element.dest
+    if isinstance(children := getattr(element, "children", None), list):
+        for child in children:
+            yield from _image_paths(child)
+
+
+def _references(element) -> Generator[Reference, None, None]:
+    if isinstance(element, Reference):
+        yield element
+    if isinstance(children := getattr(element, "children", None), list):
+        for child in children:
+            yield from _references(child)
+
+
 class Parser:
     """Parses given markdown string and returns Renderable elements"""
 
-    def __init__(self, document: Document, text: str):
+    def __init__(self, document: Document, text: str, label_numbers: dict[str, tuple[str, int]] | None = None):
         self._document = document
+        self._text = text
         self._parsed = markdown.parse(text)
         self._caption_info: CaptionInfo | None = None
+        if label_numbers is not None:
+            self.label_numbers = label_numbers
 
-    def parse(self) -> Generator[Renderable, None, None]:
-        factory = RenderableFactory(self._document._body)
+    @cached_property
+    def label_numbers(self) -> dict[str, tuple[str, int]]:
+        """
+        Categories and numbers of the labeled elements expected from their order in the markdown, the
+        references to the elements hold the numbers until the elements are numbered, see Reference
+        """
+        numbers = Counter()
+        label_numbers = {}
+        label = None
+        for marko_element in self._parsed.children:
+            if isinstance(marko_element, BlankLine):
+                continue
+            if isinstance(marko_element, Caption):
+                label = marko_element.unique_name
+                continue
+            if (category := NUMBERED_BLOCKS.get(type(marko_element))) is not None:
+                numbers[category] += 1
+                if label is not None:
+                    label_numbers[label] = (category, numbers[category])
+            elif isinstance(marko_element, (extended_markdown.Paragraph, Heading)):
+                for image in _images(marko_element.children):
+                    numbers[IMAGE_CATEGORY] += 1
+                    if image.unique_name is not None:
+                        label_numbers[image.unique_name] = (IMAGE_CATEGORY, numbers[IMAGE_CATEGORY])
+            label = None
+        return label_numbers
+
+    @property
+    def elements(self) -> list[BlockElement]:
+        """Top level markdown elements of the document"""
+        return self._parsed.children
+
+    def image_paths(self) -> Generator[str, None, None]:
+        """Paths or urls of the images of the document in the order they appear"""
+        for marko_element in self._parsed.children:
+            yield from _image_paths(marko_element)
+
+    def elements_from_toc(self) -> list[BlockElement]:
+        """Top level elements from the table of contents on"""
+        children = self._parsed.children
+        return children[next((i for i, child in enumerate(children) if isinstance(child, TOC)), len(children)):]
 
+    def blocks(self) -> list[Block]:
+        """Splits the top level elements into the ones converted to each renderable, see parse"""
+        blocks = []
+        elements = []
         for marko_element in self._parsed.children:
+            if isinstance(marko_element, BlankLine):
+                continue
+            elements.append(marko_element)
+            if not isinstance(marko_element, Caption):
+                blocks.append(Block(elements, self._digest(elements)))
+                elements = []
+        return blocks
+
+    def _digest(self, marko_elements: list[BlockElement]) -> str | None:
+        """Digest of the source of the elements and of the files of their images"""
+        digest = hashlib.blake2b(digest_size=16)
+        for marko_element in marko_elements:
+            if getattr(marko_element, "source_span", None) is None:
+                return None
+            start, end = marko_element.source_span
+            digest.update(self._text[start:end].encode())
+            # the references are laid out with the numbers expected from the rest of the document
+            for reference in _references(marko_element):
+                digest.update(f"@{reference.name}={self.label_numbers.get(reference.name)}".encode())
+            for path in _image_paths(marko_element):
+                if path.startswith("http"):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(os.environ.get("WORKING_DIR", ""), os.path.expanduser(path)))
+                    digest.update(f"{stat.st_mtime_ns}:{stat.st_size}".encode())
+                except OSError:
+                    digest.update(b"missing")
+        return digest.hexdigest()
+
+    def parse(self, marko_elements: Iterable[BlockElement] | None = None) -> Generator[Renderable, None, None]:
+        """Creates the renderables of the top level elements, by default of all the document"""
+        factory = RenderableFactory(self._document._body, self.label_numbers)
+
+        for marko_element in self._parsed.children if marko_elements is None else marko_elements:
             if isinstance(marko_element, BlankLine):
                 continue
 
@@ -28,5 +171,14 @@ class Parser:
                 self._caption_info = CaptionInfo(marko_element.unique_name, marko_element.text)
                 continue
 
-            yield factory.create(marko_element, self._caption_info)
+            renderable = factory.create(marko_element, self._caption_info)
+            if isinstance(renderable, ToC):
+                renderable.reserve(self.estimate_toc())
+            yield renderable
             self._caption_info = None
+
+    def estimate_toc(self) -> list[tuple[int, str, int, bool]]:
+        """Items of the table of contents made of the headings following it, with no pages"""
+        factory = RenderableFactory(self._document._body, self.label_numbers)
+        return [(element.level, factory.text(element.children), 0, element.numbered)
+                for element in self.elements_from_toc() if isinstance(element, Heading)]
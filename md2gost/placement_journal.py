@@ -0,0 +1,141 @@
+import json
+from array import array
+from bisect import bisect_left, bisect_right
+
+from docx.oxml.ns import qn
+from docx.shared import Length, Parented
+from docx.table import Table as DocxTable
+
+_P_STYLE = qn("w:pStyle")
+_VAL = qn("w:val")
+
+
+class PlacementJournal:
+    """
+    Places of the elements added to the body, in the order they are added, kept in columns
+    of arrays: the index of the element among the children of the body, its kind, the page
+    and the offset on it the element starts at, its height and the numbering category and
+    number of the renderable it belongs to.
+
+    The places are the ones of the layout: an element moved to the next page starts where
+    the previous one ends and its height includes the rest of the page, see LayoutState.
+    The elements start in the order they are added, so they are looked up by page and
+    offset with a binary search.
+    """
+    KINDS = ("paragraph", "heading", "table")
+
+    def __init__(self, max_height: Length):
+        self.max_height = max_height
+        self._ids = array("l")
+        self._kinds = array("B")
+        self._pages = array("l")
+        self._offsets = array("q")
+        self._heights = array("q")
+        # categories are kept as indexes of _category_names, 0 stands for no category
+        self._categories = array("H")
+        self._numbers = array("l")
+        self._category_names: list[str | None] = [None]
+        self._category_indexes: dict[str | None, int] = {None: 0}
+        # first elements of the numbered renderables by category and number
+        self._numbered: dict[tuple[str, int], int] = {}
+
+    def __len__(self) -> int:
+        return len(self._pages)
+
+    def append(self, element: Parented, body_index: int, height: Length, page: int, offset: int,
+               numbering: tuple[str, int] | None = None):
+        """
+        Records the element added to the body at body_index and laid out at offset on page,
+        numbering is the one of its renderable
+        """
+        self._ids.append(body_index)
+        self._kinds.append(self._kind(element))
+        self._pages.append(page)
+        self._offsets.append(offset)
+        self._heights.append(height)
+
+        if numbering is None:
+            self._categories.append(0)
+            self._numbers.append(0)
+            return
+        category, number = numbering
+        if (index := self._category_indexes.get(category)) is None:
+            index = self._category_indexes[category] = len(self._category_names)
+            self._category_names.append(category)
+        self._categories.append(index)
+        self._numbers.append(number)
+        self._numbered.setdefault(numbering, len(self._pages) - 1)
+
+    def truncate(self, length: int):
+        """Forgets the elements from the index length on, e.g. removed to be laid out again"""
+        for column in (self._ids, self._kinds, self._pages, self._offsets, self._heights, self._categories, self._numbers):
+            del column[length:]
+        self._numbered = {numbering: index for numbering, index in self._numbered.items() if index < length}
+
+    @classmethod
+    def _kind(cls, element: Parented) -> int:
+        if isinstance(element, DocxTable):
+            return 2
+        p_pr = element._element.pPr
+        style = p_pr.find(_P_STYLE) if p_pr is not None else None
+        return 1 if style is not None and style.get(_VAL, "").startswith("Heading") else 0
+
+    def id(self, index: int) -> int:
+        """Index of the element among the children of the body"""
+        return self._ids[index]
+
+    def kind(self, index: int) -> str:
+        return self.KINDS[self._kinds[index]]
+
+    def page(self, index: int) -> int:
+        return self._pages[index]
+
+    def offset(self, index: int) -> int:
+        return self._offsets[index]
+
+    def height(self, index: int) -> int:
+        return self._heights[index]
+
+    def last_page(self, index: int) -> int:
+        """Page the element ends on"""
+        return self._pages[index] + (self._offsets[index] + max(self._heights[index], 1) - 1) // self.max_height
+
+    def numbering(self, index: int) -> tuple[str, int] | None:
+        """Numbering category and number of the renderable the element belongs to"""
+        if not self._categories[index]:
+            return None
+        return self._category_names[self._categories[index]], self._numbers[index]
+
+    def on_page(self, page: int) -> range:
+        """Indexes of the elements starting on the page"""
+        return range(bisect_left(self._pages, page), bisect_right(self._pages, page))
+
+    def at(self, page: int, offset: int) -> int | None:
+        """Index of the element laid out at offset on page, None if there is none"""
+        elements = self.on_page(page)
+        index = bisect_right(self._offsets, offset, elements.start, elements.stop) - 1
+        if index < 0 or (self._pages[index] - page) * self.max_height + self._offsets[index] \
+                + self._heights[index] <= offset:
+            return None
+        return index
+
+    def find(self, category: str, number: int) -> int | None:
+        """Index of the first element of the renderable numbered number in the category"""
+        return self._numbered.get((category, number))
+
+    def to_json(self) -> dict:
+        """Columns of the journal as lists, along with the height of the page"""
+        return {
+            "max_height": int(self.max_height),
+            "id": self._ids.tolist(),
+            "kind": [self.KINDS[kind] for kind in self._kinds],
+            "page": self._pages.tolist(),
+            "offset": self._offsets.tolist(),
+            "height": self._heights.tolist(),
+            "category": [self._category_names[category] for category in self._categories],
+            "number": self._numbers.tolist(),
+        }
+
+    def save(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_json(), f, ensure_ascii=False)
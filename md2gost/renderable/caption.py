@@ -1,15 +1,17 @@
 from copy import copy
 from dataclasses import dataclass
-from typing import Generator
+from typing import Generator, Iterator
 
-from docx.shared import Parented
+from docx.shared import Length, Parented
 from docx.text.paragraph import Paragraph as DocxParagraph
 from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
 
+from md2gost.layout_plan import ParagraphPlan
 from md2gost.layout_tracker import LayoutState
 from md2gost.renderable import Renderable
 from md2gost.rendered_info import RenderedInfo
 from .paragraph_sizer import ParagraphSizer
+from .style_resolver import get_style_resolver
 from .requires_numbering import RequiresNumbering
 from ..util import create_element
 
@@ -27,7 +29,7 @@ class Caption(Renderable):
         self._before = before
         self._docx_paragraph = DocxParagraph(create_element("w:p"), parent)
 
-        self._docx_paragraph.style = "Caption"
+        get_style_resolver(parent.part).set_paragraph_style(self._docx_paragraph, "Caption")
         self._docx_paragraph.add_run(f"{category} ")
         self._numbering_run = self._docx_paragraph.add_run(str(number) if number else "?")
         if caption_info and caption_info.text:
@@ -36,8 +38,19 @@ class Caption(Renderable):
     def center(self):
         self._docx_paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
 
+    def set_number(self, number: int | None):
+        self._numbering_run.text = str(number) if number else "?"
+
+    def text_paragraphs(self, max_width: Length) -> Iterator[tuple[DocxParagraph, Length]]:
+        yield self._docx_paragraph, max_width
+
     def render(self, previous_rendered: RenderedInfo, layout_state: LayoutState) -> Generator[
         "RenderedInfo | Renderable", None, None]:
+        yield from self.commit(self.measure(previous_rendered, layout_state))
+
+    def measure(self, previous_rendered: RenderedInfo | None, layout_state: LayoutState) -> ParagraphPlan:
+        plan = ParagraphPlan(previous_rendered, copy(layout_state),
+                             page_break_before=bool(self._docx_paragraph.paragraph_format.page_break_before))
         height_data = ParagraphSizer(
             self._docx_paragraph,
             previous_rendered.docx_element
@@ -48,12 +61,18 @@ class Caption(Renderable):
         # if three more lines don't fit, move it to the next page (so there is no only caption on the end of the page)
         if self._before and ((height_data.lines + 2 - 1) * height_data.line_spacing + 1) * height_data.line_height \
                 > layout_state.remaining_page_height:
-            self._docx_paragraph.paragraph_format.page_break_before = True
+            plan.page_break_before = True
             height_data = ParagraphSizer(
                 self._docx_paragraph,
                 None,
                 layout_state.max_width
             ).calculate_height()
 
-        yield RenderedInfo(self._docx_paragraph, height_data.full + (layout_state.remaining_page_height
-                                                                     if self._docx_paragraph.paragraph_format.page_break_before else 0))
+        plan.items.append(RenderedInfo(self._docx_paragraph, height_data.full + (layout_state.remaining_page_height
+                                                                                 if plan.page_break_before else 0)))
+        return plan
+
+    def commit(self, plan: ParagraphPlan) -> list[RenderedInfo]:
+        if plan.page_break_before:
+            self._docx_paragraph.paragraph_format.page_break_before = True
+        return plan.items
@@ -1,11 +1,15 @@
+from copy import copy
 from typing import Generator
 
 from docx.enum.table import WD_CELL_VERTICAL_ALIGNMENT
 from docx.oxml import CT_Tbl
-from docx.shared import Pt, Twips
+from docx.shared import Pt
 from docx.table import Table
 
 from .requires_numbering import RequiresNumbering
+from .style_resolver import get_style_resolver
+from .template_profile import get_template_profile
+from ..layout_plan import LayoutPlan
 from ..layout_tracker import LayoutState
 from ..renderable import Renderable
 from ..rendered_info import RenderedInfo
@@ -17,17 +21,12 @@ _HEIGHT = Pt(50)
 
 
 class Equation(Renderable, RequiresNumbering):
-    def __init__(self, parent, latex_formula: str):
-        super().__init__("Формула")
+    def __init__(self, parent, latex_formula: str, label: str | None = None):
+        super().__init__("Формула", label)
         word_math = latex_to_omml(latex_formula)
 
-        sect = parent.part.document.sections[0]
-
-        # todo: style inheritance
-        left_margin = Twips(int(parent.part.styles["Normal Table"]._element.xpath("w:tblPr/w:tblCellMar/w:left")[0].attrib["{http://schemas.openxmlformats.org/wordprocessingml/2006/main}w"]))
-        right_margin = Twips(int(parent.part.styles["Normal Table"]._element.xpath("w:tblPr/w:tblCellMar/w:right")[0].attrib["{http://schemas.openxmlformats.org/wordprocessingml/2006/main}w"]))
-
-        table_width = sect.page_width - sect.right_margin - sect.left_margin + left_margin + right_margin
+        profile = get_template_profile(parent.part)
+        table_width = profile.text_width + profile.cell_left_margin + profile.cell_right_margin
 
         self._table = table = Table(CT_Tbl.new_tbl(1, 2, table_width), parent)
 
@@ -39,13 +38,14 @@ class Equation(Renderable, RequiresNumbering):
         table.rows[0].height = _HEIGHT  # TODO: implement proper size
 
         left_paragraph = left_cell.paragraphs[0]
-        left_paragraph.style = "Formula Content"
+        style_resolver = get_style_resolver(parent.part)
+        style_resolver.set_paragraph_style(left_paragraph, "Formula Content")
         left_paragraph._p.append(word_math)
         left_cell.vertical_alignment = \
             WD_CELL_VERTICAL_ALIGNMENT.CENTER
 
         right_paragraph = right_cell.paragraphs[0]
-        right_paragraph.style = "Formula Numbering"
+        style_resolver.set_paragraph_style(right_paragraph, "Formula Numbering")
         right_paragraph._p.append(create_element("w:r", "("))
         self._numbering_run = create_element("w:r", "?")
         right_paragraph._p.append(
@@ -61,9 +61,12 @@ class Equation(Renderable, RequiresNumbering):
 
     def render(self, previous_rendered: RenderedInfo, layout_state: LayoutState) -> Generator[
             "RenderedInfo | Renderable", None, None]:
+        yield from self.commit(self.measure(previous_rendered, layout_state))
+
+    def measure(self, previous_rendered: RenderedInfo | None, layout_state: LayoutState) -> LayoutPlan:
         height = _HEIGHT
 
         if height > layout_state.remaining_page_height:
             height += layout_state.remaining_page_height
 
-        yield RenderedInfo(self._table, height)
+        return LayoutPlan(previous_rendered, copy(layout_state), [RenderedInfo(self._table, height)])
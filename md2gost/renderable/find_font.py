@@ -1,36 +1,24 @@
-from sys import platform, exit
-import subprocess
-import logging
+import os
+from sys import platform
 from functools import cache
 
+from .font_catalog import get_font_catalog
 
-def __find_font_linux(name: str, bold: bool, italic: bool):
-    result = subprocess.run(
-        "fc-list", shell=True, check=True, stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE, text=True)
 
-    if result.returncode == 0:
-        fonts = \
-            [line.split(":") for line in result.stdout.strip().split("\n")]
-        fonts = [font for font in fonts if len(font) == 3]
-    else:
-        logging.log(logging.ERROR, "fc-list not found")
-        exit(1)
-
-    for path, names, styles in fonts:
-        if (name in names
-                and ("Bold" in styles) == bool(bold)
-                and ("Italic" in styles) == bool(italic)):
-            return path
-    raise ValueError(f"Font {name} not found")
+def _font_dirs() -> tuple[str, ...]:
+    """Returns project-local font directories, set by --font-dir"""
+    if "FONT_DIRS" not in os.environ:
+        return ()
+    return tuple(directory for directory in os.environ["FONT_DIRS"].split(os.pathsep) if directory)
 
 
 @cache
-def find_font(name: str, bold: bool, italic: bool):
-    if not name:
-        raise ValueError("Invalid font")
+def _find_font(name: str, bold: bool, italic: bool, font_dirs: tuple[str, ...]):
+    path = get_font_catalog(font_dirs).find(name, bold, italic)
+    if path:
+        return path
     if platform == "linux":
-        return __find_font_linux(name, bold, italic)
+        raise ValueError(f"Font {name} not found")
     else:
         from matplotlib.font_manager import findfont, FontProperties
         return findfont(FontProperties(
@@ -39,5 +27,16 @@ def find_font(name: str, bold: bool, italic: bool):
             style="italic" if italic else "normal"), fallback_to_default=False)
 
 
+def fonts_version() -> str:
+    """Identifies the set of the fonts find_font looks through"""
+    return get_font_catalog(_font_dirs()).version
+
+
+def find_font(name: str, bold: bool, italic: bool):
+    if not name:
+        raise ValueError("Invalid font")
+    return _find_font(name, bool(bold), bool(italic), _font_dirs())
+
+
 if __name__ == "__main__":
     print(find_font("Courier New", False, False))
@@ -0,0 +1,181 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from ctypes import byref, c_ubyte
+from functools import cache
+from sys import platform
+
+import freetype
+from freetype import Face
+from freetype.raw import FT_Load_Sfnt_Table
+from freetype.ft_types import FT_ULong
+
+from ..util import cache_dir
+
+FONT_EXTENSIONS = (".ttf", ".otf", ".ttc", ".otc")
+
+_INDEX_VERSION = 2
+
+REGULAR_WEIGHT = 400
+BOLD_WEIGHT = 700
+# faces of this weight and heavier are bold, as in CSS
+_BOLD_THRESHOLD = 600
+_OS2_TAG = int.from_bytes(b"OS/2", "big")
+_WEIGHT_CLASS_OFFSET = 4
+
+
+def system_font_dirs() -> list[str]:
+    if platform == "win32":
+        return [os.path.join(os.environ.get("WINDIR", "C:\\Windows"), "Fonts"),
+                os.path.join(os.environ.get("LOCALAPPDATA", ""), "Microsoft", "Windows", "Fonts")]
+    if platform == "darwin":
+        return ["/System/Library/Fonts", "/Library/Fonts", os.path.expanduser("~/Library/Fonts")]
+    data_home = os.environ.get("XDG_DATA_HOME", os.path.expanduser("~/.local/share"))
+    return ["/usr/share/fonts", "/usr/local/share/fonts", os.path.join(data_home, "fonts"),
+            os.path.expanduser("~/.fonts")]
+
+
+def default_index_path(directories: list[str]) -> str:
+    """Returns the index path in the user cache directory, separate for every set of font directories"""
+    digest = hashlib.sha1("\n".join(os.path.abspath(d) for d in directories).encode()).hexdigest()[:16]
+    return cache_dir(f"fonts-{digest}.json")
+
+
+def _family_names(face: Face) -> set[str]:
+    """Returns all the family names of the face, including the localized ones"""
+    names = {face.family_name.decode(errors="ignore")} if face.family_name else set()
+    for i in range(face.sfnt_name_count):
+        name = face.get_sfnt_name(i)
+        if name.name_id not in (1, 16):  # font family, typographic family
+            continue
+        try:
+            names.add(name.string.decode("utf-16-be" if name.platform_id in (0, 3) else "mac_roman"))
+        except UnicodeDecodeError:
+            pass
+    return names
+
+
+def _weight(face: Face) -> int:
+    """Returns usWeightClass of the OS/2 table of the face, or the weight its style flags imply"""
+    weight_class = (c_ubyte * 2)()
+    length = FT_ULong(len(weight_class))
+    if not FT_Load_Sfnt_Table(face._FT_Face, _OS2_TAG, _WEIGHT_CLASS_OFFSET, weight_class, byref(length)) \
+            and (weight := int.from_bytes(bytes(weight_class), "big")):
+        return weight
+    return BOLD_WEIGHT if face.style_flags & freetype.FT_STYLE_FLAG_BOLD else REGULAR_WEIGHT
+
+
+class FontCatalog:
+    """Index of the font faces found in the font directories by family, weight and style.
+
+    The index is persisted to disk and rebuilt only when the modification time
+    of one of the scanned directories changes. The regular style is looked up among
+    the faces lighter than semibold and the bold one among the heavier faces, the
+    ones of the weight nearest to 400 and 700 are found, e.g. Lato Regular rather
+    than Lato Light. Of the faces of the same weight the ones from the directories
+    listed first take precedence.
+    """
+
+    def __init__(self, directories: list[str], index_path: str | None = None):
+        self._directories = [os.path.abspath(directory) for directory in directories]
+        self._index_path = index_path
+        self._mtimes: dict[str, int] = {}
+        # family, weight, italic and path of every face
+        self._faces: list[tuple[str, int, bool, str]] = []
+        self._paths: dict[tuple[str, bool, bool], str] = {}
+        self.scanned = False
+
+        if not self._load():
+            self._scan()
+            self._save()
+        self._build_lookup()
+
+    @property
+    def version(self) -> str:
+        """Changes whenever a font is added to or removed from the scanned directories"""
+        return hashlib.sha1(json.dumps(sorted(self._mtimes.items())).encode()).hexdigest()
+
+    def find(self, name: str, bold: bool, italic: bool) -> str | None:
+        return self._paths.get((name.casefold(), bool(bold), bool(italic)))
+
+    def _load(self) -> bool:
+        if not self._index_path:
+            return False
+        try:
+            with open(self._index_path, encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return False
+
+        if index.get("version") != _INDEX_VERSION or index.get("roots") != self._directories:
+            return False
+        for directory, mtime in index["directories"].items():
+            try:
+                if os.stat(directory).st_mtime_ns != mtime:
+                    return False
+            except OSError:
+                return False
+        for directory in self._directories:
+            if directory not in index["directories"] and os.path.isdir(directory):
+                return False  # appeared after the index was saved
+
+        self._mtimes = index["directories"]
+        self._faces = [tuple(face) for face in index["faces"]]
+        return True
+
+    def _save(self):
+        if not self._index_path:
+            return
+        index = {
+            "version": _INDEX_VERSION,
+            "roots": self._directories,
+            "directories": self._mtimes,
+            "faces": self._faces,
+        }
+        try:
+            os.makedirs(os.path.dirname(self._index_path), exist_ok=True)
+            # write to a temporary file first, so concurrent conversions never read a partial index
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(self._index_path), suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(index, f)
+            os.replace(temp_path, self._index_path)
+        except OSError as e:
+            logging.warning(f"Can't save the font index: {e}")
+
+    def _scan(self):
+        self.scanned = True
+        for root in self._directories:
+            for directory, _, files in os.walk(root):
+                self._mtimes[directory] = os.stat(directory).st_mtime_ns
+                for file in sorted(files):
+                    if file.lower().endswith(FONT_EXTENSIONS):
+                        self._add_face(os.path.join(directory, file))
+
+    def _add_face(self, path: str):
+        try:
+            face = Face(path)
+        except freetype.FT_Exception:
+            logging.debug(f"Can't load font {path}, skipping...")
+            return
+        weight = _weight(face)
+        italic = bool(face.style_flags & freetype.FT_STYLE_FLAG_ITALIC)
+        for family in sorted(_family_names(face)):
+            self._faces.append((family, weight, italic, path))
+
+    def _build_lookup(self):
+        distances: dict[tuple[str, bool, bool], int] = {}
+        for family, weight, italic, path in self._faces:
+            bold = weight >= _BOLD_THRESHOLD
+            key = (family.casefold(), bold, italic)
+            distance = abs(weight - (BOLD_WEIGHT if bold else REGULAR_WEIGHT))
+            if distance < distances.get(key, distance + 1):
+                distances[key] = distance
+                self._paths[key] = path
+
+
+@cache
+def get_font_catalog(extra_dirs: tuple[str, ...] = ()) -> FontCatalog:
+    directories = list(extra_dirs) + system_font_dirs()
+    return FontCatalog(directories, default_index_path(directories))
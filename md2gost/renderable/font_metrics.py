@@ -0,0 +1,346 @@
+import ctypes
+import json
+import mmap
+import struct
+import sys
+from array import array
+from collections.abc import Sequence
+from bisect import bisect_left
+from functools import cache
+from math import ceil
+from threading import Lock
+from typing import NamedTuple
+
+import freetype
+from freetype import Face
+
+# text with the letter frequencies of a typical report, used to compute average character widths
+_AVERAGE_WIDTH_SAMPLE = (
+    "В данной работе рассматривается разработка программного обеспечения для обработки данных. "
+    "Для решения поставленной задачи был проведен анализ существующих методов, выбраны средства "
+    "реализации и составлен план тестирования. Результаты представлены в таблице 1 и на рисунке 2. "
+    "The system uses a client-server architecture, where the server stores the data in a database."
+)
+
+
+def _load_sfnt_table(face: Face, tag: str) -> bytes | None:
+    """Returns raw bytes of the sfnt table or None if the font has no such table"""
+    tag = freetype.FT_ULong(int.from_bytes(tag.encode(), "big"))
+    length = freetype.FT_ULong(0)
+    if freetype.raw.FT_Load_Sfnt_Table(face._FT_Face, tag, freetype.FT_Long(0), None, ctypes.byref(length))\
+            or not length.value:
+        return None
+    buffer = ctypes.create_string_buffer(length.value)
+    freetype.raw.FT_Load_Sfnt_Table(face._FT_Face, tag, freetype.FT_Long(0), buffer, ctypes.byref(length))
+    return buffer.raw
+
+
+def _read_kerning(face: Face) -> dict[int, int]:
+    """Reads horizontal kerning pairs from the format 0 subtables of the 'kern' table.
+
+    GPOS kerning is not read on purpose: PIL's basic layout, which the widths
+    are expected to match, applies only the 'kern' table.
+    """
+    data = _load_sfnt_table(face, "kern")
+    pairs = {}
+    if not data or len(data) < 4:
+        return pairs
+
+    version, n_tables = struct.unpack_from(">HH", data, 0)
+    if version != 0:  # apple kern tables are not supported
+        return pairs
+
+    offset = 4
+    for _ in range(n_tables):
+        _, length, coverage = struct.unpack_from(">HHH", data, offset)
+        # format 0, horizontal, not minimum, not cross-stream
+        if coverage >> 8 == 0 and coverage & 0b111 == 0b001:
+            n_pairs = struct.unpack_from(">H", data, offset + 6)[0]
+            for i in range(n_pairs):
+                left, right, value = struct.unpack_from(">HHh", data, offset + 14 + i * 6)
+                pairs[left << 16 | right] = value
+        offset += length
+    return pairs
+
+
+class DeviceMetrics(NamedTuple):
+    """Hinted metrics of a face for one size in whole pixels"""
+    advances: Sequence[int]
+    x_mins: Sequence[int]
+    x_maxs: Sequence[int]
+    line_height: int
+
+
+class FontMetrics:
+    """Glyph metrics of a font face.
+
+    Advances are stored in font units in flat arrays sorted by code point. The
+    hinted advances, ink extents and line height, which are what a rasterizer
+    would produce, are computed once per font size, so a text of n characters is
+    measured with n lookups instead of being rasterized.
+    """
+
+    def __init__(self, key: str, family_name: str, units_per_em: int, height: int,
+                 codepoints: Sequence[int], glyphs: Sequence[int], advances: Sequence[int],
+                 kerning_keys: Sequence[int], kerning_values: Sequence[int], face: Face | None = None):
+        self.key = key
+        self.family_name = family_name
+        self.units_per_em = units_per_em
+        self.height = height
+        self._codepoints = codepoints
+        self._glyphs = glyphs
+        self._advances = advances
+        self._kerning_keys = kerning_keys
+        self._kerning_values = kerning_values
+        self._face = face
+        self._lock = Lock()
+        self._indices: dict[str, int] = {}
+        self._device_metrics: dict[int, DeviceMetrics] = {}
+        self._average_widths: dict[int, float] = {}
+
+    @classmethod
+    def from_face(cls, key: str, face: Face) -> "FontMetrics":
+        codepoints, glyphs, advances = array("I"), array("H"), array("H")
+        chars = dict(face.get_chars())
+        chars.setdefault(0, 0)  # characters missing in the font are drawn with the notdef glyph
+        for codepoint, glyph in sorted(chars.items()):
+            face.load_glyph(glyph, freetype.FT_LOAD_NO_SCALE)
+            codepoints.append(codepoint)
+            glyphs.append(glyph)
+            advances.append(face.glyph.metrics.horiAdvance)
+
+        kerning = _read_kerning(face)
+        kerning_keys = array("I", sorted(kerning))
+        kerning_values = array("h", [kerning[key] for key in kerning_keys])
+
+        return cls(key, face.family_name.decode(), face.units_per_EM, face.height,
+                   codepoints, glyphs, advances, kerning_keys, kerning_values, face)
+
+    def _index(self, char: str) -> int:
+        index = self._indices.get(char)
+        if index is None:
+            codepoint = ord(char)
+            index = bisect_left(self._codepoints, codepoint)
+            if index == len(self._codepoints) or self._codepoints[index] != codepoint:
+                index = 0  # notdef
+            self._indices[char] = index
+        return index
+
+    def _kerning(self, left_glyph: int, right_glyph: int) -> int:
+        key = left_glyph << 16 | right_glyph
+        index = bisect_left(self._kerning_keys, key)
+        if index != len(self._kerning_keys) and self._kerning_keys[index] == key:
+            return self._kerning_values[index]
+        return 0
+
+    def _get_device_metrics(self, size: int) -> DeviceMetrics:
+        """Returns the metrics for the size in 26.6 fixed point"""
+        if (device_metrics := self._device_metrics.get(size)) is not None:
+            return device_metrics
+
+        with self._lock:
+            if (device_metrics := self._device_metrics.get(size)) is not None:
+                return device_metrics
+
+            advances, x_mins, x_maxs = array("h"), array("h"), array("h")
+            if self._face:
+                # hinted metrics are grid-fitted, so they are stored in whole pixels
+                self._face.set_char_size(size)
+                for glyph in self._glyphs:
+                    self._face.load_glyph(glyph, freetype.FT_LOAD_DEFAULT)
+                    metrics = self._face.glyph.metrics
+                    advances.append(self._face.glyph.advance.x >> 6)
+                    x_mins.append(metrics.horiBearingX >> 6)
+                    x_maxs.append((metrics.horiBearingX + metrics.width) >> 6)
+                line_height = self._face.size.height >> 6
+            else:
+                # no face to hint the glyphs with, round the scaled metrics to whole pixels instead
+                for advance in self._advances:
+                    advances.append(round(advance * size / 64 / self.units_per_em))
+                x_mins.extend(0 for _ in self._advances)
+                x_maxs.extend(advances)
+                line_height = round(self.height * size / 64 / self.units_per_em)
+
+            self._device_metrics[size] = device_metrics = DeviceMetrics(advances, x_mins, x_maxs, line_height)
+            return device_metrics
+
+    def has_hinted_metrics(self, size_pt: float) -> bool:
+        """Whether the metrics for the size are hinted, otherwise they are approximated by scaling"""
+        return self._face is not None or int(size_pt * 64) in self._device_metrics
+
+    def get_advance(self, char: str, size_pt: float) -> int:
+        """Returns the hinted advance of the character in points"""
+        return self._get_device_metrics(int(size_pt * 64)).advances[self._index(char)]
+
+    def get_line_height(self, size_pt: float) -> int:
+        """Returns the hinted line height in points"""
+        return self._get_device_metrics(int(size_pt * 64)).line_height
+
+    def get_average_width(self, size_pt: float) -> float:
+        """Returns the average advance of a character in the words of a typical text in points"""
+        size = int(size_pt * 64)
+        if (average_width := self._average_widths.get(size)) is None:
+            advances = self._get_device_metrics(size).advances
+            average_width = sum(advances[self._index(char)] for char in _AVERAGE_WIDTH_SAMPLE if char != " ") \
+                / (len(_AVERAGE_WIDTH_SAMPLE) - _AVERAGE_WIDTH_SAMPLE.count(" "))
+            self._average_widths[size] = average_width
+        return average_width
+
+    def get_text_width(self, text: str, size_pt: float) -> float:
+        """Returns the width of the text bounding box in points, the way PIL's basic layout computes it"""
+        size = int(size_pt * 64)
+        device_metrics = self._get_device_metrics(size)
+        advances, x_mins, x_maxs = device_metrics.advances, device_metrics.x_mins, device_metrics.x_maxs
+        kerning = bool(self._kerning_keys)
+        scale = size / self.units_per_em
+
+        # the pen position is kept in 26.6 fixed point, as the kerning is
+        pen = left = right = 0
+        previous_glyph = 0
+        for char in text:
+            index = self._index(char)
+            glyph = self._glyphs[index]
+            if kerning and previous_glyph and glyph:
+                # PIL adds the kerning rounded to whole pixels to 26.6 advances
+                pen += (round(self._kerning(previous_glyph, glyph) * scale) + 32) >> 6
+            left = min(left, pen + (x_mins[index] << 6))
+            right = max(right, pen + (x_maxs[index] << 6))
+            pen += advances[index] << 6
+            previous_glyph = glyph
+        return ceil((max(pen, right) - left) / 64)
+
+
+@cache
+def get_font_metrics(path: str) -> FontMetrics:
+    return FontMetrics.from_face(path, Face(path))
+
+
+SNAPSHOT_MAGIC = b"MD2GOSTM"
+_SNAPSHOT_VERSION = 1
+_ALIGNMENT = 8
+
+
+def save_snapshot(path: str, fonts: dict[tuple[str, bool, bool], FontMetrics], sizes_pt: list[float]):
+    """Saves the metrics of the fonts for the given sizes to a binary snapshot.
+
+    The snapshot consists of the magic, a JSON header prefixed with its length
+    and the raw arrays aligned to 8 bytes, which the header refers to by offset.
+    """
+    blobs = []
+    offset = 0
+    references: dict[int, list] = {}
+
+    def add_array(values: Sequence[int]) -> list:
+        nonlocal offset
+        key = id(values)
+        if key in references:  # several styles may resolve to the same font file
+            return references[key]
+        typecode = values.typecode if isinstance(values, array) else values.format
+        if typecode == "h" and all(-128 <= value <= 127 for value in values):
+            values, typecode = array("b", values), "b"  # pixel metrics of small sizes fit into a byte
+        data = values.tobytes()
+        blobs.append(data + bytes(-len(data) % _ALIGNMENT))
+        references[key] = reference = [offset, len(values), typecode]
+        offset += len(blobs[-1])
+        return reference
+
+    faces = []
+    for (family, bold, italic), metrics in fonts.items():
+        sizes = {}
+        for size_pt in sizes_pt:
+            size = int(size_pt * 64)
+            device_metrics = metrics._get_device_metrics(size)
+            sizes[str(size)] = {
+                "advances": add_array(device_metrics.advances),
+                "x_mins": add_array(device_metrics.x_mins),
+                "x_maxs": add_array(device_metrics.x_maxs),
+                "line_height": device_metrics.line_height,
+            }
+        faces.append({
+            "family": family,
+            "bold": bold,
+            "italic": italic,
+            "family_name": metrics.family_name,
+            "units_per_em": metrics.units_per_em,
+            "height": metrics.height,
+            "codepoints": add_array(metrics._codepoints),
+            "glyphs": add_array(metrics._glyphs),
+            "advances": add_array(metrics._advances),
+            "kerning_keys": add_array(metrics._kerning_keys),
+            "kerning_values": add_array(metrics._kerning_values),
+            "sizes": sizes,
+        })
+
+    header = json.dumps({
+        "version": _SNAPSHOT_VERSION,
+        "byteorder": sys.byteorder,
+        "faces": faces,
+    }).encode()
+    header += b" " * (-(len(SNAPSHOT_MAGIC) + 4 + len(header)) % _ALIGNMENT)
+
+    with open(path, "wb") as f:
+        f.write(SNAPSHOT_MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        for blob in blobs:
+            f.write(blob)
+
+
+class FontMetricsSnapshot:
+    """Font metrics loaded from a snapshot created by save_snapshot.
+
+    The file is memory-mapped read-only and the metrics arrays are views into
+    the mapping, so processes using the same snapshot share a single copy of
+    the tables in the page cache instead of each loading its own.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            try:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # empty file
+                raise ValueError(f"{path} is not a font metrics snapshot")
+        data = memoryview(self._mmap)
+
+        if data[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not a font metrics snapshot")
+        header_length = struct.unpack_from("<I", data, len(SNAPSHOT_MAGIC))[0]
+        header_end = len(SNAPSHOT_MAGIC) + 4 + header_length
+        header = json.loads(bytes(data[len(SNAPSHOT_MAGIC) + 4:header_end]))
+        if header["version"] != _SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported font metrics snapshot version {header['version']}")
+        swap = header["byteorder"] != sys.byteorder
+
+        def get_array(reference: list) -> memoryview | array:
+            offset, length, typecode = reference
+            itemsize = array(typecode).itemsize
+            values = data[header_end + offset:header_end + offset + length * itemsize]
+            if swap:  # a snapshot from a machine with another byte order can't be used in place
+                values = array(typecode, values.tobytes())
+                values.byteswap()
+                return values
+            return values.cast(typecode)
+
+        self._fonts: dict[tuple[str, bool, bool], FontMetrics] = {}
+        for face in header["faces"]:
+            metrics = FontMetrics(
+                f"{path}:{face['family']}:{face['bold']}:{face['italic']}",
+                face["family_name"], face["units_per_em"], face["height"],
+                get_array(face["codepoints"]), get_array(face["glyphs"]), get_array(face["advances"]),
+                get_array(face["kerning_keys"]), get_array(face["kerning_values"]))
+            for size, device_metrics in face["sizes"].items():
+                metrics._device_metrics[int(size)] = DeviceMetrics(
+                    get_array(device_metrics["advances"]), get_array(device_metrics["x_mins"]),
+                    get_array(device_metrics["x_maxs"]), device_metrics["line_height"])
+            self._fonts[(face["family"].casefold(), face["bold"], face["italic"])] = metrics
+
+    def get(self, name: str, bold: bool, italic: bool) -> FontMetrics | None:
+        return self._fonts.get((name.casefold(), bool(bold), bool(italic)))
+
+    def __len__(self):
+        return len(self._fonts)
+
+
+@cache
+def load_snapshot(path: str) -> FontMetricsSnapshot:
+    return FontMetricsSnapshot(path)
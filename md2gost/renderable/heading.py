@@ -1,11 +1,10 @@
 from copy import copy
-from typing import Generator
 
 from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
 from docx.text.paragraph import Paragraph as DocxParagraph
 from docx.shared import Parented, Length
 
-from .paragraph_sizer import ParagraphSizer
+from ..layout_plan import ParagraphPlan
 from ..layout_tracker import LayoutState
 from .paragraph import Paragraph
 from ..rendered_info import RenderedInfo
@@ -62,20 +61,17 @@ class Heading(Paragraph):
             ])
         )
 
-    def render(self, previous_rendered: RenderedInfo, layout_state: LayoutState)\
-            -> Generator[RenderedInfo | SubRenderable, None, None]:
+    def measure(self, previous_rendered: RenderedInfo | None, layout_state: LayoutState) -> ParagraphPlan:
+        plan = ParagraphPlan(previous_rendered, copy(layout_state), page_break_before=bool(self.page_break_before))
+        layout_state = copy(layout_state)
         remaining_height = layout_state.remaining_page_height
 
         if self._level == 1 and layout_state.page != 1 and\
                 not (isinstance(previous_rendered.docx_element, DocxParagraph)
                      and previous_rendered.docx_element.text == "\n"):
-            self.page_break_before = True
+            plan.page_break_before = True
 
-        height_data = ParagraphSizer(
-            self._docx_paragraph,
-            previous_rendered.docx_element
-            if previous_rendered and isinstance(previous_rendered.docx_element, DocxParagraph) else None,
-            layout_state.max_width).calculate_height()
+        height_data = self._calculate_height(previous_rendered, layout_state.max_width)
 
         if layout_state.current_page_height == 0 and layout_state.page != 1:
             height_data.before = 0
@@ -83,19 +79,28 @@ class Heading(Paragraph):
         # if a heading + 3 lines don't fit to the page, they go to the next page
         if ((height_data.lines + 3 - 1) * height_data.line_spacing + 1) * height_data.line_height\
                 > layout_state.remaining_page_height:
-            self._docx_paragraph.paragraph_format.space_before = 0  # libreoffice fix
+            plan.remove_space_before = True  # libreoffice fix
             height = height_data.full - height_data.before
 
             # force this behaviour as there could be a table or an image instead of text
-            self.page_break_before = True
+            plan.page_break_before = True
 
         else:
             height = height_data.full
 
-        if self.page_break_before:
+        if plan.page_break_before:
             height += remaining_height
 
         layout_state.add_height(height)
-        self._rendered_page = layout_state.page
+        plan.page = layout_state.page
 
-        yield RenderedInfo(self._docx_paragraph, Length(height))
+        plan.items.append(RenderedInfo(self._docx_paragraph, Length(height)))
+        return plan
+
+    def commit(self, plan: ParagraphPlan) -> list[RenderedInfo | SubRenderable]:
+        if plan.remove_space_before:
+            self._docx_paragraph.paragraph_format.space_before = 0
+        if plan.page_break_before:
+            self.page_break_before = True
+        self._rendered_page = plan.page
+        return plan.items
@@ -1,27 +1,47 @@
 import logging
 from copy import copy
+from dataclasses import dataclass
 from io import BytesIO
-from typing import Generator
+from typing import Generator, Iterator
 from os import environ
 import os.path
 
 import requests
 from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+from docx.image.exceptions import UnrecognizedImageError
 from docx.shared import Parented, Length
 from docx.text.paragraph import Paragraph
 
 from .caption import Caption, CaptionInfo
 from .renderable import Renderable
 from .requires_numbering import RequiresNumbering
+from ..layout_plan import LayoutPlan
 from ..layout_tracker import LayoutState
 from ..rendered_info import RenderedInfo
 from ..sub_renderable import SubRenderable
 from ..util import create_element
 
+# seconds to wait for the server of an image, see requests.get
+DOWNLOAD_TIMEOUT = 10
+
+
+def _image_path(path: str) -> str:
+    return os.path.join(environ['WORKING_DIR'], os.path.expanduser(path))
+
+
+def read_image(path: str) -> bytes:
+    """Content of the image at the url or at the path relative to the markdown file"""
+    if path.startswith("http"):
+        response = requests.get(path, timeout=DOWNLOAD_TIMEOUT)
+        response.raise_for_status()
+        return response.content
+    with open(_image_path(path), "rb") as f:
+        return f.read()
+
 
 class Image(Renderable, RequiresNumbering):
     def __init__(self, parent: Parented, path: str, caption_info: CaptionInfo | None = None):
-        super().__init__("Рисунок")
+        super().__init__("Рисунок", caption_info.unique_name if caption_info else None)
         self._parent = parent
         self._caption_info = caption_info
         self._docx_paragraph = Paragraph(create_element("w:p"), parent)
@@ -34,50 +54,72 @@ class Image(Renderable, RequiresNumbering):
 
         run = self._docx_paragraph.add_run()
 
-        if path.startswith("http"):
-            bytesio = BytesIO()
-            bytesio.write(requests.get(path).content)
-            self._image = run.add_picture(bytesio)
-        else:
-            try:
-                self._image = run.add_picture(os.path.join(environ['WORKING_DIR'], os.path.expanduser(path)))
-            except FileNotFoundError:
-                logging.warning(f"Invalid image path: {path}, skipping...")
-                self._invalid = True
+        try:
+            # the picture is named after the file it's added from
+            self._image = run.add_picture(BytesIO(read_image(path)) if path.startswith("http") else _image_path(path))
+        except (FileNotFoundError, requests.RequestException, UnrecognizedImageError) as e:
+            logging.warning(f"Invalid image path: {path} ({e}), skipping...")
+            self._invalid = True
 
         self._number = None
+        self._caption = Caption(self._parent, "Рисунок", self._caption_info, self._number, False)
+        self._caption.center()
 
     def set_number(self, number: int):
         self._number = number
+        self._caption.set_number(number)
+
+    def text_paragraphs(self, max_width: Length) -> Iterator[tuple[Paragraph, Length]]:
+        if not self._invalid:
+            yield from self._caption.text_paragraphs(max_width)
 
     def render(self, previous_rendered: RenderedInfo, layout_state: LayoutState)\
             -> Generator[RenderedInfo | SubRenderable, None, None]:
+        yield from self.commit(self.measure(previous_rendered, layout_state))
+
+    def measure(self, previous_rendered: RenderedInfo | None, layout_state: LayoutState) -> "ImagePlan":
+        plan = ImagePlan(previous_rendered, copy(layout_state))
         if self._invalid:
-            yield from []
-            return
+            return plan
+
+        width, height = self._image.width, self._image.height
 
         # limit width
-        if self._image.width > layout_state.max_width:
-            height_by_width = self._image.height / self._image.width
-            self._image.width = layout_state.max_width
-            self._image.height = Length(self._image.width * height_by_width)
+        if width > layout_state.max_width:
+            height_by_width = height / width
+            width = layout_state.max_width
+            height = Length(width * height_by_width)
 
         # limit height
-        if self._image.height > layout_state.max_height:
-            width_by_height = self._image.width / self._image.height
-            self._image.height = layout_state.max_height
-            self._image.width = Length(self._image.height * width_by_height)
+        if height > layout_state.max_height:
+            width_by_height = width / height
+            height = layout_state.max_height
+            width = Length(height * width_by_height)
 
-        height = self._image.height
+        plan.width, plan.height = width, height
 
         if layout_state.remaining_page_height < height:
             height += layout_state.remaining_page_height
 
-        yield (rendered_image := RenderedInfo(self._docx_paragraph, Length(height)))
+        plan.items.append(rendered_image := RenderedInfo(self._docx_paragraph, Length(height)))
 
+        layout_state = copy(layout_state)
         layout_state.add_height(rendered_image.height)
 
-        caption = Caption(self._parent, "Рисунок", self._caption_info, self._number, False)
-        caption.center()
+        plan.caption_plan = self._caption.measure(rendered_image, layout_state)
+        plan.items.extend(plan.caption_plan.items)
+        return plan
+
+    def commit(self, plan: "ImagePlan") -> list[RenderedInfo]:
+        if not self._invalid:
+            self._image.width, self._image.height = plan.width, plan.height
+            self._caption.commit(plan.caption_plan)
+        return plan.items
+
 
-        yield from caption.render(rendered_image, copy(layout_state))
+@dataclass(slots=True)
+class ImagePlan(LayoutPlan):
+    """Layout of an image along with its size limited by the page and the layout of its caption"""
+    width: Length | None = None
+    height: Length | None = None
+    caption_plan: LayoutPlan | None = None
@@ -0,0 +1,94 @@
+"""Greedy line breaker working on word widths as arrays.
+
+It is an alternative to the character loop of ParagraphSizer.count_lines and
+gives exactly the same results: runs are split into words with a regular
+expression, and the words fitting on a line are found with a cumulative sum
+instead of being added one by one. Requires numpy.
+"""
+import re
+from collections.abc import Iterable
+from math import ceil
+from typing import TYPE_CHECKING
+
+import numpy as np
+from docx.shared import Length
+
+if TYPE_CHECKING:
+    from .paragraph_sizer import Font
+
+_SEGMENT = re.compile(" +|[^ ]+")
+
+# words per cumulative sum, a line of body text holds about ten of them
+_CHUNK = 32
+
+
+def tokenize(run_texts: Iterable[tuple[str, "Font"]]) -> tuple[list[int], list[float]]:
+    """Returns the number of spaces before each word and the width of each word.
+
+    A word may span several runs, its parts are measured with the fonts of their runs.
+    """
+    from .paragraph_sizer import word_width_cache
+
+    spaces, widths = [], []
+    word_part = ""
+    word_parts_widths = [0]
+    n_spaces = 0
+    for run_text, font in run_texts:
+        if word_part:
+            word_part = ""
+            word_parts_widths.append(0)
+
+        for segment in _SEGMENT.findall(run_text):
+            if segment[0] != " ":
+                word_part += segment
+                word_parts_widths[-1] = word_width_cache.get_text_width(font, word_part)
+            elif any(word_parts_widths):
+                spaces.append(n_spaces)
+                widths.append(sum(word_parts_widths))
+                word_part = ""
+                word_parts_widths = [0]
+                n_spaces = len(segment)
+            else:
+                # words of zero width don't count, the spaces around them are merged
+                n_spaces += len(segment)
+
+    return spaces, widths
+
+
+def count_lines(spaces: list[int], widths: list[float], space_width: float, max_width: Length,
+                first_line_indent: Length) -> int:
+    """Returns the number of lines the words take when broken greedily"""
+    words = np.asarray(widths, dtype=np.float64)
+    widths_with_spaces = np.asarray(spaces, dtype=np.float64) * space_width + words
+
+    lines = 1
+    line_width = first_line_indent
+    i = 0
+    while i < len(widths_with_spaces):
+        chunk = widths_with_spaces[i:i + _CHUNK]
+        # line widths before each word of the chunk, summed in the same order as the words are added
+        line_widths = np.cumsum(np.concatenate(([line_width], chunk)))
+        fits = chunk <= max_width - line_widths[:-1]
+        if fits.all():
+            line_width = float(line_widths[-1])
+            i += len(chunk)
+            continue
+
+        j = int(np.argmin(fits))
+        line_width = float(line_widths[j])
+        i += j
+        width = float(chunk[j])
+        if width > max_width - first_line_indent:
+            # the word is longer than the line, so it is broken
+            if lines == 1 and line_width == first_line_indent and not spaces[i]:
+                lines += ceil((width - (max_width - first_line_indent)) / max_width)
+                line_width = (width - (max_width - first_line_indent)) % max_width
+            else:
+                lines += ceil(width / max_width)
+                line_width = width % max_width
+        else:
+            lines += 1
+            line_width = float(words[i])
+        i += 1
+
+    return lines
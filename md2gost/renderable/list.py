@@ -1,10 +1,14 @@
 from copy import copy
-from typing import Generator
+from typing import Generator, Iterator
 
-from docx.shared import Pt, Cm, Twips
+from docx.shared import Length, Pt, Cm, Twips
+from docx.text.paragraph import Paragraph as DocxParagraph
 
 from . import Paragraph
+from .reference import Reference
 from .renderable import Renderable
+from .style_resolver import get_style_resolver
+from ..layout_plan import LayoutPlan
 from ..layout_tracker import LayoutState
 from ..rendered_info import RenderedInfo
 
@@ -17,7 +21,6 @@ class List(Renderable):
         self._parent = parent
         self._ordered = ordered
         self._paragraphs: list[Paragraph] = []
-        self._last_paragraph_space_after = 0
 
         self._numbering = [0 for _ in range(10)]
 
@@ -30,26 +33,40 @@ class List(Renderable):
         paragraph.add_run((f"{self._numbering[level-1]}." if self._ordered else "●")+"\t")
 
         # first level indent is a first_line_indent of normal text
-        first_indent = self._parent.part.styles["Normal"].paragraph_format.first_line_indent
+        style_resolver = get_style_resolver(self._parent.part)
+        first_indent = style_resolver.style_paragraph_format(style_resolver.get_style("Normal").styleId).first_line_indent
 
         # idk how it works but it works
         paragraph._docx_paragraph.paragraph_format.tab_stops.add_tab_stop(Twips(360))
         paragraph._docx_paragraph.paragraph_format.left_indent = (Twips(425) + (first_indent or 0) + LEVEL_INDENT*(level-1))
         paragraph._docx_paragraph.paragraph_format.first_line_indent = -Twips(425)
 
-        self._last_paragraph_space_after = paragraph._docx_paragraph.paragraph_format.space_after
         paragraph._docx_paragraph.paragraph_format.space_before = 0
-        paragraph._docx_paragraph.paragraph_format.space_after = 0
+        # only the last item keeps the space after of its style
+        if self._paragraphs:
+            self._paragraphs[-1]._docx_paragraph.paragraph_format.space_after = 0
 
         self._paragraphs.append(paragraph)
         return paragraph
 
+    def text_paragraphs(self, max_width: Length) -> Iterator[tuple[DocxParagraph, Length]]:
+        for paragraph in self._paragraphs:
+            yield from paragraph.text_paragraphs(max_width)
+
+    def references(self) -> Iterator[Reference]:
+        for paragraph in self._paragraphs:
+            yield from paragraph.references()
+
     def render(self, previous_rendered: RenderedInfo, layout_state: LayoutState) -> Generator[
             RenderedInfo | Renderable, None, None]:
-        self._paragraphs[-1]._docx_paragraph.paragraph_format.space_after = self._last_paragraph_space_after
+        yield from self.commit(self.measure(previous_rendered, layout_state))
 
+    def measure(self, previous_rendered: RenderedInfo | None, layout_state: LayoutState) -> LayoutPlan:
+        plan = LayoutPlan(previous_rendered, copy(layout_state))
+        layout_state = copy(layout_state)
         for paragraph in self._paragraphs:
-            for x in paragraph.render(previous_rendered, copy(layout_state)):
+            for x in paragraph.measure(previous_rendered, layout_state).items:
                 layout_state.add_height(x.height)
                 previous_rendered = x
-                yield x
+                plan.items.append(x)
+        return plan
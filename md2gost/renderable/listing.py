@@ -1,10 +1,12 @@
 from copy import copy
+from dataclasses import dataclass, field
 import os
-from typing import Generator, Callable
+from typing import Generator, Callable, Iterator
 
 from docx.oxml import CT_Tbl
 from docx.shared import Length, Pt, RGBColor, Twips
 from docx.table import Table
+from docx.text.paragraph import Paragraph as DocxParagraph
 
 from pygments import highlight
 from pygments.formatter import Formatter
@@ -12,9 +14,12 @@ from pygments.lexers import get_lexer_by_name
 
 from .caption import Caption, CaptionInfo
 from .paragraph import Paragraph
+from .paragraph_sizer import ParagraphSizer
 from .renderable import Renderable
 from .requires_numbering import RequiresNumbering
+from .template_profile import get_template_profile
 from ..docx_elements import create_table
+from ..layout_plan import LayoutPlan
 from ..layout_tracker import LayoutState
 from ..rendered_info import RenderedInfo
 from ..sub_renderable import SubRenderable
@@ -51,7 +56,7 @@ LISTING_OFFSET = Pt(31) - Twips(108 * 2)  # todo: fix
 
 class Listing(Renderable, RequiresNumbering):
     def __init__(self, parent, language: str, caption_info: CaptionInfo):
-        super().__init__("Листинг")
+        super().__init__("Листинг", caption_info.unique_name if caption_info else None)
         self._caption_info = caption_info
         self._language = language
         self._parent = parent
@@ -59,15 +64,8 @@ class Listing(Renderable, RequiresNumbering):
         self._number = None
 
     def _create_table(self, parent, width: Length):
-        # todo: style inheritance
-        left_margin = Twips(int(
-            parent.part.styles["Normal Table"]._element.xpath("w:tblPr/w:tblCellMar/w:left")[0].attrib[
-                "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}w"]))
-        right_margin = Twips(int(
-            parent.part.styles["Normal Table"]._element.xpath("w:tblPr/w:tblCellMar/w:right")[0].attrib[
-                "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}w"]))
-
-        return create_table(parent, 1, 1, width + left_margin + right_margin)
+        profile = get_template_profile(parent.part)
+        return create_table(parent, 1, 1, width + profile.cell_left_margin + profile.cell_right_margin)
 
     def set_text(self, text: str):
         def create_paragraph() -> Paragraph:
@@ -89,63 +87,94 @@ class Listing(Renderable, RequiresNumbering):
     def set_number(self, number: int):
         self._number = number
 
+    def _create_caption(self) -> Caption:
+        return Caption(self._parent, "Листинг", self._caption_info, self._number, True)
+
+    def _create_continuation(self) -> Paragraph:
+        """Caption of the part of the listing continued on the next page"""
+        paragraph = Paragraph(self._parent)
+        paragraph.add_run(f"Продолжение листинга {self._number}")
+        paragraph.style = "Caption"
+        paragraph.first_line_indent = 0
+        paragraph.page_break_before = True
+        return paragraph
+
+    def text_paragraphs(self, max_width: Length) -> Iterator[tuple[DocxParagraph, Length]]:
+        yield from self._create_caption().text_paragraphs(max_width)
+        # the same for all the parts, measured even if the listing isn't split
+        yield from self._create_continuation().text_paragraphs(max_width)
+        for paragraph in self.paragraphs:
+            yield from paragraph.text_paragraphs(max_width - LISTING_OFFSET)
+
     def render(self, previous_rendered: RenderedInfo, layout_state: LayoutState)\
             -> Generator[RenderedInfo | SubRenderable, None, None]:
-        caption_rendered_infos = list(
-            Caption(self._parent, "Листинг", self._caption_info, self._number, True)
-            .render(previous_rendered, copy(layout_state))
-        )
-        layout_state.add_height(sum([info.height for info in caption_rendered_infos]))
-        yield from caption_rendered_infos
+        yield from self.commit(self.measure(previous_rendered, layout_state))
+
+    def measure(self, previous_rendered: RenderedInfo | None, layout_state: LayoutState) -> "ListingPlan":
+        plan = ListingPlan(previous_rendered, copy(layout_state), caption=self._create_caption())
+        layout_state = copy(layout_state)
+        plan.caption_plan = plan.caption.measure(previous_rendered, layout_state)
+        plan.items.extend(plan.caption_plan.items)
+        layout_state.add_height(sum([info.height for info in plan.caption_plan.items]))
 
-        table = self._create_table(self._parent, layout_state.max_width)
-        previous = None
+        # the tables of the parts are created once the plan is committed
+        plan.parts.append(0)
 
         table_height = Pt(1)  # table borders, 4 eights of point for each border
 
+        max_width = layout_state.max_width - LISTING_OFFSET
+        heights = ParagraphSizer.calculate_heights([paragraph._docx_paragraph for paragraph in self.paragraphs],
+                                                   max_width)
+
         # if first line doesn't fit move listing to the next page
-        paragraph_layout_state = copy(layout_state)
-        paragraph_layout_state.max_width -= LISTING_OFFSET
-        paragraph_rendered_info = next(self.paragraphs[0].render(previous, paragraph_layout_state))
-        if paragraph_rendered_info.height + table_height > layout_state.remaining_page_height:
+        if Paragraph.split_height(heights[0], layout_state) + table_height > layout_state.remaining_page_height:
             table_height += layout_state.remaining_page_height
             layout_state.add_height(layout_state.remaining_page_height)
 
-        for paragraph in self.paragraphs:
-            paragraph_layout_state = copy(layout_state)
-            paragraph_layout_state.max_width -= LISTING_OFFSET
-            paragraph_rendered_info = next(paragraph.render(previous, paragraph_layout_state))
+        for i, (paragraph, height_data) in enumerate(zip(self.paragraphs, heights)):
+            height = Paragraph.split_height(height_data, layout_state)
 
-            if paragraph_rendered_info.height > layout_state.remaining_page_height:  # todo add before after
-                table_rendered_info = RenderedInfo(table, table_height)
-                yield table_rendered_info
+            if height > layout_state.remaining_page_height:  # todo add before after
+                plan.items.append(RenderedInfo(None, table_height))
 
                 table_height = Pt(1)  # table borders, 4 eights of point for each border
 
-                continuation_paragraph = Paragraph(self._parent)
-                continuation_paragraph.add_run(f"Продолжение листинга {self._number}")
-                continuation_paragraph.style = "Caption"
-                continuation_paragraph.first_line_indent = 0
-                continuation_paragraph.page_break_before = True
-
-                continuation_rendered_info = next(
-                    continuation_paragraph.render(None, copy(layout_state)))
+                continuation_rendered_info = self._create_continuation().measure(None, layout_state).items[0]
 
                 layout_state.add_height(continuation_rendered_info.height)
-                yield continuation_rendered_info
-
-                table = self._create_table(self._parent, layout_state.max_width)
-
-                previous = None
-
-                paragraph_layout_state = copy(layout_state)
-                paragraph_layout_state.max_width -= LISTING_OFFSET
-                paragraph_rendered_info = next(paragraph.render(previous, paragraph_layout_state))
-
-            table._cells[0]._element.append(paragraph_rendered_info.docx_element._element)
-            layout_state.add_height(paragraph_rendered_info.height)
-            table_height += paragraph_rendered_info.height
-
-            previous = paragraph_rendered_info
-
-        yield RenderedInfo(table, table_height)
+                plan.items.append(continuation_rendered_info)
+
+                plan.parts.append(i)
+
+                # it was measured following the previous line
+                height = Paragraph.split_height(
+                    ParagraphSizer(paragraph._docx_paragraph, None, max_width).calculate_height(), layout_state)
+
+            layout_state.add_height(height)
+            table_height += height
+
+        plan.items.append(RenderedInfo(None, table_height))
+        return plan
+
+    def commit(self, plan: "ListingPlan") -> list[RenderedInfo]:
+        plan.caption.commit(plan.caption_plan)
+        tables = []
+        for start, end in zip(plan.parts, plan.parts[1:] + [len(self.paragraphs)]):
+            table = self._create_table(self._parent, plan.layout_state.max_width)
+            for paragraph in self.paragraphs[start:end]:
+                table._cells[0]._element.append(paragraph._docx_paragraph._element)
+            tables.append(table)
+        tables = iter(tables)
+        return [RenderedInfo(next(tables), info.height) if info.docx_element is None else info
+                for info in plan.items]
+
+
+@dataclass(slots=True)
+class ListingPlan(LayoutPlan):
+    """
+    Layout of a listing: its caption and the index of the first line of each part its lines are split
+    into between the pages. The items of the parts have no element, the commit creates their tables.
+    """
+    caption: Caption | None = None
+    caption_plan: LayoutPlan | None = None
+    parts: list[int] = field(default_factory=list)
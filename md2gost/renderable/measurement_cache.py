@@ -0,0 +1,138 @@
+import atexit
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from functools import cache
+from threading import Lock
+
+from ..util import cache_dir
+
+_SCHEMA_VERSION = 1
+# bumped whenever the way paragraphs are measured changes, so stale measurements are not used
+MEASUREMENT_VERSION = 2
+
+
+def default_cache_path() -> str:
+    return cache_dir("measurements.sqlite")
+
+
+class MeasurementCache:
+    """Persistent store of paragraph measurements, shared by all the conversions.
+
+    Measurements are looked up by a digest of everything the height of a
+    paragraph depends on. New measurements and the keys of the used ones are
+    buffered and written in one transaction, so conversions running in
+    parallel can share the store. When it grows over max_entries, the least
+    recently used measurements are evicted.
+    """
+
+    _FLUSH_SIZE = 1000
+
+    def __init__(self, path: str, max_entries: int = 200_000):
+        self._path = path
+        self._max_entries = max_entries
+        self._lock = Lock()
+        self._pending: dict[bytes, tuple] = {}
+        self._used: set[bytes] = set()
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        with self._transaction():
+            if self._connection.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+                self._connection.execute("DROP TABLE IF EXISTS measurements")
+                self._connection.execute(
+                    "CREATE TABLE measurements (key BLOB PRIMARY KEY, value TEXT NOT NULL, used INTEGER NOT NULL)")
+                self._connection.execute("CREATE INDEX measurements_used ON measurements (used)")
+                self._connection.execute(f"PRAGMA user_version={_SCHEMA_VERSION}")
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    def get(self, key: bytes) -> tuple | None:
+        with self._lock:
+            if (value := self._pending.get(key)) is not None:
+                self.hits += 1
+                return value
+            row = self._connection.execute("SELECT value FROM measurements WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._used.add(key)
+            return tuple(json.loads(row[0]))
+
+    def put(self, key: bytes, value: tuple):
+        with self._lock:
+            self._pending[key] = value
+            if len(self._pending) + len(self._used) >= self._FLUSH_SIZE:
+                self._flush()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT count(*) FROM measurements").fetchone()[0] + len(self._pending)
+
+    @contextmanager
+    def _transaction(self):
+        # takes the write lock right away, so concurrent writers wait instead of failing to upgrade
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+        self._connection.execute("COMMIT")
+
+    def _flush(self):
+        if not self._pending and not self._used:
+            return
+        now = time.time_ns()
+        try:
+            with self._transaction():
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO measurements (key, value, used) VALUES (?, ?, ?)",
+                    ((key, json.dumps(value), now) for key, value in self._pending.items()))
+                self._connection.executemany(
+                    "UPDATE measurements SET used = ? WHERE key = ?", ((now, key) for key in self._used))
+                excess = self._connection.execute("SELECT count(*) FROM measurements").fetchone()[0] \
+                    - self._max_entries
+                if excess > 0:
+                    self._connection.execute(
+                        "DELETE FROM measurements WHERE key IN "
+                        "(SELECT key FROM measurements ORDER BY used LIMIT ?)", (excess,))
+        except sqlite3.Error as e:
+            logging.warning(f"Can't save paragraph measurements: {e}")
+        self._pending.clear()
+        self._used.clear()
+
+
+def make_key(*parts: bytes | str | int | float) -> bytes:
+    digest = hashlib.blake2b(digest_size=20)
+    for part in parts:
+        if not isinstance(part, bytes):
+            part = str(part).encode()
+        digest.update(len(part).to_bytes(4, "little"))
+        digest.update(part)
+    return digest.digest()
+
+
+@cache
+def get_measurement_cache(path: str) -> MeasurementCache | None:
+    try:
+        measurement_cache = MeasurementCache(path)
+    except (OSError, sqlite3.Error) as e:
+        logging.warning(f"Can't open the measurement cache {path}: {e}")
+        return None
+    atexit.register(measurement_cache.flush)
+    return measurement_cache
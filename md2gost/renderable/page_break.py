@@ -1,9 +1,11 @@
+from copy import copy
 from typing import Generator
 
 from docx.shared import Parented, Pt
 from docx.text.paragraph import Paragraph as DocxParagraph
 
 from .paragraph_sizer import ParagraphSizer
+from ..layout_plan import LayoutPlan
 from ..layout_tracker import LayoutState
 from ..rendered_info import RenderedInfo
 from ..sub_renderable import SubRenderable
@@ -24,7 +26,10 @@ class PageBreak(Renderable):
 
     def render(self, previous_rendered: RenderedInfo, layout_state: LayoutState)\
             -> Generator[RenderedInfo | SubRenderable, None, None]:
-        yield RenderedInfo(
+        yield from self.commit(self.measure(previous_rendered, layout_state))
+
+    def measure(self, previous_rendered: RenderedInfo | None, layout_state: LayoutState) -> LayoutPlan:
+        return LayoutPlan(previous_rendered, copy(layout_state), [RenderedInfo(
             self._docx_paragraph,
             max(layout_state.remaining_page_height, ParagraphSizer(self._docx_paragraph, None, layout_state.max_width).calculate_height().line_height)
-        )
+        )])
@@ -1,47 +1,61 @@
-from copy import copy
-from typing import Generator, Any
+from copy import copy, deepcopy
+from dataclasses import replace
+from typing import Generator, Iterator
 
 from docx.shared import Length, Parented, RGBColor
+from docx.oxml.text.run import CT_R
 from docx.text.paragraph import Paragraph as DocxParagraph
-from docx.text.paragraph import Run as DocxRun
+from docx.text.run import Run
+from docx.enum.style import WD_STYLE_TYPE
 from docx.enum.text import WD_LINE_SPACING
 from docx.opc.constants import RELATIONSHIP_TYPE
 
 from . import Renderable
 from .caption import CaptionInfo
 from .image import Image
-from .paragraph_sizer import ParagraphSizer
+from .paragraph_sizer import ParagraphSizer, ParagraphSizerResult, TextSpans
+from .reference import Reference
+from .style_resolver import get_style_resolver
+from ..layout_plan import LayoutPlan
 from ..layout_tracker import LayoutState
 from ..sub_renderable import SubRenderable
-from ..util import create_element
+from ..util import create_element, create_run
 from ..rendered_info import RenderedInfo
 from ..latex_math import latex_to_omml, inline_omml
 
+_NO_BREAK_HYPHEN_RUN = create_element("w:r", [create_element("w:noBreakHyphen")])
+
 
 class Link:
-    def __init__(self, url, docx_paragraph: DocxParagraph):
-        self._docx_paragraph = docx_paragraph
+    def __init__(self, url, paragraph: "Paragraph"):
+        self._paragraph = paragraph
+        self._docx_paragraph = docx_paragraph = paragraph._docx_paragraph
         r_id = docx_paragraph.part.relate_to(url, RELATIONSHIP_TYPE.HYPERLINK, is_external=True)
 
         self._hyperlink = create_element("w:hyperlink", {
             "r:id": r_id
         })
 
+    @property
+    def _style_id(self) -> str:
+        return get_style_resolver(self._docx_paragraph.part).get_style_id("Hyperlink", WD_STYLE_TYPE.CHARACTER)
+
     def add_run(self, text: str, is_bold: bool = None, is_italic: bool = None, color: RGBColor = None,
                     strike_through: bool = None):
 
+        style_id = self._style_id
         parts = text.split("-")
         for i, part in enumerate(parts):
-            docx_run = DocxRun(create_element("w:r"), self._docx_paragraph)
-            self._hyperlink.append(docx_run._element)
-            docx_run.text = text
-            docx_run.style = "Hyperlink"
-            docx_run.bold = is_bold
-            docx_run.italic = is_italic
-            docx_run.font.color.rgb = color
-            docx_run.font.strike = strike_through
+            self._hyperlink.append(create_run(part, style_id, is_bold, is_italic, color, strike_through))
             if i != len(parts) - 1:
-                self._hyperlink.append(create_element("w:r", [create_element("w:noBreakHyphen")]))
+                self._hyperlink.append(deepcopy(_NO_BREAK_HYPHEN_RUN))
+
+    def add_reference(self, type_: str, label: str, number: int | None, is_bold: bool = None,
+                      is_italic: bool = None, strike_through: bool = None):
+        """Adds the number of the element with the label, resolved along with the references of the paragraph"""
+        r = create_run(str(number) if number else "?", self._style_id, is_bold, is_italic, None, strike_through)
+        self._hyperlink.append(r)
+        self._paragraph._add_reference(r, type_, label)
 
     @property
     def element(self):
@@ -52,31 +66,47 @@ class Paragraph(Renderable):
     def __init__(self, parent: Parented):
         self._parent = parent
         self._docx_paragraph = DocxParagraph(create_element("w:p"), parent)
-        self._docx_paragraph.style = "Normal"
+        self._style_resolver = get_style_resolver(parent.part)
+        self._style_resolver.set_paragraph_style(self._docx_paragraph, "Normal")
         self._images: list[Image] = []
+        self._references: list[Reference] = []
+        # measured beforehand along with the neighbouring paragraphs, see ParagraphSizer.calculate_heights
+        self.height_data: ParagraphSizerResult | None = None
+        # built by the first measurement and reused by the following ones, reset when the text or style changes
+        self._spans: TextSpans | None = None
 
     def add_run(self, text: str, is_bold: bool = None, is_italic: bool = None, color: RGBColor = None,
                 strike_through: bool = None):
+        self._spans = None
         # replace all hyphens with non-breaking hyphens
+        p = self._docx_paragraph._p
         parts = text.split("-")
         for i, part in enumerate(parts):
-            docx_run = self._docx_paragraph.add_run(part)
-            docx_run.bold = is_bold
-            docx_run.italic = is_italic
-            docx_run.font.color.rgb = color
-            docx_run.font.strike = strike_through
+            p.append(create_run(part, None, is_bold, is_italic, color, strike_through))
             if i != len(parts)-1:
-                self._docx_paragraph.add_run()._element.\
-                    append(create_element("w:noBreakHyphen"))
+                p.append(deepcopy(_NO_BREAK_HYPHEN_RUN))
 
     def add_image(self, path: str, caption_info: CaptionInfo):
         self._images.append(Image(self._parent, path, caption_info))
 
     def add_link(self, url: str):
-        link = Link(url, self._docx_paragraph)
+        link = Link(url, self)
         self._docx_paragraph._p.append(link.element)
+        self._spans = None
         return link
 
+    def add_reference(self, type_: str, label: str, number: int | None, is_bold: bool = None,
+                      is_italic: bool = None, strike_through: bool = None):
+        """Adds the number of the element with the label, number is the one expected until it's numbered"""
+        r = create_run(str(number) if number else "?", None, is_bold, is_italic, None, strike_through)
+        self._docx_paragraph._p.append(r)
+        self._add_reference(r, type_, label)
+
+    def _add_reference(self, r: CT_R, type_: str, label: str):
+        """Makes the run of the paragraph, e.g. of its link, hold the number of the element with the label"""
+        self._spans = None
+        self._references.append(Reference(Run(r, self._docx_paragraph), type_, label))
+
     def add_inline_equation(self, formula: str):
         # omml = inline_omml(latex_to_omml(formula))
         # for r in omml.xpath("//m:r", namespaces=omml.nsmap):
@@ -87,6 +117,10 @@ class Paragraph(Renderable):
         # self._docx_paragraph._element.append(omml)
         self.add_run(formula, is_italic=True)
 
+    @property
+    def images(self) -> list[Image]:
+        return self._images
+
     @property
     def page_break_before(self) -> bool:
         return self._docx_paragraph.paragraph_format.page_break_before
@@ -101,7 +135,8 @@ class Paragraph(Renderable):
 
     @style.setter
     def style(self, value: str):
-        self._docx_paragraph.style = value
+        self._style_resolver.set_paragraph_style(self._docx_paragraph, value)
+        self._spans = None
 
     @property
     def first_line_indent(self):
@@ -111,63 +146,96 @@ class Paragraph(Renderable):
     def first_line_indent(self, value: Length):
         self._docx_paragraph.paragraph_format.first_line_indent = value
 
+    def _calculate_height(self, previous_rendered: RenderedInfo | None, max_width: Length) -> ParagraphSizerResult:
+        paragraph_sizer = ParagraphSizer(
+            self._docx_paragraph,
+            previous_rendered.docx_element
+            if previous_rendered and isinstance(previous_rendered.docx_element, DocxParagraph) else None,
+            max_width, self._spans)
+        height_data = paragraph_sizer.calculate_height()
+        self._spans = paragraph_sizer.spans
+        return height_data
+
+    def text_paragraphs(self, max_width: Length) -> Iterator[tuple[DocxParagraph, Length]]:
+        if self._docx_paragraph.text or not self._images:
+            yield self._docx_paragraph, max_width
+        for image in self._images:
+            yield from image.text_paragraphs(max_width)
+
+    def references(self) -> Iterator[Reference]:
+        return iter(self._references)
+
     def render(self, previous_rendered: RenderedInfo, layout_state: LayoutState)\
             -> Generator[RenderedInfo | SubRenderable, None, None]:
+        yield from self.commit(self.measure(previous_rendered, layout_state))
+
+    @staticmethod
+    def split_height(height_data: ParagraphSizerResult, layout_state: LayoutState) -> Length:
+        """
+        Height of a paragraph measured as height_data laid out from layout_state, along with
+        the rest of the page when it's moved or split to the next one. All the lines of the paragraph
+        are as high as the line of its font, so the split depends only on the number of the lines,
+        not on where the text of the spans breaks
+        """
+        if layout_state.current_page_height == 0 and layout_state.page > 1:
+            height_data = replace(height_data, before=0)
+
+        fitting_lines = 0
+        for lines in range(1, height_data.lines+1):
+            if height_data.before + ((lines - 1) * height_data.line_spacing + 1) * height_data.line_height \
+                    > layout_state.remaining_page_height:
+                break
+            fitting_lines += 1
+
+        if fitting_lines == height_data.lines:
+            # the whole paragraph fits page
+            height = min(height_data.full, layout_state.remaining_page_height)
+        elif fitting_lines <= 1 or (height_data.lines-fitting_lines == 1 and height_data.lines == 3):
+            # if only no or only one line fits the page, paragraph goes to the next page
+            height = layout_state.remaining_page_height + height_data.full
+        elif height_data.lines-fitting_lines == 1:
+            # if all lines except last fit the page, the last two lines go to the new page
+            height = layout_state.remaining_page_height + \
+                     height_data.before + height_data.line_height * height_data.line_spacing * 2 \
+                     + height_data.after
+        else:
+            height = layout_state.remaining_page_height + \
+                     height_data.before + height_data.line_height * height_data.line_spacing * \
+                     (height_data.lines-fitting_lines) + height_data.after
+        return height
+
+    def measure(self, previous_rendered: RenderedInfo | None, layout_state: LayoutState) -> LayoutPlan:
+        plan = LayoutPlan(previous_rendered, copy(layout_state))
+        layout_state = copy(layout_state)
         remaining_space = layout_state.remaining_page_height
 
         if self.page_break_before:
             layout_state.add_height(layout_state.remaining_page_height)
         if self._docx_paragraph.text or not self._images:
-            height_data = ParagraphSizer(
-                self._docx_paragraph,
-                previous_rendered.docx_element
-                          if previous_rendered and isinstance(previous_rendered.docx_element, DocxParagraph) else None,
-                          layout_state.max_width).calculate_height()
-
-            if layout_state.current_page_height == 0 and layout_state.page > 1:
-                height_data.before = 0
-
-            fitting_lines = 0
-            for lines in range(1, height_data.lines+1):
-                if height_data.before + ((lines - 1) * height_data.line_spacing + 1) * height_data.line_height \
-                        > layout_state.remaining_page_height:
-                    break
-                fitting_lines += 1
-
-            if fitting_lines == height_data.lines:
-                # the whole paragraph fits page
-                height = min(height_data.full, layout_state.remaining_page_height)
-            elif fitting_lines <= 1 or (height_data.lines-fitting_lines == 1 and height_data.lines == 3):
-                # if only no or only one line fits the page, paragraph goes to the next page
-                height = layout_state.remaining_page_height + height_data.full
-            elif height_data.lines-fitting_lines == 1:
-                # if all lines except last fit the page, the last two lines go to the new page
-                height = layout_state.remaining_page_height + \
-                         height_data.before + height_data.line_height * height_data.line_spacing * 2 \
-                         + height_data.after
-            else:
-                height = layout_state.remaining_page_height + \
-                         height_data.before + height_data.line_height * height_data.line_spacing * \
-                         (height_data.lines-fitting_lines) + height_data.after
+            height_data = self.height_data or self._calculate_height(previous_rendered, layout_state.max_width)
+
+            height = self.split_height(height_data, layout_state)
 
             if self.page_break_before:
                 height += remaining_space
 
-            yield (previous_rendered := RenderedInfo(self._docx_paragraph, Length(height)))
+            plan.items.append(previous_rendered := RenderedInfo(self._docx_paragraph, Length(height)))
             layout_state.add_height(height)
 
         images = iter(self._images)
 
         for image in images:
-            rendered_image = list(image.render(previous_rendered, copy(layout_state)))
+            rendered_image = image.measure(previous_rendered, layout_state).items
             rendered_image_height = sum([x.height for x in rendered_image])
             if rendered_image:
                 previous_rendered = rendered_image[-1]
             if rendered_image_height <= layout_state.remaining_page_height:
-                yield SubRenderable(image, False)
+                plan.items.append(SubRenderable(image, False))
                 layout_state.add_height(rendered_image_height)
             else:
-                yield SubRenderable(image, True)
+                plan.items.append(SubRenderable(image, True))
                 break
 
-        yield from images
+        # the images following the one that doesn't fit go to the next page too
+        plan.items.extend(SubRenderable(image, True) for image in images)
+        return plan
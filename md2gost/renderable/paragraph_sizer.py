@@ -1,84 +1,285 @@
 import logging
 import os
-from dataclasses import dataclass
-from functools import cached_property
+import sys
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from functools import cache, cached_property
+from typing import Callable, Iterator
 from math import ceil
+from threading import Lock
+from weakref import WeakKeyDictionary
 
 from docx.enum.text import WD_LINE_SPACING
 from docx.oxml import CT_R
+from docx.oxml.ns import qn
+from docx.parts.document import DocumentPart
+from lxml import etree
 from docx.text.run import Run
-from freetype import Face
 
 from docx.text.paragraph import Paragraph
 from docx.text.font import Font as DocxFont
-from docx.shared import Length, Pt, Inches
-from docx.text.parfmt import ParagraphFormat
-from docx.styles.style import _ParagraphStyle
+from docx.shared import Length, Pt
 
-from PIL import Image, ImageDraw, ImageFont
-
-from .find_font import find_font
-
-
-def _merge_objects(*objects):
-    from inspect import getmembers, ismethod
-    """
-    Returns the new object containing attributes from objects, where the latest
-    one has the highest priority.
-    """
-
-    class MergedObject:
-        pass
-
-    merged_object = MergedObject()
-    for name, value in getmembers(objects[0]):
-        if name.startswith("_") or ismethod(value):
-            continue
-        merged_object.__setattr__(name, value)
-
-    for object_ in objects[1:]:
-        for name, value in getmembers(object_):
-            if name.startswith("_") or ismethod(value):
-                continue
-            if value is not None:
-                merged_object.__setattr__(name, value)
-
-    return merged_object
+from .find_font import find_font, fonts_version
+from .font_metrics import FontMetrics, get_font_metrics, load_snapshot
+from .style_resolver import ResolvedFont, ResolvedParagraphFormat, get_style_resolver
+from .measurement_cache import MEASUREMENT_VERSION, get_measurement_cache, make_key
+from .template_profile import TemplateProfile, get_template_profile
 
 
 class Font:
     def __init__(self, name: str, bold: bool, italic: bool, size_pt: int):
-        path = find_font(name, bold, italic)
-        self._freetypefont = ImageFont.truetype(path, size_pt)
-        self._draw = ImageDraw.Draw(Image.new("RGB", (1000, 1000)))
+        metrics = None
+        if os.environ.get("FONT_METRICS"):
+            metrics = load_snapshot(os.environ["FONT_METRICS"]).get(name, bold, italic)
+        if metrics is not None and not metrics.has_hinted_metrics(size_pt):
+            # the size isn't in the snapshot, the font file is measured if it's installed
+            try:
+                metrics = get_font_metrics(find_font(name, bold, italic))
+            except ValueError:
+                logging.warning(f"Size {size_pt:g} of font {name} is not in the font metrics snapshot "
+                                f"and the font is not found, its widths are approximated")
+        self._metrics = metrics or get_font_metrics(find_font(name, bold, italic))
+        self._size_pt = size_pt
 
-        self._face = Face(path)
-        self._face.set_char_size(int(size_pt * 64))
+    @property
+    def metrics(self) -> FontMetrics:
+        return self._metrics
+
+    @property
+    def size_pt(self) -> float:
+        return self._size_pt
 
     def get_text_width(self, text: str) -> Length:
         if not self.is_mono:
-            bbox = self._draw.textbbox((0, 0), text, self._freetypefont)
-            return Pt(bbox[2] - bbox[0])
+            return Pt(self._metrics.get_text_width(text, self._size_pt))
         else:
-            return Pt(len(text) * self._face.glyph.advance.x / 64)
+            return Pt(len(text) * self._metrics.get_advance("m", self._size_pt))
+
+    def get_average_char_width(self) -> Length:
+        """Returns the width of an average character, used by the draft measurement"""
+        if self.is_mono:
+            return Pt(self._metrics.get_advance("m", self._size_pt))
+        return Pt(self._metrics.get_average_width(self._size_pt))
 
     def get_line_height(self) -> Length:
         # TODO: make it work for all fonts
-        if "Times" in str(self._face.family_name) and self._freetypefont.size == 14:
+        if "Times" in self._metrics.family_name and self._size_pt == 14:
             return Pt(16.05)
-        if "Courier" in str(self._face.family_name) and self._freetypefont.size == 12:
+        if "Courier" in self._metrics.family_name and self._size_pt == 12:
             return Pt(13.61)
         else:
-            return Pt(self._face.size.height / 64)
+            return Pt(self._metrics.get_line_height(self._size_pt))
+
     @cached_property
     def is_mono(self):
-        self._face.load_char("i")
-        i_width = self._face.glyph.advance.x
-        self._face.load_char("m")
-        return i_width == self._face.glyph.advance.x
-        # return self._face.glyph.bitmap.width
+        return self._metrics.get_advance("i", self._size_pt) == self._metrics.get_advance("m", self._size_pt)
 
 
+class FontCache:
+    """Thread-safe LRU cache of loaded fonts, shared by the whole process"""
+
+    def __init__(self, max_size: int = 32):
+        self._max_size = max_size
+        self._fonts: OrderedDict[tuple[str, bool, bool, float], Font] = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def max_size(self) -> int:
+        return self._max_size
+
+    @max_size.setter
+    def max_size(self, value: int):
+        if value < 1:
+            raise ValueError("Font cache size must be positive")
+        with self._lock:
+            self._max_size = value
+            self._evict()
+
+    def get(self, name: str, bold: bool, italic: bool, size_pt: float) -> Font:
+        key = (name, bool(bold), bool(italic), float(size_pt))
+        with self._lock:
+            font = self._fonts.get(key)
+            if font is not None:
+                self.hits += 1
+                self._fonts.move_to_end(key)
+                return font
+
+            self.misses += 1
+            font = Font(name, bold, italic, size_pt)
+            self._fonts[key] = font
+            self._evict()
+            return font
+
+    def load_style_fonts(self, profile: TemplateProfile):
+        """
+        Loads the fonts of the styles of a template, e.g. so the worker processes
+        forked afterwards share them instead of loading them each
+        """
+        for font in {profile.default_font, *profile.style_fonts.values()}:
+            if font.name and font.size:
+                try:
+                    self.get(font.name, font.bold, font.italic, font.size.pt).get_text_width(" ")
+                except ValueError:  # not installed, reported when it's used
+                    pass
+
+    def clear(self):
+        with self._lock:
+            self._fonts.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._fonts)
+
+    def _evict(self):
+        while len(self._fonts) > self._max_size:
+            self._fonts.popitem(last=False)
+
+
+font_cache = FontCache()
+
+
+class WordWidthCache:
+    """Thread-safe LRU cache of measured word widths, bounded by its approximate memory usage"""
+
+    _ENTRY_OVERHEAD = 200  # bytes taken by the key tuple, the width and the dict entry
+
+    def __init__(self, max_bytes: int = 16 * 1024 * 1024):
+        self._max_bytes = max_bytes
+        self._widths: OrderedDict[tuple[str, float, str], Length] = OrderedDict()
+        self._bytes = 0
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def max_bytes(self) -> int:
+        return self._max_bytes
+
+    @max_bytes.setter
+    def max_bytes(self, value: int):
+        with self._lock:
+            self._max_bytes = value
+            self._evict()
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.
+
+    def get_text_width(self, font: Font, text: str) -> Length:
+        key = (font.metrics.key, font.size_pt, text)
+        with self._lock:
+            width = self._widths.get(key)
+            if width is not None:
+                self.hits += 1
+                self._widths.move_to_end(key)
+                return width
+            self.misses += 1
+
+        width = font.get_text_width(text)
+        with self._lock:
+            if key not in self._widths:
+                self._widths[key] = width
+                self._bytes += self._entry_size(text)
+                self._evict()
+        return width
+
+    def clear(self):
+        with self._lock:
+            self._widths.clear()
+            self._bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._widths)
+
+    def _entry_size(self, text: str) -> int:
+        return sys.getsizeof(text) + self._ENTRY_OVERHEAD
+
+    def _evict(self):
+        while self._bytes > self._max_bytes and self._widths:
+            (_, _, text), _ = self._widths.popitem(last=False)
+            self._bytes -= self._entry_size(text)
+
+
+word_width_cache = WordWidthCache()
+
+
+class TextSpans:
+    """
+    Text of a paragraph in one buffer, split into spans at the run boundaries. The span i
+    covers text[offsets[i]:offsets[i + 1]] and is set in fonts[font_ids[i]].
+
+    The fonts of the runs are resolved once, when the spans are built, and the counted
+    lines are remembered for every width, so measuring the paragraph again is cheap. Only
+    the number of the lines is kept, it's all Paragraph.split_height needs to split the
+    paragraph between the pages.
+    """
+
+    def __init__(self, text: str, offsets: array, font_ids: array, fonts: list[Font], paragraph_font: Font):
+        self.text = text
+        self.offsets = offsets
+        self.font_ids = font_ids
+        self.fonts = fonts
+        self.paragraph_font = paragraph_font
+        self.line_counts: dict[tuple, int] = {}
+
+    @classmethod
+    def from_runs(cls, runs: list[Run], docx_font: ResolvedFont | DocxFont) -> "TextSpans":
+        """Builds the spans of runs of a paragraph with docx_font"""
+        docx_font = ResolvedFont.of(docx_font)
+        style_resolver = get_style_resolver(runs[0].part) if runs else None
+        parts = []
+        for run in runs:
+            run_text = run.text
+            if run_text == "" and run._element.xpath("w:noBreakHyphen"):
+                run_text = "-"
+            parts.append((run_text, style_resolver.run_font(docx_font, run._r.rPr)))
+        return cls.from_texts(parts, docx_font)
+
+    @classmethod
+    def from_texts(cls, parts: list[tuple[str, ResolvedFont]], docx_font: ResolvedFont) -> "TextSpans":
+        """Builds the spans of the texts set in their fonts in a paragraph with docx_font"""
+        texts = []
+        offsets, font_ids = array("I", [0]), array("H")
+        fonts: list[Font] = []
+        font_indices: dict[Font, int] = {}
+        for i, (run_text, run_docx_font) in enumerate(parts):
+            font = font_cache.get(run_docx_font.name, run_docx_font.bold, run_docx_font.italic,
+                                  run_docx_font.size.pt)
+            if (font_id := font_indices.get(font)) is None:
+                font_id = font_indices[font] = len(fonts)
+                fonts.append(font)
+
+            if i == len(parts) - 1:
+                run_text += " "  # add space to the end of the last run, so it adds the last word
+
+            texts.append(run_text)
+            offsets.append(offsets[-1] + len(run_text))
+            font_ids.append(font_id)
+
+        paragraph_font = font_cache.get(docx_font.name, docx_font.bold, docx_font.italic, docx_font.size.pt)
+        return cls("".join(texts), offsets, font_ids, fonts, paragraph_font)
+
+    def __len__(self):
+        return len(self.font_ids)
+
+    def __iter__(self) -> Iterator[tuple[str, Font]]:
+        """Yields the text of each span along with its font"""
+        text, offsets, fonts = self.text, self.offsets, self.fonts
+        for i, font_id in enumerate(self.font_ids):
+            yield text[offsets[i]:offsets[i + 1]], fonts[font_id]
+
 
 @dataclass
 class ParagraphSizerResult:
@@ -97,76 +298,162 @@ class ParagraphSizerResult:
         return Length(self.before + self.line_height * self.line_spacing * self.lines + self.after)
 
 
+_PPR = qn("w:pPr")
+_measured_lines: WeakKeyDictionary[DocumentPart, dict[tuple, int]] = WeakKeyDictionary()
+_measured_lines_lock = Lock()
+
+
+def get_measured_lines(document_part: DocumentPart) -> dict[tuple, int]:
+    """
+    Line counts of the paragraphs of the document counted beforehand, by the keys returned by
+    ParagraphSizer.measure_lines. The sizer looks the lines of a paragraph up instead of counting them.
+    """
+    with _measured_lines_lock:
+        if (measured_lines := _measured_lines.get(document_part)) is None:
+            measured_lines = _measured_lines[document_part] = {}
+        return measured_lines
+
+
+@cache
+def _fonts_version(font_metrics: str | None, font_dirs: str | None) -> str:
+    """Identifies the fonts the measurements were made with, the arguments are the environment it depends on"""
+    version = fonts_version()
+    if font_metrics:
+        stat = os.stat(font_metrics)
+        version += f":{os.path.abspath(font_metrics)}:{stat.st_mtime_ns}:{stat.st_size}"
+    return version
+
+
 class ParagraphSizer:
-    def __init__(self, paragraph: Paragraph, previous_paragraph: Paragraph | None, max_width: Length):
+    def __init__(self, paragraph: Paragraph, previous_paragraph: Paragraph | None, max_width: Length,
+                 spans: TextSpans | None = None):
         self.previous_paragraph = previous_paragraph
         self.max_width = max_width
         self.paragraph = paragraph
+        self._spans = spans
 
-        self.same_style_as_previous = (paragraph.style == previous_paragraph.style) if previous_paragraph else False
+        self._style_resolver = get_style_resolver(paragraph.part)
+        self.same_style_as_previous = \
+            self._style_resolver.paragraph_style_id(paragraph) == self._style_resolver.paragraph_style_id(previous_paragraph) \
+            if previous_paragraph else False
 
-    @cached_property
-    def _default_style(self):
-
-        default_style_element = type("DefaultStyle", (), {})
-        default_style_element.rPr = \
-            self.paragraph.part.document.styles.element.xpath(
-                'w:docDefaults/w:rPrDefault/w:rPr')[0]
-        default_style_element.pPr = \
-            self.paragraph.part.document.styles.element.xpath(
-                'w:docDefaults/w:pPrDefault/w:pPr')[0]
-        default_style = _ParagraphStyle(default_style_element)
-        return default_style
+    @property
+    def spans(self) -> TextSpans | None:
+        """The text of the paragraph, if it was passed to the constructor or built by the measurement"""
+        return self._spans
 
-    @cached_property
-    def _styles(self) -> list[_ParagraphStyle]:
-        styles = [self.paragraph.style]
-        while styles[-1].base_style:
-            styles.append(styles[-1].base_style)
-        styles.append(self._default_style)
-        return styles
+    def _get_spans(self) -> TextSpans:
+        if self._spans is None:
+            self._spans = TextSpans.from_runs(self._runs(self.paragraph), self._formatting[0])
+        return self._spans
 
     @cached_property
-    def _is_contextual_spacing(self) -> bool:
-        contextual_spacing = False
-        pPrs = [self.paragraph.paragraph_format._element.pPr] + \
-               [style._element.pPr for style in self._styles]
-        for pPr in pPrs:
-            if pPr.xpath("./w:contextualSpacing"):
-                contextual_spacing = True
-                break
-        return contextual_spacing
-
-    def count_lines(self, runs: list[Run], max_width: Length, docx_font: DocxFont, first_line_indent: Length,
-                    is_mono: bool = False):
+    def _tab_width(self) -> Length:
+        return get_template_profile(self.paragraph.part).default_tab_stop
+
+    @staticmethod
+    def _runs(paragraph: Paragraph) -> list[Run]:
+        # here paragraph.runs is not used because
+        # it does not always return all runs (e.g. if they are inside hyperlink)
+        return [Run(element, paragraph) for element in paragraph._element.getiterator()
+                if isinstance(element, CT_R)]
+
+    @staticmethod
+    def _expand_tabs(text: str, char_width: Length, tab_width: Length) -> str:
+        """Replaces tabs with the spaces reaching the next default tab stop"""
+        parts = text.split("\t")
+        expanded = parts[0]
+        for part in parts[1:]:
+            position = len(expanded) * char_width
+            expanded += " " * max(1, ceil(((position // tab_width + 1) * tab_width - position) / char_width))
+            expanded += part
+        return expanded
+
+    @staticmethod
+    def count_mono_lines(text: str, char_width: Length, max_width: Length, first_line_indent: Length,
+                         tab_width: Length) -> int:
+        """Counts lines of a text in a monospace font, where every character is char_width wide"""
+        if "\t" in text:
+            text = ParagraphSizer._expand_tabs(text, char_width, tab_width)
+        if first_line_indent + len(text.rstrip(" ")) * char_width <= max_width:
+            return 1  # most of the lines of code are not wrapped
+        return ParagraphSizer._count_lines_draft(text, char_width, char_width, max_width, first_line_indent)
+
+    @staticmethod
+    def _count_lines_draft(text: str, char_width: Length, space_width: Length, max_width: Length,
+                           first_line_indent: Length) -> int:
+        """Counts lines the same way count_lines does, but every character is char_width wide"""
+        lines = 1
+        line_width = first_line_indent
+        spaces = 0
+        for word in text.split(" "):
+            if not word:
+                spaces += 1
+                continue
+            word_width = len(word) * char_width
+            width = spaces*space_width + word_width
+            if width <= max_width - line_width:
+                line_width += width
+            elif width > max_width - first_line_indent:
+                if lines == 1 and line_width == first_line_indent and not spaces:
+                    lines += ceil((width - (max_width - first_line_indent)) / max_width)
+                    line_width = (width - (max_width - first_line_indent)) % max_width
+                else:
+                    lines += ceil(width / max_width)
+                    line_width = width % max_width
+            else:
+                lines += 1
+                line_width = word_width
+            spaces = 1
+        return int(lines)
+
+    def count_lines(self, spans: TextSpans | list[Run], max_width: Length, docx_font: ResolvedFont | DocxFont,
+                    first_line_indent: Length, is_mono: bool = False) -> int:
+        if not isinstance(spans, TextSpans):
+            spans = TextSpans.from_runs(spans, docx_font)
+
+        key = (max_width, first_line_indent, is_mono, os.environ.get("MEASUREMENT"))
+        lines = spans.line_counts.get(key)
+        if lines is None:
+            lines = spans.line_counts[key] = self.count_span_lines(spans, max_width, first_line_indent, is_mono,
+                                                                   self._tab_width)
+        return lines
+
+    @staticmethod
+    def count_span_lines(spans: TextSpans, max_width: Length, first_line_indent: Length, is_mono: bool,
+                         tab_width: Length) -> int:
+        """Counts lines of the spans, tab_width is the distance between the default tab stops"""
         lines = 1
         line_width = first_line_indent
 
-        space_width = Font(docx_font.name, docx_font.bold, docx_font.italic, docx_font.size.pt).get_text_width(" ")
+        if is_mono and spans.fonts == [spans.paragraph_font]:
+            # all the characters are in the monospace font of the paragraph, runs in other fonts are measured below
+            return ParagraphSizer.count_mono_lines(spans.text, spans.paragraph_font.get_average_char_width(),
+                                                   max_width, first_line_indent, tab_width)
+
+        space_width = word_width_cache.get_text_width(spans.paragraph_font, " ")
         if not is_mono:
             space_width *= 0.81
 
+        if os.environ.get("MEASUREMENT") == "draft":
+            # the spans are not measured separately, the text is assumed to be in the paragraph font
+            return ParagraphSizer._count_lines_draft(spans.text, spans.paragraph_font.get_average_char_width(),
+                                                     space_width, max_width, first_line_indent)
+
+        if os.environ.get("LINE_BREAKER") == "numpy":
+            from . import line_breaker
+            spaces, widths = line_breaker.tokenize(spans)
+            return line_breaker.count_lines(spaces, widths, space_width, max_width, first_line_indent)
+
         word_part = ""
         word_parts_widths = [0]
         spaces = 0
-        for i, run in enumerate(runs):
+        for run_text, font in spans:
             if word_part:
                 word_part = ""
                 word_parts_widths.append(0)
 
-            run_docx_font = _merge_objects(
-                docx_font,
-                run.font
-            )
-            font = Font(run_docx_font.name, run_docx_font.bold, run_docx_font.italic, run_docx_font.size.pt)
-
-            run_text = run.text
-            if run_text == "" and run._element.xpath("w:noBreakHyphen"):
-                run_text = "-"
-            if i == len(runs) - 1:
-                run_text += " "  # add space to the end of the last run, so it adds the last word
-
-            for c in run_text:
+            for j, c in enumerate(run_text):
                 if c == " ":
                     if any(word_parts_widths):
                         width = spaces*space_width + sum(word_parts_widths)
@@ -190,54 +477,153 @@ class ParagraphSizer:
                         spaces += 1
                 else:
                     word_part += c
-                    word_parts_widths[-1] = font.get_text_width(word_part)
+                    if j == len(run_text) - 1 or run_text[j + 1] == " ":
+                        # the word part is measured once it is complete, not after each character
+                        word_parts_widths[-1] = word_width_cache.get_text_width(font, word_part)
 
         return int(lines)
 
-    def calculate_height(self) -> ParagraphSizerResult:
-        max_width = self.max_width
-
-
-        docx_font: DocxFont = _merge_objects(
-            *[style.font for style in self._styles[::-1] if style.font],
-            self.paragraph.style.font)
-
-        paragraph_format: ParagraphFormat = _merge_objects(
-            *[style.paragraph_format for style in self._styles[::-1]
-              if style.paragraph_format],
-            self.paragraph.paragraph_format
-        )
+    @cached_property
+    def _formatting(self) -> tuple[ResolvedFont, ResolvedParagraphFormat]:
+        return self._style_resolver.paragraph_font(self.paragraph), self._style_resolver.paragraph_format(self.paragraph)
 
-        max_width -= (paragraph_format.left_indent or 0) + \
-            (paragraph_format.right_indent or 0)
+    @cached_property
+    def _lines_layout(self) -> tuple[Length, Length, Font]:
+        """Width of the lines, indent of the first one and the font of the paragraph"""
+        docx_font, paragraph_format = self._formatting
+        max_width = self.max_width - (paragraph_format.left_indent or 0) - (paragraph_format.right_indent or 0)
+        font = font_cache.get(docx_font.name, docx_font.bold, docx_font.italic, docx_font.size.pt)
+        return max_width, paragraph_format.first_line_indent or 0, font
+
+    def _lines_key(self, paragraph: Paragraph) -> tuple:
+        """
+        Everything the line count of a paragraph formatted as the measured one depends on:
+        its content, the font and the width of the lines
+        """
+        max_width, first_line_indent, _ = self._lines_layout
+        content = b"".join(etree.tostring(child) for child in paragraph._p if child.tag != _PPR)
+        return content, self._formatting[0], max_width, first_line_indent, os.environ.get("MEASUREMENT")
+
+    def _measured_lines(self, paragraph: Paragraph) -> int | None:
+        """Lines of a paragraph formatted as the measured one if they were counted beforehand"""
+        measured_lines = _measured_lines.get(paragraph.part)
+        return measured_lines.get(self._lines_key(paragraph)) if measured_lines else None
+
+    def _count_own_lines(self) -> int:
+        max_width, first_line_indent, font = self._lines_layout
+        return self.count_lines(self._get_spans(), max_width, self._formatting[0], first_line_indent, font.is_mono)
+
+    def count_runs_lines(self, runs: list[Run]) -> int:
+        """Counts lines of the runs formatted as the measured paragraph, e.g. of a part of it between line breaks"""
+        max_width, first_line_indent, font = self._lines_layout
+        return self.count_lines(runs, max_width, self._formatting[0], first_line_indent, font.is_mono)
+
+    def measure_lines(self) -> tuple[tuple, int]:
+        """Counts the lines of the paragraph, returns them along with their key in get_measured_lines"""
+        return self._lines_key(self.paragraph), self._count_own_lines()
+
+    def _count_paragraph_lines(self, paragraph: Paragraph) -> int:
+        """Counts lines of the paragraph, which must have the same formatting as the measured one"""
+        if (lines := self._measured_lines(paragraph)) is not None:
+            return lines
+        docx_font, _ = self._formatting
+        max_width, first_line_indent, font = self._lines_layout
+        return self.count_lines(TextSpans.from_runs(self._runs(paragraph), docx_font), max_width, docx_font,
+                                first_line_indent, font.is_mono)
+
+    @staticmethod
+    def _formatting_signature(paragraph: Paragraph) -> str | None:
+        """Returns the style id of the paragraph if it has no direct formatting, otherwise None"""
+        pPr = paragraph._p.pPr
+        if pPr is None:
+            return ""
+        if len(pPr) == 1 and pPr.pStyle is not None:
+            return pPr.pStyle.val
+        return None
+
+    @classmethod
+    def calculate_heights(cls, paragraphs: list[Paragraph], max_width: Length) -> list[ParagraphSizerResult]:
+        """
+        Measures consecutive paragraphs, each following the previous one, e.g. the lines of a listing.
+        The heights of paragraphs with the same style and no direct formatting differ only in the
+        number of lines, so their styles are resolved once instead of for every paragraph.
+        """
+        results = []
+        template: tuple[str, str, ParagraphSizer, ParagraphSizerResult] | None = None
+        for i, paragraph in enumerate(paragraphs):
+            previous = paragraphs[i-1] if i else None
+            signature = cls._formatting_signature(paragraph)
+            previous_signature = cls._formatting_signature(previous) if previous is not None else None
+            if template and signature is not None and (signature, previous_signature) == template[:2]:
+                _, _, sizer, result = template
+                results.append(cls._cached(paragraph, previous, max_width, lambda: replace(
+                    result, lines=sizer._count_paragraph_lines(paragraph))))
+                continue
 
-        font = Font(docx_font.name, docx_font.bold, docx_font.italic, docx_font.size.pt)
+            sizer = ParagraphSizer(paragraph, previous, max_width)
+            results.append(sizer.calculate_height())
+            if signature is not None and previous_signature is not None:
+                template = (signature, previous_signature, sizer, results[-1])
+        return results
+
+    @staticmethod
+    def measurement_context(document_part: DocumentPart) -> tuple[int, str, str, str]:
+        """Identifies everything besides the paragraphs the measurements depend on: the fonts, the template, etc."""
+        return (MEASUREMENT_VERSION, os.environ.get("MEASUREMENT", "exact"), _fonts_version(
+            os.environ.get("FONT_METRICS"), os.environ.get("FONT_DIRS")), get_template_profile(document_part).digest)
+
+    @staticmethod
+    def _measurement_key(paragraph: Paragraph, previous_paragraph: Paragraph | None, max_width: Length) -> bytes:
+        if previous_paragraph is None:
+            previous = b"none"
+        elif previous_paragraph._p.pPr is None:
+            previous = b""
+        else:
+            previous = etree.tostring(previous_paragraph._p.pPr)
+
+        return make_key(*ParagraphSizer.measurement_context(paragraph.part), max_width,
+                        etree.tostring(paragraph._p), previous)
+
+    @staticmethod
+    def _cached(paragraph: Paragraph, previous_paragraph: Paragraph | None, max_width: Length,
+                calculate: Callable[[], ParagraphSizerResult]) -> ParagraphSizerResult:
+        """Returns the measurement from the measurement cache if it is enabled, otherwise calls calculate"""
+        measurement_cache = get_measurement_cache(os.environ["MEASUREMENT_CACHE"]) \
+            if os.environ.get("MEASUREMENT_CACHE") else None
+        if measurement_cache is None:
+            return calculate()
+
+        key = ParagraphSizer._measurement_key(paragraph, previous_paragraph, max_width)
+        if (value := measurement_cache.get(key)) is not None:
+            before, lines, line_height, line_spacing, after = value
+            return ParagraphSizerResult(Length(before), lines, Length(line_height), line_spacing, Length(after))
+
+        result = calculate()
+        measurement_cache.put(key, (result.before, result.lines, result.line_height, result.line_spacing,
+                                    result.after))
+        return result
 
-        # here self.paragraph.runs is not used because
-        # it does not always return all runs (e.g. if they are inside hyperlink)
-        runs = []
-        for element in self.paragraph._element.getiterator():
-            if isinstance(element, CT_R):
-                runs.append(Run(element, self.paragraph))
-
-        lines = self.count_lines(runs, max_width, docx_font, paragraph_format.first_line_indent or 0,
-                                 font.is_mono)
-
-        previous_paragraph_format: ParagraphFormat = None
-        if self.previous_paragraph:
-            previous_paragraph_styles = [self.previous_paragraph.style]
-            while previous_paragraph_styles[-1].base_style:
-                previous_paragraph_styles.append(
-                    previous_paragraph_styles[-1].base_style
-                )
-            previous_paragraph_styles.append(self._default_style)
-            previous_paragraph_format = _merge_objects(
-                *[style.paragraph_format for style in previous_paragraph_styles[::-1]
-                    if style.paragraph_format],
-                self.previous_paragraph.paragraph_format
-            )
-
-        if self._is_contextual_spacing and self.same_style_as_previous:
+    def calculate_height(self) -> ParagraphSizerResult:
+        return self._cached(self.paragraph, self.previous_paragraph, self.max_width, self._calculate_height)
+
+    def _calculate_height(self) -> ParagraphSizerResult:
+        _, paragraph_format = self._formatting
+        _, _, font = self._lines_layout
+
+        if (lines := self._measured_lines(self.paragraph)) is None:
+            lines = self._count_own_lines()
+
+        previous_paragraph_format = self._style_resolver.paragraph_format(self.previous_paragraph) \
+            if self.previous_paragraph else None
+        return self.layout_lines(lines, font, paragraph_format, previous_paragraph_format,
+                                 self.same_style_as_previous)
+
+    @staticmethod
+    def layout_lines(lines: int, font: Font, paragraph_format: ResolvedParagraphFormat,
+                     previous_paragraph_format: ResolvedParagraphFormat | None,
+                     same_style_as_previous: bool) -> ParagraphSizerResult:
+        """Spacing and line height of a paragraph of the lines, following a paragraph formatted as given"""
+        if paragraph_format.contextual_spacing and same_style_as_previous:
             before = (previous_paragraph_format.space_after or 0)
         else:
             before = (paragraph_format.space_before or 0)
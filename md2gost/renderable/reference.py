@@ -0,0 +1,19 @@
+from docx.text.run import Run
+
+
+class Reference:
+    """
+    Number of the numbered element with the label, written as @Type:label. Until the
+    element is numbered the run holds the number expected from the order of the markdown,
+    so the layout doesn't depend on when the reference is resolved, see Renderer.
+    """
+
+    def __init__(self, run: Run, type_: str, label: str):
+        self.run = run
+        self.type = type_
+        self.label = label
+
+    def resolve(self, number: int | None):
+        text = str(number) if number else "?"
+        if self.run.text != text:
+            self.run.text = text
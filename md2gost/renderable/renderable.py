@@ -1,11 +1,17 @@
+from copy import copy
 from typing import TYPE_CHECKING
-from collections.abc import Generator
+from collections.abc import Generator, Iterator
 from abc import ABC, abstractmethod
 
+from docx.shared import Length
+from docx.text.paragraph import Paragraph as DocxParagraph
+
+from ..layout_plan import LayoutPlan
 from ..layout_tracker import LayoutState
 from ..rendered_info import RenderedInfo
 if TYPE_CHECKING:
     from ..sub_renderable import SubRenderable
+    from .reference import Reference
 
 
 class Renderable(ABC):
@@ -14,5 +20,30 @@ class Renderable(ABC):
             -> Generator["RenderedInfo | SubRenderable", None, None]:
         """Renders the object to one or multiple Parented objects or Renderables to be rendered on the next page"""
 
+    def measure(self, previous_rendered: RenderedInfo | None, layout_state: LayoutState) -> LayoutPlan:
+        """
+        Lays the object out following previous_rendered from layout_state without changing the document
+        or layout_state. The plan is applied by commit, so the object isn't laid out again to be added.
+        By default the object is rendered into the plan, which may change the object: ToC, the only
+        renderable laid out this way, counts the lines it reserves.
+        """
+        return LayoutPlan(previous_rendered, copy(layout_state),
+                          list(self.render(previous_rendered, copy(layout_state))))
+
+    def commit(self, plan: LayoutPlan) -> list["RenderedInfo | SubRenderable"]:
+        """Applies the decisions of the plan to the object and returns what it adds to the document"""
+        return plan.items
+
+    def text_paragraphs(self, max_width: Length) -> Iterator[tuple[DocxParagraph, Length]]:
+        """
+        Yields the paragraphs of text measured when the object is laid out max_width wide, along with
+        the widths they are measured in, so their lines can be counted beforehand, see MeasurementStage
+        """
+        return iter(())
+
+    def references(self) -> Iterator["Reference"]:
+        """Yields the references to the numbered elements in the text of the object"""
+        return iter(())
+
     def added_to_document(self):
         pass
@@ -2,8 +2,10 @@ from abc import ABC, abstractmethod
 
 
 class RequiresNumbering:
-    def __init__(self, category):
+    def __init__(self, category, label: str | None = None):
         self.numbering_category = category
+        # name the references to the element use, see Reference
+        self.label = label
 
     @abstractmethod
     def set_number(self, number: int):
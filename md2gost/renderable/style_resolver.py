@@ -0,0 +1,257 @@
+from threading import Lock
+from typing import NamedTuple, Any
+from weakref import WeakKeyDictionary
+
+from docx.enum.style import WD_STYLE_TYPE
+from docx.enum.text import WD_LINE_SPACING
+from docx.oxml.styles import CT_Styles, CT_Style
+from docx.oxml.text.parfmt import CT_PPr
+from docx.oxml.text.font import CT_RPr
+from docx.parts.document import DocumentPart
+from docx.styles import BabelFish
+from docx.table import Table
+from docx.shared import Length
+from docx.text.font import Font as DocxFont
+from docx.text.parfmt import ParagraphFormat
+from docx.text.paragraph import Paragraph
+from docx.text.run import Run
+from lxml import etree
+
+
+class ResolvedFont(NamedTuple):
+    """Effective font of a paragraph or a run"""
+    name: str | None
+    bold: bool | None
+    italic: bool | None
+    size: Length | None
+
+    @classmethod
+    def of(cls, font: Any) -> "ResolvedFont":
+        """Returns the record with the properties of the font-like object, e.g. python-docx Font"""
+        if isinstance(font, ResolvedFont):
+            return font
+        return cls(font.name, font.bold, font.italic, font.size)
+
+
+class ResolvedParagraphFormat(NamedTuple):
+    """Effective paragraph properties used to lay a paragraph out"""
+    left_indent: Length | None
+    right_indent: Length | None
+    first_line_indent: Length | None
+    space_before: Length | None
+    space_after: Length | None
+    line_spacing: float | Length | None
+    line_spacing_rule: WD_LINE_SPACING | None
+    contextual_spacing: bool
+
+
+def _merge(records: list[tuple]) -> list:
+    """Merges the values of records, a later record overrides the values it has set"""
+    merged = list(records[0])
+    for record in records[1:]:
+        for i, value in enumerate(record):
+            if value is not None:
+                merged[i] = value
+    return merged
+
+
+def _length(value: Any) -> Any:
+    """
+    Returns python-docx Pt and Twips as plain Length, the others are left as they are. They can't be
+    pickled, e.g. to the measurement workers: Pt(14) is unpickled as Pt(177800), the same number of points.
+    """
+    return Length(value) if isinstance(value, Length) else value
+
+
+def _read_font(element) -> tuple:
+    font = DocxFont(element)
+    return font.name, font.bold, font.italic, _length(font.size)
+
+
+def _read_paragraph_format(element) -> tuple:
+    paragraph_format = ParagraphFormat(element)
+    return (_length(paragraph_format.left_indent), _length(paragraph_format.right_indent),
+            _length(paragraph_format.first_line_indent), _length(paragraph_format.space_before),
+            _length(paragraph_format.space_after), _length(paragraph_format.line_spacing),
+            paragraph_format.line_spacing_rule)
+
+
+def _signature(element: etree.ElementBase | None) -> bytes:
+    return etree.tostring(element) if element is not None else b""
+
+
+class _DocDefaults:
+    """Document defaults in the shape of a style element, so python-docx proxies can read them"""
+
+    def __init__(self, styles: CT_Styles):
+        r_pr = styles.xpath("w:docDefaults/w:rPrDefault/w:rPr")
+        p_pr = styles.xpath("w:docDefaults/w:pPrDefault/w:pPr")
+        self.rPr = r_pr[0] if r_pr else None
+        self.pPr = p_pr[0] if p_pr else None
+
+
+class StyleResolver:
+    """
+    Looks styles up and resolves effective fonts and paragraph formats of a document.
+
+    Styles are indexed by name and id once, instead of python-docx scanning
+    all the style elements on every lookup. A paragraph's properties come
+    from the document defaults, its style chain and its direct formatting.
+    They are resolved once for every style and direct formatting, which is
+    identified by the serialized pPr/rPr, and returned as immutable records.
+    The resolver of a document is shared by all its paragraphs. Styles added
+    to the document are indexed on the next lookup, but if the existing
+    styles are modified after paragraphs are created, invalidate must be
+    called.
+    """
+
+    def __init__(self, styles: CT_Styles):
+        self._styles = styles
+        self.invalidate()
+
+    def invalidate(self):
+        self._size = len(self._styles)
+        self._by_name: dict[str, CT_Style] = {}
+        self._by_id: dict[str, CT_Style] = {}
+        self._defaults: dict[WD_STYLE_TYPE, CT_Style] = {}
+        for style in self._styles.style_lst:
+            if style.name_val is not None:
+                self._by_name.setdefault(style.name_val, style)
+            if style.styleId is not None:
+                self._by_id.setdefault(style.styleId, style)
+            if style.default:
+                self._defaults[style.type] = style  # the last default style is used, as in Word
+
+        self._doc_defaults = _DocDefaults(self._styles)
+        self._style_fonts: dict[str, tuple] = {}
+        self._style_formats: dict[str, tuple] = {}
+        self._style_contextual_spacing: dict[str, bool] = {}
+        self._paragraph_formats: dict[tuple[str, bytes], ResolvedParagraphFormat] = {}
+        self._run_fonts: dict[tuple[ResolvedFont, bytes], ResolvedFont] = {}
+
+    def _check_added(self):
+        """Indexes the styles again if any were added, e.g. by python-docx styles.add_style"""
+        if len(self._styles) != self._size:
+            self.invalidate()
+
+    def get_style(self, name: str) -> CT_Style:
+        """Returns the style element with the UI name, e.g. "Heading 1" """
+        self._check_added()
+        if (style := self._by_name.get(BabelFish.ui2internal(name))) is None:
+            raise KeyError(f"no style with name '{name}'")
+        return style
+
+    def get_style_id(self, name: str, style_type: WD_STYLE_TYPE) -> str | None:
+        """
+        Returns the id to reference the style with the UI name, which must be of style_type,
+        or None for the default style of the type, the same way python-docx does.
+        """
+        style = self.get_style(name)
+        if style.type != style_type:
+            raise ValueError(f"assigned style is type {style.type}, need type {style_type}")
+        if style is self._defaults.get(style_type):
+            return None
+        return style.styleId
+
+    def set_paragraph_style(self, paragraph: Paragraph, name: str):
+        paragraph._p.style = self.get_style_id(name, WD_STYLE_TYPE.PARAGRAPH)
+
+    def set_run_style(self, run: Run, name: str):
+        run._r.style = self.get_style_id(name, WD_STYLE_TYPE.CHARACTER)
+
+    def set_table_style(self, table: Table, name: str):
+        table._tbl.tblStyle_val = self.get_style_id(name, WD_STYLE_TYPE.TABLE)
+
+    def paragraph_style_id(self, paragraph: Paragraph) -> str:
+        """Returns the id of the effective style of the paragraph, falling back to the default one"""
+        return self._style_element(paragraph._p.style).styleId
+
+    def seed(self, style_fonts: dict[str, ResolvedFont], style_paragraph_formats: dict[str, ResolvedParagraphFormat]):
+        """Uses the fonts and paragraph formats of styles resolved beforehand, e.g. from a TemplateProfile"""
+        self._style_fonts.update(style_fonts)
+        for style_id, paragraph_format in style_paragraph_formats.items():
+            self._style_formats[style_id] = tuple(paragraph_format[:-1])
+            self._style_contextual_spacing[style_id] = paragraph_format.contextual_spacing
+
+    def default_font(self) -> ResolvedFont:
+        return ResolvedFont(*_read_font(self._doc_defaults))
+
+    def default_paragraph_format(self) -> ResolvedParagraphFormat:
+        p_pr = self._doc_defaults.pPr
+        return ResolvedParagraphFormat(*_read_paragraph_format(self._doc_defaults),
+                                       bool(p_pr is not None and p_pr.xpath("./w:contextualSpacing")))
+
+    def style_font(self, style_id: str) -> ResolvedFont:
+        return ResolvedFont(*self._style_font(style_id))
+
+    def style_paragraph_format(self, style_id: str) -> ResolvedParagraphFormat:
+        """Returns the paragraph format of the paragraph style, without direct formatting"""
+        return ResolvedParagraphFormat(*self._style_format(style_id), self._style_contextual_spacing[style_id])
+
+    def paragraph_font(self, paragraph: Paragraph) -> ResolvedFont:
+        return ResolvedFont(*self._style_font(self.paragraph_style_id(paragraph)))
+
+    def paragraph_format(self, paragraph: Paragraph) -> ResolvedParagraphFormat:
+        style_id = self.paragraph_style_id(paragraph)
+        p_pr: CT_PPr | None = paragraph._p.pPr
+        key = (style_id, _signature(p_pr))
+        if (paragraph_format := self._paragraph_formats.get(key)) is None:
+            self._style_format(style_id)  # resolves the contextual spacing of the style
+            contextual_spacing = self._style_contextual_spacing[style_id] or \
+                bool(p_pr is not None and p_pr.xpath("./w:contextualSpacing"))
+            paragraph_format = self._paragraph_formats[key] = ResolvedParagraphFormat(
+                *_merge([self._style_format(style_id), _read_paragraph_format(paragraph._p)]), contextual_spacing)
+        return paragraph_format
+
+    def run_font(self, paragraph_font: ResolvedFont, r_pr: CT_RPr | None) -> ResolvedFont:
+        """Returns the font of a run with r_pr properties in a paragraph with paragraph_font"""
+        if r_pr is None:
+            return paragraph_font
+        key = (paragraph_font, _signature(r_pr))
+        if (font := self._run_fonts.get(key)) is None:
+            font = self._run_fonts[key] = ResolvedFont(*_merge([paragraph_font, _read_font(r_pr.getparent())]))
+        return font
+
+    def _style_element(self, style_id: str | None) -> CT_Style:
+        self._check_added()
+        style = self._by_id.get(style_id) if style_id is not None else None
+        if style is None or style.type != WD_STYLE_TYPE.PARAGRAPH:
+            style = self._defaults.get(WD_STYLE_TYPE.PARAGRAPH)
+        return style
+
+    def _style_chain(self, style_id: str) -> list:
+        """Returns the document defaults followed by the style and its base styles, from the base one"""
+        chain = [self._style_element(style_id)]
+        while (based_on := chain[-1].basedOn_val) is not None and (base_style := self._by_id.get(based_on)) is not None:
+            chain.append(base_style)
+        chain.append(self._doc_defaults)
+        return chain[::-1]
+
+    def _style_font(self, style_id: str) -> tuple:
+        if (font := self._style_fonts.get(style_id)) is None:
+            font = self._style_fonts[style_id] = tuple(_merge([_read_font(style)
+                                                               for style in self._style_chain(style_id)]))
+        return font
+
+    def _style_format(self, style_id: str) -> tuple:
+        if (paragraph_format := self._style_formats.get(style_id)) is None:
+            chain = self._style_chain(style_id)
+            paragraph_format = self._style_formats[style_id] = tuple(_merge([_read_paragraph_format(style)
+                                                                             for style in chain]))
+            self._style_contextual_spacing[style_id] = any(
+                style.pPr is not None and style.pPr.xpath("./w:contextualSpacing") for style in chain)
+        return paragraph_format
+
+
+_resolvers: WeakKeyDictionary[DocumentPart, StyleResolver] = WeakKeyDictionary()
+_resolvers_lock = Lock()
+
+
+def get_style_resolver(document_part: DocumentPart) -> StyleResolver:
+    with _resolvers_lock:
+        if (resolver := _resolvers.get(document_part)) is None:
+            from .template_profile import get_template_profile
+            profile = get_template_profile(document_part)
+            resolver = _resolvers[document_part] = StyleResolver(document_part.styles.element)
+            resolver.seed(profile.style_fonts, profile.style_paragraph_formats)
+        return resolver
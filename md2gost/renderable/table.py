@@ -1,13 +1,18 @@
 from copy import copy, deepcopy
-from typing import Generator
+from dataclasses import dataclass, field
+from typing import Generator, Iterator
 
 from docx.shared import Parented, Length, Pt, Twips
+from docx.text.paragraph import Paragraph as DocxParagraph
 
 from . import Paragraph
 from .caption import Caption, CaptionInfo
+from .reference import Reference
 from .renderable import Renderable
 from .requires_numbering import RequiresNumbering
+from .template_profile import get_template_profile
 from ..docx_elements import *
+from ..layout_plan import LayoutPlan
 from ..layout_tracker import LayoutState
 from ..rendered_info import RenderedInfo
 from ..sub_renderable import SubRenderable
@@ -17,18 +22,13 @@ CELL_OFFSET = Pt(9) - Twips(108*2)
 
 class Table(Renderable, RequiresNumbering):
     def __init__(self, parent: Parented, rows: int, cols: int, caption_info: CaptionInfo):
-        super().__init__("Таблица")
+        super().__init__("Таблица", caption_info.unique_name if caption_info else None)
         self._parent = parent
         self._caption_info = caption_info
         self._cols = cols
 
-        sect = parent.part.document.sections[0]
-
-        # todo: style inheritance
-        left_margin = Twips(int(parent.part.styles["Normal Table"]._element.xpath("w:tblPr/w:tblCellMar/w:left")[0].attrib["{http://schemas.openxmlformats.org/wordprocessingml/2006/main}w"]))
-        right_margin = Twips(int(parent.part.styles["Normal Table"]._element.xpath("w:tblPr/w:tblCellMar/w:right")[0].attrib["{http://schemas.openxmlformats.org/wordprocessingml/2006/main}w"]))
-
-        self._table_width = sect.page_width - sect.left_margin - sect.right_margin + left_margin + right_margin
+        profile = get_template_profile(parent.part)
+        self._table_width = profile.text_width + profile.cell_left_margin + profile.cell_right_margin
         self._number = "?"
 
         self._rows: list[list[list[Paragraph]]] = [[[] for i in range(cols)] for j in range(rows)]
@@ -45,64 +45,118 @@ class Table(Renderable, RequiresNumbering):
     def set_number(self, number):
         self._number = number
 
+    @property
+    def _cell_width(self) -> Length:
+        return self._table_width / self._cols - CELL_OFFSET
+
+    def _create_caption(self) -> Caption:
+        return Caption(self._parent, "Таблица", self._caption_info, self._number, True)
+
+    def _create_continuation(self) -> Paragraph:
+        """Caption of the part of the table continued on the next page"""
+        paragraph = Paragraph(self._parent)
+        paragraph.add_run("Продолжение таблицы")
+        paragraph.style = "Caption"
+        paragraph.first_line_indent = 0
+        paragraph.page_break_before = True
+        return paragraph
+
+    def text_paragraphs(self, max_width: Length) -> Iterator[tuple[DocxParagraph, Length]]:
+        yield from self._create_caption().text_paragraphs(max_width)
+        # the same for all the parts, measured even if the table isn't split
+        yield from self._create_continuation().text_paragraphs(max_width)
+        for row in self._rows:
+            for cell in row:
+                for paragraph in cell:
+                    yield from paragraph.text_paragraphs(self._cell_width)
+
+    def references(self) -> Iterator[Reference]:
+        for row in self._rows:
+            for cell in row:
+                for paragraph in cell:
+                    yield from paragraph.references()
+
     def render(self, previous_rendered: RenderedInfo, layout_state: LayoutState)\
             -> Generator[RenderedInfo | SubRenderable, None, None]:
-        caption_rendered_infos = list(
-            Caption(self._parent, "Таблица", self._caption_info, self._number, True)
-            .render(previous_rendered, copy(layout_state))
-        )
-        layout_state.add_height(sum([info.height for info in caption_rendered_infos]))
-        yield from caption_rendered_infos
+        yield from self.commit(self.measure(previous_rendered, layout_state))
+
+    def measure(self, previous_rendered: RenderedInfo | None, layout_state: LayoutState) -> "TablePlan":
+        plan = TablePlan(previous_rendered, copy(layout_state), caption=self._create_caption())
+        layout_state = copy(layout_state)
+        plan.caption_plan = plan.caption.measure(previous_rendered, layout_state)
+        plan.items.extend(plan.caption_plan.items)
+        layout_state.add_height(sum([info.height for info in plan.caption_plan.items]))
 
-        docx_table = create_table(self._parent, 0, self._cols, self._table_width)
+        # the tables of the parts are created once the plan is committed
+        plan.parts.append(0)
 
         table_height = Pt(0.5)  # top border
 
-        for row in self._rows:
-            docx_row = create_table_row(docx_table)
+        for i, row in enumerate(self._rows):
+            row_plans = []
             row_height = 0
-            for i in range(self._cols):
-                docx_cell = create_table_cell(docx_row, self._table_width / self._cols)
+            for cell in row:
+                cell_plans = []
                 cell_height = 0
-                for paragraph in row[i]:
+                for paragraph in cell:
                     cell_layout_state = LayoutState(
                         layout_state.max_height, layout_state.max_width
                     )
-                    cell_layout_state.max_width = self._table_width / self._cols - CELL_OFFSET
-                    for paragraph_rendered_info in paragraph.render(None, cell_layout_state):
-                        docx_cell._element.append(paragraph_rendered_info.docx_element._element)
-                        cell_height += paragraph_rendered_info.height
+                    cell_layout_state.max_width = self._cell_width
+                    cell_plans.append(paragraph_plan := paragraph.measure(None, cell_layout_state))
+                    cell_height += sum([info.height for info in paragraph_plan.items])
                     row_height = max(cell_height, row_height)
-                docx_row._element.append(docx_cell._element)
+                row_plans.append(cell_plans)
+            plan.cell_plans.append(row_plans)
 
             row_height += Pt(0.5)  # bottom row border
 
             if row_height > layout_state.remaining_page_height:
-                table_rendered_info = RenderedInfo(docx_table, table_height)
-                yield table_rendered_info
+                plan.items.append(RenderedInfo(None, table_height))
 
                 table_height = Pt(0.5)  # top border
 
-                continuation_paragraph = Paragraph(self._parent)
-                continuation_paragraph.add_run("Продолжение таблицы")
-                continuation_paragraph.style = "Caption"
-                continuation_paragraph.first_line_indent = 0
-                continuation_paragraph.page_break_before = True
-
-                continuation_rendered_info = next(
-                    continuation_paragraph.render(None, copy(layout_state)))
+                continuation_rendered_info = self._create_continuation().measure(None, layout_state).items[0]
 
                 layout_state.add_height(continuation_rendered_info.height)
-                yield continuation_rendered_info
+                plan.items.append(continuation_rendered_info)
 
-                docx_table = create_table(self._parent, 0, self._cols, self._table_width)
+                plan.parts.append(i)
 
-                # previous = None
-
-            docx_table._element.append(docx_row._element)
             layout_state.add_height(row_height)
             table_height += row_height
 
-            # previous = paragraph_rendered_info
-
-        yield RenderedInfo(docx_table, table_height)
+        plan.items.append(RenderedInfo(None, table_height))
+        return plan
+
+    def commit(self, plan: "TablePlan") -> list[RenderedInfo]:
+        plan.caption.commit(plan.caption_plan)
+        tables = []
+        for start, end in zip(plan.parts, plan.parts[1:] + [len(self._rows)]):
+            docx_table = create_table(self._parent, 0, self._cols, self._table_width)
+            for row, row_plans in zip(self._rows[start:end], plan.cell_plans[start:end]):
+                docx_row = create_table_row(docx_table)
+                for cell, cell_plans in zip(row, row_plans):
+                    docx_cell = create_table_cell(docx_row, self._table_width / self._cols)
+                    for paragraph, paragraph_plan in zip(cell, cell_plans):
+                        for paragraph_rendered_info in paragraph.commit(paragraph_plan):
+                            docx_cell._element.append(paragraph_rendered_info.docx_element._element)
+                    docx_row._element.append(docx_cell._element)
+                docx_table._element.append(docx_row._element)
+            tables.append(docx_table)
+        tables = iter(tables)
+        return [RenderedInfo(next(tables), info.height) if info.docx_element is None else info
+                for info in plan.items]
+
+
+@dataclass(slots=True)
+class TablePlan(LayoutPlan):
+    """
+    Layout of a table: its caption, the layouts of the paragraphs of the cells of every row and the
+    index of the first row of each part the rows are split into between the pages. The items of the
+    parts have no element, the commit creates their tables.
+    """
+    caption: Caption | None = None
+    caption_plan: LayoutPlan | None = None
+    cell_plans: list[list[list[LayoutPlan]]] = field(default_factory=list)
+    parts: list[int] = field(default_factory=list)
@@ -0,0 +1,251 @@
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass, fields
+from threading import Lock
+from weakref import WeakKeyDictionary
+
+from docx.document import Document
+from docx.enum.base import EnumValue
+from docx.enum.style import WD_STYLE_TYPE
+from docx.enum.text import WD_LINE_SPACING
+from docx.opc.constants import RELATIONSHIP_TYPE
+from docx.parts.document import DocumentPart
+from docx.shared import Length, Twips, Inches
+from lxml import etree
+
+from .style_resolver import ResolvedFont, ResolvedParagraphFormat, StyleResolver
+from ..util import cache_dir
+
+# bumped whenever the contents of the profile change, so stale profiles are not used
+PROFILE_VERSION = 2
+
+_LINE_SPACING_RULES = {int(value): value for value in vars(WD_LINE_SPACING).values() if isinstance(value, EnumValue)}
+
+
+def default_profiles_path() -> str:
+    return cache_dir("templates")
+
+
+def _cell_margin(document: Document, side: str) -> Length:
+    # todo: style inheritance
+    margin = document.styles.element.xpath(f"w:style[w:name/@w:val='Normal Table']/w:tblPr/w:tblCellMar/w:{side}/@w:w")
+    return Twips(int(margin[0])) if margin else Twips(108)
+
+
+# attributes of w:rFonts naming the fonts of the scripts, and the ones referring to the theme fonts
+_FONT_ATTRIBUTES = ("ascii", "hAnsi", "cs", "eastAsia")
+_THEME_FONT_ATTRIBUTES = ("asciiTheme", "hAnsiTheme", "cstheme", "eastAsiaTheme")
+# elements of the major or minor font of the theme by the script of the theme font reference, e.g. minorHAnsi
+_THEME_SCRIPTS = {"Ascii": "latin", "HAnsi": "latin", "EastAsia": "ea", "Bidi": "cs"}
+_THEME_NAMESPACES = {"a": "http://schemas.openxmlformats.org/drawingml/2006/main"}
+
+
+def _theme_fonts(document: Document) -> dict[str, str]:
+    """Typefaces of the theme fonts by the values referring to them, e.g. majorHAnsi"""
+    try:
+        theme = etree.fromstring(document.part.part_related_by(RELATIONSHIP_TYPE.THEME).blob)
+    except KeyError:
+        return {}
+    fonts = {}
+    for kind in ("major", "minor"):
+        for script, element in _THEME_SCRIPTS.items():
+            typeface = theme.xpath(f"//a:{kind}Font/a:{element}/@typeface", namespaces=_THEME_NAMESPACES)
+            if typeface and typeface[0]:
+                fonts[kind + script] = typeface[0]
+    return fonts
+
+
+def _font_names(document: Document) -> set[str]:
+    """Names of the fonts of all the scripts the styles refer to, directly or through the theme"""
+    styles = document.styles.element
+    names = {name for attribute in _FONT_ATTRIBUTES for name in styles.xpath(f"//w:rFonts/@w:{attribute}")}
+    theme_fonts = _theme_fonts(document)
+    for attribute in _THEME_FONT_ATTRIBUTES:
+        names.update(theme_fonts[value] for value in styles.xpath(f"//w:rFonts/@w:{attribute}")
+                     if value in theme_fonts)
+    return names
+
+
+@dataclass(frozen=True)
+class TemplateProfile:
+    """Everything the layout reads from the template, computed once for it.
+
+    The profile of a template is identified by a digest of the template
+    file, it is shared by all the conversions in the process and saved to
+    disk, so the next runs load it instead of querying the template again.
+    """
+    digest: str
+    page_width: Length
+    page_height: Length
+    top_margin: Length
+    left_margin: Length
+    right_margin: Length
+    cell_left_margin: Length
+    cell_right_margin: Length
+    default_tab_stop: Length
+    default_font: ResolvedFont
+    default_paragraph_format: ResolvedParagraphFormat
+    # effective fonts and paragraph formats of the paragraph styles by style id
+    style_fonts: dict[str, ResolvedFont]
+    style_paragraph_formats: dict[str, ResolvedParagraphFormat]
+    font_names: tuple[str, ...]
+    font_sizes: tuple[float, ...]
+
+    @property
+    def text_width(self) -> Length:
+        """Width between the page margins"""
+        return Length(self.page_width - self.left_margin - self.right_margin)
+
+    @classmethod
+    def compute(cls, document: Document, digest: str) -> "TemplateProfile":
+        section = document.sections[0]
+        styles = document.styles.element
+        tab_stop = document.settings.element.xpath("w:defaultTabStop/@w:val")
+
+        style_resolver = StyleResolver(styles)
+        style_ids = [style.styleId for style in styles.style_lst
+                     if style.type == WD_STYLE_TYPE.PARAGRAPH and style.styleId is not None]
+
+        return cls(
+            digest=digest,
+            page_width=section.page_width,
+            page_height=section.page_height,
+            top_margin=section.top_margin,
+            left_margin=section.left_margin,
+            right_margin=section.right_margin,
+            cell_left_margin=_cell_margin(document, "left"),
+            cell_right_margin=_cell_margin(document, "right"),
+            default_tab_stop=Twips(int(tab_stop[0])) if tab_stop else Inches(0.5),
+            default_font=style_resolver.default_font(),
+            default_paragraph_format=style_resolver.default_paragraph_format(),
+            style_fonts={style_id: style_resolver.style_font(style_id) for style_id in style_ids},
+            style_paragraph_formats={style_id: style_resolver.style_paragraph_format(style_id)
+                                     for style_id in style_ids},
+            font_names=tuple(sorted(_font_names(document))),
+            font_sizes=tuple(sorted({int(value) / 2 for value in styles.xpath("//w:sz/@w:val")})),
+        )
+
+    def to_json(self) -> str:
+        # not asdict, it deep copies the values and python-docx enums can't be copied
+        return json.dumps({field.name: getattr(self, field.name) for field in fields(self)})
+
+    @classmethod
+    def from_json(cls, data: str) -> "TemplateProfile":
+        values = json.loads(data)
+        lengths = ("page_width", "page_height", "top_margin", "left_margin", "right_margin",
+                   "cell_left_margin", "cell_right_margin", "default_tab_stop")
+        for name in lengths:
+            values[name] = Length(values[name])
+        values["default_font"] = _font_from_json(values["default_font"])
+        values["default_paragraph_format"] = _paragraph_format_from_json(values["default_paragraph_format"])
+        values["style_fonts"] = {style_id: _font_from_json(font)
+                                 for style_id, font in values["style_fonts"].items()}
+        values["style_paragraph_formats"] = {style_id: _paragraph_format_from_json(paragraph_format)
+                                             for style_id, paragraph_format
+                                             in values["style_paragraph_formats"].items()}
+        values["font_names"] = tuple(values["font_names"])
+        values["font_sizes"] = tuple(values["font_sizes"])
+        return cls(**values)
+
+
+def _length(value: int | None) -> Length | None:
+    return Length(value) if value is not None else None
+
+
+def _font_from_json(font: list) -> ResolvedFont:
+    name, bold, italic, size = font
+    return ResolvedFont(name, bold, italic, _length(size))
+
+
+def _paragraph_format_from_json(paragraph_format: list) -> ResolvedParagraphFormat:
+    (left_indent, right_indent, first_line_indent, space_before, space_after, line_spacing, line_spacing_rule,
+     contextual_spacing) = paragraph_format
+    return ResolvedParagraphFormat(
+        _length(left_indent), _length(right_indent), _length(first_line_indent), _length(space_before),
+        _length(space_after),
+        # a multiple of lines is a float, exact spacing is a length
+        _length(line_spacing) if isinstance(line_spacing, int) else line_spacing,
+        _LINE_SPACING_RULES[line_spacing_rule] if line_spacing_rule is not None else None,
+        contextual_spacing)
+
+
+def template_digest(template_path: str) -> str:
+    digest = hashlib.blake2b(str(PROFILE_VERSION).encode(), digest_size=20)
+    with open(template_path, "rb") as f:
+        while chunk := f.read(1 << 20):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _document_digest(document: Document) -> str:
+    """Digest of the parts of a document the profile is computed from, for documents not created from a file"""
+    digest = hashlib.blake2b(str(PROFILE_VERSION).encode(), digest_size=20)
+    for element in (document.styles.element, document.settings.element, document.sections[0]._sectPr):
+        digest.update(etree.tostring(element))
+    return digest.hexdigest()
+
+
+_profiles: dict[str, TemplateProfile] = {}
+_document_profiles: WeakKeyDictionary[DocumentPart, TemplateProfile] = WeakKeyDictionary()
+_profiles_lock = Lock()
+
+
+def _load_profile(path: str, digest: str) -> TemplateProfile | None:
+    try:
+        with open(path, encoding="utf-8") as f:
+            profile = TemplateProfile.from_json(f.read())
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logging.warning(f"Can't load the template profile {path}: {e}")
+        return None
+    return profile if profile.digest == digest else None
+
+
+def _save_profile(path: str, profile: TemplateProfile):
+    data = profile.to_json()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(temp_path, path)  # concurrent conversions never see a partially written profile
+    except OSError as e:
+        logging.warning(f"Can't save the template profile {path}: {e}")
+
+
+def load_template_profile(document: Document, template_path: str,
+                          profiles_path: str | None = None) -> TemplateProfile:
+    """
+    Returns the profile of the template the document was created from, computing
+    it only if it is neither in memory nor saved to profiles_path, and assigns
+    it to the document.
+    """
+    digest = template_digest(template_path)
+    with _profiles_lock:
+        if (profile := _profiles.get(digest)) is None:
+            path = os.path.join(profiles_path or default_profiles_path(), f"{digest}.json")
+            if (profile := _load_profile(path, digest)) is None:
+                profile = TemplateProfile.compute(document, digest)
+                _save_profile(path, profile)
+            _profiles[digest] = profile
+    assign_template_profile(document, profile)
+    return profile
+
+
+def assign_template_profile(document: Document, profile: TemplateProfile):
+    """Makes the document use the profile, e.g. the profile of the template a copy of the document was made from"""
+    with _profiles_lock:
+        _document_profiles[document.part] = profile
+
+
+def get_template_profile(document_part: DocumentPart) -> TemplateProfile:
+    """Returns the profile assigned to the document, computing it from the document if there is none"""
+    with _profiles_lock:
+        if (profile := _document_profiles.get(document_part)) is None:
+            document = document_part.document
+            profile = _document_profiles[document_part] = TemplateProfile.compute(
+                document, _document_digest(document))
+        return profile
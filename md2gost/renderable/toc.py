@@ -1,13 +1,17 @@
-from copy import copy
+from copy import copy, deepcopy
+from dataclasses import replace
 from typing import Generator
 
 from docx.enum.text import WD_TAB_LEADER, WD_TAB_ALIGNMENT, WD_PARAGRAPH_ALIGNMENT
 from docx.shared import Parented, Pt
+from docx.text.paragraph import Paragraph as DocxParagraph
 from docx.text.run import Run
 
 from . import Paragraph
 from .page_break import PageBreak
+from .paragraph_sizer import ParagraphSizer
 from .renderable import Renderable
+from .template_profile import get_template_profile
 from ..layout_tracker import LayoutState
 from ..rendered_info import RenderedInfo
 from ..sub_renderable import SubRenderable
@@ -40,40 +44,86 @@ class ToC(Renderable):
     """
     Items are added by calling add_item(level, title, page) method.
     After the document is fully rendered fill must be called.
+
+    The layout reserves the lines of the items passed to reserve, e.g. the ones estimated
+    from the markdown before the pages are known, so the elements following the table of
+    contents are laid out after its real height. fill replaces them with the added items.
     """
 
     def __init__(self, parent: Parented):
         self._parent = parent
         self._paragraph = Paragraph(parent)
-        self._paragraph._docx_paragraph.paragraph_format.alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
+        p = self._paragraph._docx_paragraph
+        p.paragraph_format.alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
         self._paragraph.first_line_indent = 0
+        p.paragraph_format.tab_stops.add_tab_stop(
+            get_template_profile(p.part).text_width,
+            alignment=WD_TAB_ALIGNMENT.RIGHT, leader=WD_TAB_LEADER.DOTS)
+        p.paragraph_format.tab_stops.add_tab_stop(0, alignment=WD_TAB_ALIGNMENT.LEFT, leader=WD_TAB_LEADER.SPACES)
         self._items: list[tuple[int, str, int, bool]] = []
-        pass
+        self._reserved: list[tuple[int, str, int, bool]] = []
+        # lines of the reserved items, counted when laid out
+        self.reserved_lines = 0
+        self._sizer: ParagraphSizer | None = None
 
     def add_item(self, level: int, title: str, page: int, numbered: bool):
         self._items.append((level, title, page, numbered))
 
+    @property
+    def reserved_items(self) -> list[tuple[int, str, int, bool]]:
+        return self._reserved
+
+    def reserve(self, items: list[tuple[int, str, int, bool]]):
+        """Fills the table of contents with the items, so their lines are reserved when it's laid out"""
+        self._reserved = list(items)
+        self._paragraph.height_data = None
+        self._replace_runs(self._paragraph._docx_paragraph, self._reserved)
+
     def fill(self):
+        if self._items != self._reserved:
+            self._replace_runs(self._paragraph._docx_paragraph, self._items)
+
+    def count_lines(self, items: list[tuple[int, str, int, bool]]) -> int:
+        """Lines the items take in the table of contents, as laid out by render"""
         p = self._paragraph._docx_paragraph
-        p.paragraph_format.tab_stops.add_tab_stop(
-            p.part.document.sections[0].page_width - p.part.document.sections[0].left_margin - p.part.document.sections[0].right_margin,
-            alignment=WD_TAB_ALIGNMENT.RIGHT, leader=WD_TAB_LEADER.DOTS)
-        p.paragraph_format.tab_stops.add_tab_stop(0, alignment=WD_TAB_ALIGNMENT.LEFT, leader=WD_TAB_LEADER.SPACES)
+        scratch = DocxParagraph(create_element("w:p", [deepcopy(p._p.pPr)]), p._parent)
+        return sum(self._sizer.count_runs_lines(runs) for runs in self._replace_runs(scratch, items))
 
+    @staticmethod
+    def _replace_runs(p: DocxParagraph, items: list[tuple[int, str, int, bool]]) -> list[list[Run]]:
+        """Replaces the runs of p with the ones of the items, returns the runs of each item but the line breaks"""
+        for r in p._p.r_lst:
+            p._p.remove(r)
+
+        item_runs = []
         numbering = [0 for _ in range(10)]
-        for level, title, page, numbered in self._items:
+        for level, title, page, numbered in items:
             numbering[level-1] += 1
             for i in range(level, len(numbering)):
                 numbering[i] = 0
-            p.add_run("    "*(level-1))
+            runs = [p.add_run("    "*(level-1))]
             if numbered:
-                p.add_run(".".join([str(x) for x in numbering[:level]])+". ")
-            p.add_run(title)
-            p.add_run(f"\t{page}")
+                runs.append(p.add_run(".".join([str(x) for x in numbering[:level]])+". "))
+            runs.append(p.add_run(title))
+            runs.append(p.add_run(f"\t{page}"))
             p.add_run("\n")
+            item_runs.append(runs)
+        return item_runs
 
     def render(self, previous_rendered: RenderedInfo, layout_state: LayoutState)\
             -> Generator[RenderedInfo | SubRenderable, None, None]:
+        p = self._paragraph._docx_paragraph
+        self._sizer = ParagraphSizer(
+            p, previous_rendered.docx_element
+            if previous_rendered and isinstance(previous_rendered.docx_element, DocxParagraph) else None,
+            layout_state.max_width)
+        self.reserved_lines = self.count_lines(self._reserved)
+        # the lines of the paragraph are the ones of its items, which end with line breaks
+        self._paragraph.height_data = replace(self._sizer.calculate_height(), lines=max(self.reserved_lines, 1))
+
+        layout_state = copy(layout_state)
         for rendered_info in self._paragraph.render(previous_rendered, copy(layout_state)):
-            yield RenderedInfo(rendered_info.docx_element, 0)
-        yield from PageBreak(self._parent).render(None, copy(layout_state))
+            yield rendered_info
+            layout_state.add_height(rendered_info.height)
+            previous_rendered = rendered_info
+        yield from PageBreak(self._parent).render(previous_rendered, layout_state)
@@ -16,8 +16,15 @@ from .renderable.toc import ToC
 
 
 class RenderableFactory:
-    def __init__(self, parent: Parented):
+    def __init__(self, parent: Parented, label_numbers: dict[str, tuple[str, int]] | None = None):
         self._parent = parent
+        # categories and numbers of the labeled elements expected from the markdown, see Parser.label_numbers
+        self._label_numbers = label_numbers or {}
+
+    def _expected_number(self, reference: extended_markdown.Reference) -> int | None:
+        """Number the reference holds until it's resolved, None if no element of its type has its label"""
+        category, number = self._label_numbers.get(reference.name, (None, None))
+        return number if category == reference.type else None
 
     @singledispatchmethod
     def create(self, marko_element: extended_markdown.BlockElement,
@@ -27,8 +34,7 @@ class RenderableFactory:
         logging.warning(f"{marko_element.get_type()} is not supported")
         return paragraph
 
-    @staticmethod
-    def _create_runs(paragraph_or_link: Paragraph | Link, children, classes: list[type] = None):
+    def _create_runs(self, paragraph_or_link: Paragraph | Link, children, classes: list[type] = None):
         if not classes:
             classes = []
         for child in children:
@@ -40,33 +46,56 @@ class RenderableFactory:
             elif isinstance(child, extended_markdown.CodeSpan):
                 paragraph_or_link.add_run(child.children, is_italic=True)
             elif isinstance(child, extended_markdown.Image):
-                paragraph_or_link.add_image(child.dest, CaptionInfo(None, child.title))
+                paragraph_or_link.add_image(child.dest, CaptionInfo(child.unique_name, child.title))
             elif isinstance(child, extended_markdown.LineBreak):
                 pass  # ignore
             elif isinstance(child, extended_markdown.InlineEquation):
                 paragraph_or_link.add_inline_equation(child.latex_equation)
+            elif isinstance(child, extended_markdown.Reference):
+                paragraph_or_link.add_reference(child.type, child.name, self._expected_number(child),
+                                                is_bold=extended_markdown.StrongEmphasis in classes or None,
+                                                is_italic=extended_markdown.Emphasis in classes or None,
+                                                strike_through=extended_markdown.Strikethrough in classes or None)
             elif isinstance(child, (extended_markdown.Link, extended_markdown.Url)):
-                RenderableFactory._create_runs(paragraph_or_link.add_link(child.dest),
-                                               child.children, classes)
+                self._create_runs(paragraph_or_link.add_link(child.dest), child.children, classes)
             elif isinstance(child, (extended_markdown.Emphasis, extended_markdown.StrongEmphasis,
                                     extended_markdown.Strikethrough)):
-                RenderableFactory._create_runs(paragraph_or_link,
-                                               child.children, classes + [type(child)])
+                self._create_runs(paragraph_or_link, child.children, classes + [type(child)])
             else:
                 paragraph_or_link.add_run(f" {child.get_type()} is not supported ",
                                           color=RGBColor.from_string("FF0000"))
                 logging.warning(f"{child.get_type()} is not supported")
 
+    def text(self, children) -> str:
+        """Text of the paragraph _create_runs makes of the children, as docx reads it"""
+        text = ""
+        for child in children:
+            if isinstance(child, (extended_markdown.RawText, extended_markdown.Literal,
+                                  extended_markdown.CodeSpan)):
+                # hyphens are replaced with non-breaking ones, which have no text
+                text += child.children.replace("-", "")
+            elif isinstance(child, extended_markdown.InlineEquation):
+                text += child.latex_equation.replace("-", "")
+            elif isinstance(child, extended_markdown.Reference):
+                text += str(self._expected_number(child) or "?")
+            elif isinstance(child, (extended_markdown.Emphasis, extended_markdown.StrongEmphasis,
+                                    extended_markdown.Strikethrough)):
+                text += self.text(child.children)
+            elif not isinstance(child, (extended_markdown.Image, extended_markdown.LineBreak,
+                                        extended_markdown.Link, extended_markdown.Url)):
+                text += f" {child.get_type()} is not supported "  # links are not read as text
+        return text
+
     @create.register
     def _(self, marko_paragraph: extended_markdown.Paragraph, caption_info: CaptionInfo):
         paragraph = Paragraph(self._parent)
-        RenderableFactory._create_runs(paragraph, marko_paragraph.children)
+        self._create_runs(paragraph, marko_paragraph.children)
         return paragraph
 
     @create.register
     def _(self, marko_heading: extended_markdown.Heading, caption_info: CaptionInfo):
         heading = Heading(self._parent, marko_heading.level, marko_heading.numbered)
-        RenderableFactory._create_runs(heading, marko_heading.children)
+        self._create_runs(heading, marko_heading.children)
         return heading
 
     @create.register
@@ -77,7 +106,8 @@ class RenderableFactory:
 
     @create.register
     def _(self, marko_equation: extended_markdown.Equation, caption_info: CaptionInfo):
-        formula = Equation(self._parent, marko_equation.latex_equation)
+        formula = Equation(self._parent, marko_equation.latex_equation,
+                           caption_info.unique_name if caption_info else None)
         return formula
 
     @create.register
@@ -90,7 +120,7 @@ class RenderableFactory:
                     if isinstance(child, extended_markdown.List):
                         create_items_from_marko(child, level + 1)
                     elif isinstance(child, extended_markdown.Paragraph):
-                        RenderableFactory._create_runs(
+                        self._create_runs(
                             list_.add_item(level),
                             child.children
                         )
@@ -106,7 +136,7 @@ class RenderableFactory:
 
         for i, row in enumerate(marko_table.children):
             for j, cell in enumerate(row.children):
-                RenderableFactory._create_runs(
+                self._create_runs(
                     table.add_paragraph_to_cell(i, j),
                     cell.children
                 )
@@ -2,7 +2,8 @@ from dataclasses import dataclass
 from docx.shared import Parented, Length
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class RenderedInfo:
-    docx_element: Parented
+    # None in the plans of the renderables creating the element once committed, e.g. TablePlan
+    docx_element: Parented | None
     height: Length
@@ -1,22 +1,91 @@
+import logging
+import sys
+from collections.abc import Iterable
+from dataclasses import dataclass
+from itertools import islice
+from io import BytesIO
 from typing import TYPE_CHECKING
-from itertools import chain
 
 from docx.document import Document
+from docx.opc.constants import RELATIONSHIP_TYPE
+from docx.oxml import parse_xml
+from docx.oxml.ns import qn
 from docx.shared import Length, Cm, Parented, Pt
 from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+from docx.table import Table as DocxTable
+from docx.text.paragraph import Paragraph as DocxParagraph
+from docx.text.run import Run as DocxRun
+from lxml import etree
 
+from .layout_plan import LayoutPlan
 from .numberer import Numberer
+from .placement_journal import PlacementJournal
 from .renderable import Renderable
+from .renderable.heading import Heading
+from .renderable.reference import Reference
 from .renderable.requires_numbering import RequiresNumbering
+from .renderable.template_profile import get_template_profile
+from .renderable.toc import ToC
 from .rendered_info import RenderedInfo
 from .sub_renderable import SubRenderable
 from .util import create_element
-from .layout_tracker import LayoutTracker
+from .layout_tracker import LayoutState, LayoutTracker
 
 if TYPE_CHECKING:
     from .debugger import Debugger
+    from .parser_ import Parser
 
 BOTTOM_MARGIN = Cm(1.86)
+# times the part of the document from the table of contents is laid out again, see Renderer.fill_toc
+TOC_RELAYOUTS = 3
+
+# elements referring to the relationships the renderables add, with the attribute holding the rId
+_RELATIONSHIP_REFERENCES = {qn("w:hyperlink"): qn("r:id"), qn("a:blip"): qn("r:embed")}
+_R = qn("w:r")
+
+
+@dataclass
+class Checkpoint:
+    """
+    State after a renderable the layout of the following ones depends on: the position on
+    the page, the numbers of the numbered elements, the formatting of the previous element
+    (its pPr or tag and whether it's a page break) and the renderables waiting for a new page
+    """
+    layout_state: LayoutState
+    numbers: dict[str, int]
+    previous_style: tuple[str, bool] | None
+    pending: int
+
+
+def serialize_elements(elements: list[Parented]) -> tuple[bytes, list[tuple[str, str, str | bytes, bool]]]:
+    """
+    Serializes the elements added to the body as the children of one element, along with the
+    relationships they refer to: rId, type, url or image blob, is external. See Renderer._add_serialized
+    """
+    relationships = {}
+    for element in elements:
+        for node in element._element.iter(*_RELATIONSHIP_REFERENCES):
+            r_id = node.get(_RELATIONSHIP_REFERENCES[node.tag])
+            if r_id not in relationships:
+                rel = element.part.rels[r_id]
+                relationships[r_id] = (r_id, rel.reltype, rel.target_ref if rel.is_external else rel.target_part.blob,
+                                       rel.is_external)
+    return b"".join([b"<elements>", *(etree.tostring(element._element) for element in elements),
+                     b"</elements>"]), list(relationships.values())
+
+
+def serialize_references(elements: list[Parented], references: list[Reference]) -> list[tuple[int, int, str, str]]:
+    """
+    Places of the references in the elements added to the body: the index of the element and of the
+    run among its runs, along with the type and the label of the reference. See Renderer._add_references
+    """
+    runs = {reference.run._r: reference for reference in references}
+    places = []
+    for i, element in enumerate(elements):
+        for j, run in enumerate(element._element.iter(_R)):
+            if (reference := runs.get(run)) is not None:
+                places.append((i, j, reference.type, reference.label))
+    return places
 
 
 class Renderer:
@@ -26,10 +95,9 @@ class Renderer:
         self._document: Document = document
         self._numberer = Numberer()
         self._debugger = debugger
-        max_height = document.sections[0].page_height - document.sections[0].top_margin - BOTTOM_MARGIN# - ((136 / 2) * (Pt(1)*72/96))  # todo add bottom margin detection with footer
-        max_width = self._document.sections[0].page_width - self._document.sections[0].left_margin\
-            - self._document.sections[0].right_margin
-        self._layout_tracker = LayoutTracker(max_height, max_width)
+        profile = get_template_profile(document.part)
+        max_height = profile.page_height - profile.top_margin - BOTTOM_MARGIN# - ((136 / 2) * (Pt(1)*72/96))  # todo add bottom margin detection with footer
+        self._layout_tracker = LayoutTracker(max_height, profile.text_width)
 
         # add page numbering to the footer
         paragraph = self._document.sections[0].footer.paragraphs[0]
@@ -42,33 +110,154 @@ class Renderer:
         self.previous_rendered = None
 
         self._to_new_page: list[Renderable] = []
+        # places of the added elements, and the numbering of the renderable they are added for
+        self.placements = PlacementJournal(max_height)
+        self._numbering: tuple[str, int] | None = None
+        # headings of the document, the ones after the table of contents fill it after the layout
+        self._headings: list[tuple[int, str, int, bool]] = []
+        self._toc: ToC | None = None
+        self._toc_start = 0
+        # items the table of contents reserves instead of the estimated ones, and the state before it:
+        # the checkpoint, the previous rendered element, the numbers of placements, labels and
+        # forward references
+        self._toc_items: list[tuple[int, str, int, bool]] | None = None
+        self._before_toc: tuple[Checkpoint, RenderedInfo | None, int, int, int] | None = None
+        # references to the elements not numbered yet when they are rendered
+        self._forward_references: list[Reference] = []
 
-    def process(self, renderables: list[Renderable]):
-        for i in range(len(renderables)):
-            self.render(renderables[i])
+    @property
+    def layout_state(self) -> LayoutState:
+        """Copy of the state after the rendered elements"""
+        return self._layout_tracker.current_state
 
-        self._flush_to_new_screen()
+    @property
+    def page_count(self) -> int:
+        state = self._layout_tracker.current_state
+        if state.current_page_height == 0 and state.page > 1:
+            return state.page - 1  # the last page break leads to an empty page
+        return state.page
+
+    @property
+    def checkpoint(self) -> Checkpoint:
+        """State after the rendered elements the layout of the next ones depends on"""
+        previous_style = None
+        if self.previous_rendered is not None:
+            element = self.previous_rendered.docx_element
+            if isinstance(element, DocxParagraph):
+                pPr = element._p.pPr
+                # the paragraphs share a few styles, so the checkpoints share their strings
+                previous_style = (sys.intern(etree.tostring(pPr).decode()) if pPr is not None else "",
+                                  element.text == "\n")
+            elif element is not None:  # not committed by PageEstimator
+                previous_style = (element._element.tag, False)
+        return Checkpoint(self._layout_tracker.current_state, self._numberer.numbers, previous_style,
+                          len(self._to_new_page))
+
+    def restore(self, checkpoint: Checkpoint):
+        """
+        Continues the layout from the checkpoint of another renderer, the elements it
+        rendered must have been added, see _add_serialized
+        """
+        self._layout_tracker.restore(checkpoint.layout_state)
+        for category, number in checkpoint.numbers.items():
+            self._numberer.save_number(category, number)
+
+    def process(self, renderables: Iterable[Renderable], parser: "Parser | None" = None):
+        """
+        Lays the renderables out and fills the table of contents. They can be created while being
+        rendered, e.g. by Parser.parse, then each of them is freed once its elements are added.
+        The renderables of the parser are laid out again if the table of contents moves them, see fill_toc.
+        """
+        self._lay_out(renderables)
         if self._debugger:
             self._debugger.after_rendered()
+        self.fill_toc(parser)
+        self._resolve_forward_references()
+
+    def _lay_out(self, renderables: Iterable[Renderable]):
+        for renderable in renderables:
+            self.render(renderable)
+            self._add_contents(renderable)
+        self._flush_to_new_screen()
+
+    def fill_toc(self, parser: "Parser | None" = None):
+        """
+        Fills the table of contents with the headings following it. The layout reserves the lines of
+        the items estimated beforehand, if the headings take other lines, the pages of the elements
+        after the table of contents are shifted, so they are laid out again from the parser, reserving
+        the lines of the headings, until the lines stay the same, at most TOC_RELAYOUTS times.
+        """
+        if self._toc is None:
+            return
+        for _ in range(TOC_RELAYOUTS if parser is not None and not self._debugger else 0):
+            if not self._toc_moved():
+                break
+            self._toc_items = self._headings[self._toc_start:]
+            self._rewind_to_toc()
+            self._lay_out_from_toc(parser)
+
+        for item in self._headings[self._toc_start:]:
+            self._toc.add_item(*item)
+        self._toc.fill()
+
+    def _toc_moved(self) -> bool:
+        """Whether the headings take other lines in the table of contents than the reserved ones"""
+        items = self._headings[self._toc_start:]
+        # the renderables waiting for a new page before the table of contents can't be laid out again
+        return self._before_toc is not None and not self._before_toc[0].pending \
+            and items != self._toc.reserved_items and self._toc.count_lines(items) != self._toc.reserved_lines
+
+    def _rewind_to_toc(self):
+        """Removes the elements from the table of contents on and restores the state before it"""
+        checkpoint, self.previous_rendered, placements, labels, references = self._before_toc
+        if placements < len(self.placements):
+            # the elements are appended to the body, so the ones from the table of contents on are the last ones
+            del self._document._body._element[self.placements.id(placements):]
+        self.placements.truncate(placements)
+        del self._headings[self._toc_start:]
+        del self._forward_references[references:]
+        labels = dict(islice(self._numberer.labels.items(), labels))
+        self._numberer = Numberer()
+        self._numberer.labels = labels
+        self.restore(checkpoint)
+        self._toc = self._before_toc = None
+
+    def _lay_out_from_toc(self, parser: "Parser"):
+        """Lays the elements from the table of contents out again, after _rewind_to_toc"""
+        self._lay_out(parser.parse(parser.elements_from_toc()))
+
+    def _add_contents(self, renderable: Renderable):
+        """Records the rendered heading or table of contents"""
+        if isinstance(renderable, ToC):
+            if self._toc is None:
+                self._toc, self._toc_start = renderable, len(self._headings)
+        elif isinstance(renderable, Heading):
+            self._headings.append((renderable.level, renderable.text, renderable.rendered_page,
+                                   renderable.is_numbered))
 
     def render(self, renderable: Renderable):
+        if isinstance(renderable, ToC) and self._before_toc is None:
+            if self._toc_items is not None:
+                renderable.reserve(self._toc_items)
+            self._before_toc = (self.checkpoint, self.previous_rendered, len(self.placements),
+                                len(self._numberer.labels), len(self._forward_references))
+
         if requires_numbering := isinstance(renderable, RequiresNumbering):
             number = self._numberer.get_current_number(renderable.numbering_category) + 1
             renderable.set_number(number)
-        infos = renderable.render(self.previous_rendered, self._layout_tracker.current_state)
-
-        try:
-            first = next(infos)
-            if isinstance(first, RenderedInfo) and first.height\
-                    >= self._layout_tracker.current_state.remaining_page_height:
-                self._flush_to_new_screen()
-                infos = renderable.render(self.previous_rendered, self._layout_tracker.current_state)
-            else:
-                infos = chain([first], infos)
-        except StopIteration:
-            pass
+        plan = renderable.measure(self.previous_rendered, self._layout_tracker.current_state)
 
-        for info in infos:
+        # the renderables waiting for the next page go before the one that starts it,
+        # which is measured again as they change the layout
+        if self._to_new_page and plan.items and isinstance(first := plan.items[0], RenderedInfo)\
+                and first.height >= self._layout_tracker.current_state.remaining_page_height:
+            self._flush_to_new_screen()
+            plan = renderable.measure(self.previous_rendered, self._layout_tracker.current_state)
+
+        numbering = self._numbering
+        if requires_numbering:
+            self._numbering = (renderable.numbering_category, number)
+        for info in self._commit(renderable, plan):
             if isinstance(info, SubRenderable):
                 if info.add_to_new_page:
                     self._to_new_page.append(info.renderable)
@@ -77,25 +266,113 @@ class Renderer:
             else:
                 self._add(info.docx_element, info.height)
                 self.previous_rendered = info
+        self._numbering = numbering
 
         if requires_numbering:
-            self._numberer.save_number(renderable.numbering_category, number)
+            self._numberer.save_number(renderable.numbering_category, number, renderable.label)
+        for reference in renderable.references():
+            self._resolve(reference)
+
+    def _commit(self, renderable: Renderable, plan: LayoutPlan) -> list[RenderedInfo | SubRenderable]:
+        """Applies the plan of the renderable and returns what it adds to the document, see PageEstimator"""
+        return renderable.commit(plan)
+
+    def _resolve(self, reference: Reference):
+        """Writes the number of the referenced element if it's numbered, otherwise it's written after the layout"""
+        if reference.label in self._numberer.labels:
+            reference.resolve(self._referenced_number(reference))
+        else:
+            self._forward_references.append(reference)
+
+    def _resolve_forward_references(self):
+        """Writes the numbers of the elements numbered after the references to them"""
+        for reference in self._forward_references:
+            if reference.label in self._numberer.labels:
+                reference.resolve(self._referenced_number(reference))
+            else:
+                logging.warning(f"no element is labeled {reference.label} (@{reference.type}:{reference.label})")
+                reference.resolve(None)
+        self._forward_references = []
+
+    def _referenced_number(self, reference: Reference) -> int | None:
+        """Number of the element labeled as the reference's label, None if it's not of the reference's type"""
+        category, number = self._numberer.labels[reference.label]
+        if category != reference.type:
+            logging.warning(f"{reference.label} labels {category}, not {reference.type} "
+                            f"(@{reference.type}:{reference.label})")
+            return None
+        return number
+
+    def _add_references(self, added: list[Parented], references: list[tuple[int, int, str, str]],
+                        labels: dict[str, tuple[str, int]]):
+        """
+        Records the labels of the elements rendered by another renderer and resolves the references
+        in the added elements, the places of the references are the ones of serialize_references
+        """
+        self._numberer.labels.update(labels)
+        for element, run, type_, label in references:
+            docx_element = added[element]
+            self._resolve(Reference(DocxRun(next(islice(docx_element._element.iter(_R), run, None)), docx_element),
+                                    type_, label))
 
     def _flush_to_new_screen(self):
+        numbering = self._numbering
         while self._to_new_page:
             renderable = self._to_new_page.pop(0)
+            self._numbering = None
             if isinstance(renderable, RequiresNumbering):
                 number = self._numberer.get_current_number(renderable.numbering_category) + 1
                 renderable.set_number(number)
-                self._numberer.save_number(renderable.numbering_category, number)
-            for info_ in renderable.render(self.previous_rendered, self._layout_tracker.current_state):
+                self._numberer.save_number(renderable.numbering_category, number, renderable.label)
+                self._numbering = (renderable.numbering_category, number)
+            plan = renderable.measure(self.previous_rendered, self._layout_tracker.current_state)
+            for info_ in self._commit(renderable, plan):
                 self._add(info_.docx_element, info_.height)
+        self._numbering = numbering
 
 
+    def _add_serialized(self, elements: bytes, heights: list[int],
+                        relationships: list[tuple[str, str, str | bytes, bool]],
+                        numbering: list[tuple[str, int] | None]) -> list[Parented]:
+        """
+        Adds the elements serialized by serialize_elements in another document, relating
+        this document to the targets of their relationships, numbering is the one of the
+        renderables they were added for. Returns the added elements.
+        """
+        r_ids = self._add_relationships(relationships)
+        elements = parse_xml(elements)
+        if r_ids:
+            for element in elements.iter(*_RELATIONSHIP_REFERENCES):
+                attribute = _RELATIONSHIP_REFERENCES[element.tag]
+                element.set(attribute, r_ids.get(element.get(attribute), element.get(attribute)))
+
+        added = []
+        for element, height, self._numbering in zip(list(elements), heights, numbering):
+            docx_element = DocxTable(element, self._document._body) if element.tag == qn("w:tbl") \
+                else DocxParagraph(element, self._document._body)
+            self._add(docx_element, Length(height))
+            added.append(docx_element)
+        self._numbering = None
+        return added
+
+    def _add_relationships(self, relationships: list[tuple[str, str, str | bytes, bool]]) -> dict[str, str]:
+        """Relates the document to the targets of another document's relationships, returns the new rIds by the old ones"""
+        r_ids = {}
+        for r_id, reltype, target, is_external in relationships:
+            if is_external:
+                r_ids[r_id] = self._document.part.relate_to(target, reltype, is_external=True)
+            elif reltype == RELATIONSHIP_TYPE.IMAGE:
+                r_ids[r_id], _ = self._document.part.get_or_add_image(BytesIO(target))
+            else:
+                raise ValueError(f"unexpected relationship of a rendered element: {reltype}")
+        return r_ids
+
     def _add(self, element: Parented, height: Length):
-        self._document._body._element.append(
-            element._element
-        )
+        body = self._document._body._element
+        body.append(element._element)
+        state = self._layout_tracker.current_state
+        self.placements.append(element, len(body) - 1, height, state.page, state.current_page_height,
+                               self._numbering)
         self._layout_tracker.add_height(height)
 
         if self._debugger:
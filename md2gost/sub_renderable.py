@@ -3,7 +3,7 @@ from dataclasses import dataclass
 from md2gost.renderable import Renderable
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class SubRenderable:
     renderable: Renderable
     add_to_new_page: bool
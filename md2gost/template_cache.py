@@ -0,0 +1,84 @@
+import os
+from copy import copy, deepcopy
+from threading import Lock
+
+import docx
+from docx.document import Document
+from docx.opc.part import Part, XmlPart
+from docx.package import Package
+
+from .renderable.template_profile import TemplateProfile, assign_template_profile, load_template_profile
+
+# attributes parts are created with, the others are cached values that refer to the template's parts
+_PART_ATTRIBUTES = ("_partname", "_content_type", "_blob", "_element", "_image")
+
+
+def _clone_part(part: Part, package: Package) -> Part:
+    clone = object.__new__(type(part))
+    for name in _PART_ATTRIBUTES:
+        if name in vars(part):
+            setattr(clone, name, getattr(part, name))
+    if isinstance(part, XmlPart):
+        clone._element = deepcopy(part._element)
+    clone._package = package
+    return clone
+
+
+def _clone_rels(rels, clone_rels, clones: dict[Part, Part]):
+    for rel in rels.values():
+        clone_rels.add_relationship(rel.reltype, rel.target_ref if rel.is_external else clones[rel.target_part],
+                                    rel.rId, rel.is_external)
+
+
+def clone_document(document: Document) -> Document:
+    """
+    Returns an independent copy of the document. Only the XML of the parts is
+    copied, binary parts (e.g. images) share their immutable content.
+    """
+    package = document.part.package
+    clone_package = Package()
+    clones = {part: _clone_part(part, clone_package) for part in package.iter_parts()}
+    _clone_rels(package.rels, clone_package.rels, clones)
+    for part, clone in clones.items():
+        _clone_rels(part.rels, clone.rels, clones)
+    clone_package.after_unmarshal()
+    return clone_package.main_document_part.document
+
+
+class _Template:
+    def __init__(self, template_path: str | None):
+        self.signature = self._signature(template_path)
+        self.document: Document = docx.Document(template_path)
+        self.document._body.clear_content()
+        self.profile: TemplateProfile | None = \
+            load_template_profile(self.document, template_path) if template_path else None
+
+    @staticmethod
+    def _signature(template_path: str | None) -> tuple | None:
+        if template_path is None:
+            return None
+        stat = os.stat(template_path)
+        return stat.st_mtime_ns, stat.st_size
+
+
+_templates: dict[str | None, _Template] = {}
+_templates_lock = Lock()
+
+
+def load_template(template_path: str | None = None) -> Document:
+    """
+    Returns an empty document created from the template. The template is loaded
+    and cleaned once, every call returns a new copy of it, so batch conversions
+    don't unzip and parse the same template again. The template is loaded again
+    if its file changes.
+    """
+    key = os.path.abspath(template_path) if template_path else None
+    with _templates_lock:
+        template = _templates.get(key)
+        if template is None or template.signature != _Template._signature(template_path):
+            template = _templates[key] = _Template(template_path)
+
+    document = clone_document(template.document)
+    if template.profile is not None:
+        assign_template_profile(document, template.profile)
+    return document
@@ -1,7 +1,22 @@
+import os
+from copy import deepcopy
+from functools import lru_cache
+
 from docx.oxml import OxmlElement
 from docx.oxml.ns import qn
+from docx.oxml.text.run import CT_R
+from docx.shared import RGBColor
 from lxml.etree import _Element
 
+_qn = lru_cache(maxsize=None)(qn)
+_XML_SPACE = qn("xml:space")
+
+
+def cache_dir(*parts: str) -> str:
+    """Returns the path in the md2gost directory of the user cache, XDG_CACHE_HOME or ~/.cache"""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(cache_home, "md2gost", *parts)
+
 
 def create_element(name: str, *args: dict[str, str] | list[_Element] | str)\
         -> _Element:
@@ -25,10 +40,52 @@ def create_element(name: str, *args: dict[str, str] | list[_Element] | str)\
             text = arg
 
     element = OxmlElement(name, {
-        (qn(name) if ":" in name else name): value for name, value in attrs.items()
+        (_qn(name) if ":" in name else name): value for name, value in attrs.items()
     })
     for child in children:
         element.append(child)
     if text:
         element.text = text
     return element
+
+
+@lru_cache(maxsize=None)
+def _run_template(style_id: str | None, bold: bool | None, italic: bool | None, color: RGBColor | None,
+                  strike: bool | None, text: bool) -> CT_R:
+    """
+    Run with the formatting and an empty w:t if text, the way python-docx makes it, but with no
+    empty rPr. The runs are copies of the template made once for every formatting
+    """
+    properties = []
+    if style_id is not None:
+        properties.append(create_element("w:rStyle", {"w:val": style_id}))
+    # in the order of the rPr sequence
+    for name, value in (("w:b", bold), ("w:i", italic), ("w:strike", strike)):
+        if value is not None:
+            properties.append(create_element(name, {} if value else {"w:val": "0"}))
+    if color is not None:
+        properties.append(create_element("w:color", {"w:val": str(color)}))
+
+    children = [create_element("w:rPr", properties)] if properties else []
+    if text:
+        children.append(create_element("w:t"))
+    return create_element("w:r", children)
+
+
+def create_run(text: str = "", style_id: str | None = None, bold: bool | None = None, italic: bool | None = None,
+               color: RGBColor | None = None, strike: bool | None = None) -> CT_R:
+    """
+    Creates a run with the text and the formatting, same as setting them to a python-docx Run,
+    which does many lookups and creates an empty rPr for every property even if it's None
+    """
+    r = deepcopy(_run_template(style_id, bold, italic, color, strike, bool(text)))
+    if not text:
+        return r
+    if "\t" in text or "\n" in text or "\r" in text:
+        r.text = text  # written as w:tab and w:br
+        return r
+    t = r[-1]
+    t.text = text
+    if text[0].isspace() or text[-1].isspace():
+        t.set(_XML_SPACE, "preserve")
+    return r
@@ -1,3 +1,6 @@
+import os
+import tempfile
+
 import docx
 from docx.document import Document
 from docx.enum.style import WD_STYLE_TYPE
@@ -7,6 +10,11 @@ from docx.styles.style import _ParagraphStyle
 
 _EMUS_PER_PX = Pt(1) * 72/96
 
+# the caches of md2gost are written to a directory removed after the tests instead of the user's one,
+# see md2gost.util.cache_dir
+_cache_directory = tempfile.TemporaryDirectory()
+os.environ["XDG_CACHE_HOME"] = _cache_directory.name
+
 
 def _create_test_document():
     document: Document = docx.Document()
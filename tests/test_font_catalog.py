@@ -0,0 +1,92 @@
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+from md2gost.renderable.find_font import find_font
+from md2gost.renderable.font_catalog import FontCatalog
+
+
+def _copy_with_weight(source: str, destination: str, weight: int):
+    """Copies the font setting the usWeightClass of its OS/2 table, e.g. to make the faces of a family"""
+    with open(source, "rb") as f:
+        data = bytearray(f.read())
+    tables, = struct.unpack_from(">H", data, 4)
+    for i in range(tables):
+        tag, _, offset, _ = struct.unpack_from(">4sIII", data, 12 + 16 * i)
+        if tag == b"OS/2":
+            struct.pack_into(">H", data, offset + 4, weight)
+    with open(destination, "wb") as f:
+        f.write(data)
+
+
+class TestFontCatalog(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        self._fonts_dir = os.path.join(self._dir, "fonts")
+        os.makedirs(os.path.join(self._fonts_dir, "times"))
+        self._index_path = os.path.join(self._dir, "index.json")
+
+        self._regular = os.path.join(self._fonts_dir, "times", "regular.ttf")
+        shutil.copy(find_font("Times New Roman", False, False), self._regular)
+
+    def tearDown(self):
+        shutil.rmtree(self._dir)
+
+    def test_find(self):
+        catalog = FontCatalog([self._fonts_dir])
+        self.assertEqual(self._regular, catalog.find("Times New Roman", False, False))
+        self.assertEqual(self._regular, catalog.find("times new roman", None, None))
+        self.assertIsNone(catalog.find("Times New Roman", True, False))
+        self.assertIsNone(catalog.find("Missing Font", False, False))
+
+    def test_weights(self):
+        # lighter faces sort before the regular one
+        weights_dir = os.path.join(self._dir, "weights")
+        os.makedirs(weights_dir)
+        paths = {}
+        for name, weight in (("a-light", 300), ("b-regular", 400), ("c-medium", 500), ("d-semibold", 600),
+                             ("e-black", 900), ("f-bold", 700)):
+            paths[weight] = os.path.join(weights_dir, f"{name}.ttf")
+            _copy_with_weight(self._regular, paths[weight], weight)
+
+        catalog = FontCatalog([weights_dir])
+        self.assertEqual(paths[400], catalog.find("Times New Roman", False, False))
+        self.assertEqual(paths[700], catalog.find("Times New Roman", True, False))
+
+        os.remove(paths[400])
+        os.remove(paths[700])
+        catalog = FontCatalog([weights_dir])
+        # the nearest weights, of the same distance the face scanned first
+        self.assertEqual(paths[300], catalog.find("Times New Roman", False, False))
+        self.assertEqual(paths[600], catalog.find("Times New Roman", True, False))
+
+    def test_persisted_index(self):
+        self.assertTrue(FontCatalog([self._fonts_dir], self._index_path).scanned)
+
+        catalog = FontCatalog([self._fonts_dir], self._index_path)
+        self.assertFalse(catalog.scanned)
+        self.assertEqual(self._regular, catalog.find("Times New Roman", False, False))
+
+    def test_index_invalidation(self):
+        FontCatalog([self._fonts_dir], self._index_path)
+
+        bold = os.path.join(self._fonts_dir, "times", "bold.ttf")
+        shutil.copy(find_font("Times New Roman", True, False), bold)
+        # make sure the modification time changes even on file systems with coarse timestamps
+        stat = os.stat(os.path.dirname(bold))
+        os.utime(os.path.dirname(bold), ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+        catalog = FontCatalog([self._fonts_dir], self._index_path)
+        self.assertTrue(catalog.scanned)
+        self.assertEqual(bold, catalog.find("Times New Roman", True, False))
+
+    def test_directory_precedence(self):
+        other_dir = os.path.join(self._dir, "other")
+        os.makedirs(other_dir)
+        other = os.path.join(other_dir, "times.ttf")
+        shutil.copy(self._regular, other)
+
+        catalog = FontCatalog([other_dir, self._fonts_dir])
+        self.assertEqual(other, catalog.find("Times New Roman", False, False))
@@ -0,0 +1,85 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from PIL import Image, ImageDraw, ImageFont
+
+from md2gost.renderable.find_font import find_font
+from md2gost.renderable.font_metrics import FontMetricsSnapshot, get_font_metrics, save_snapshot
+from md2gost.renderable.paragraph_sizer import Font
+
+
+class TestFontMetrics(unittest.TestCase):
+    def _assert_matches_pil(self, path: str, size: int, text: str):
+        bbox = ImageDraw.Draw(Image.new("RGB", (1, 1))).textbbox((0, 0), text, ImageFont.truetype(path, size))
+        self.assertEqual(bbox[2] - bbox[0], get_font_metrics(path).get_text_width(text, size))
+
+    def test_get_text_width(self):
+        path = find_font("Times New Roman", False, False)
+        for text in ["hello", "in", "AVAVA", "Электроэнцефалографический", "WD_PARAGRAPH_ALIGNMENT.CENTER"]:
+            self._assert_matches_pil(path, 14, text)
+
+    def test_get_text_width_bold(self):
+        self._assert_matches_pil(find_font("Times New Roman", True, False), 14, "Электроэнцефалографический")
+
+    def test_get_text_width_missing_glyph(self):
+        self._assert_matches_pil(find_font("Times New Roman", False, False), 14, "a\tb")
+
+    def test_get_advance_mono(self):
+        metrics = get_font_metrics(find_font("Courier New", False, False))
+        self.assertEqual(metrics.get_advance("i", 12), metrics.get_advance("m", 12))
+
+
+class TestFontMetricsSnapshot(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        self._path = os.path.join(self._dir, "fonts.metrics")
+
+    def tearDown(self):
+        shutil.rmtree(self._dir)
+
+    def test_save_load(self):
+        metrics = get_font_metrics(find_font("Times New Roman", False, False))
+        save_snapshot(self._path, {("Times New Roman", False, False): metrics}, [12, 14])
+
+        snapshot = FontMetricsSnapshot(self._path)
+        loaded = snapshot.get("times new roman", None, None)
+        self.assertIsNotNone(loaded)
+        self.assertIsNone(snapshot.get("Times New Roman", True, False))
+
+        for text in ["hello", "Электроэнцефалографический", "a\tb"]:
+            self.assertEqual(metrics.get_text_width(text, 14), loaded.get_text_width(text, 14))
+        self.assertEqual(metrics.get_line_height(12), loaded.get_line_height(12))
+        self.assertEqual(metrics.get_advance("m", 12), loaded.get_advance("m", 12))
+
+    def test_memory_mapped(self):
+        metrics = get_font_metrics(find_font("Times New Roman", False, False))
+        save_snapshot(self._path, {("Times New Roman", False, False): metrics}, [14])
+
+        loaded = FontMetricsSnapshot(self._path).get("Times New Roman", False, False)
+        self.assertIsInstance(loaded._advances, memoryview)
+        self.assertTrue(loaded._advances.readonly)
+
+        # snapshot of a snapshot
+        save_snapshot(self._path + "2", {("Times New Roman", False, False): loaded}, [14])
+        self.assertEqual(metrics.get_text_width("hello", 14),
+                         FontMetricsSnapshot(self._path + "2").get("Times New Roman", False, False)
+                         .get_text_width("hello", 14))
+
+    def test_size_not_in_snapshot(self):
+        path = find_font("Times New Roman", False, False)
+        save_snapshot(self._path, {("Times New Roman", False, False): get_font_metrics(path)}, [14])
+        os.environ["FONT_METRICS"] = self._path
+        try:
+            self.assertIsInstance(Font("Times New Roman", False, False, 14).metrics._advances, memoryview)
+            # measured with the font file rather than approximated
+            self.assertIs(get_font_metrics(path), Font("Times New Roman", False, False, 10).metrics)
+        finally:
+            del os.environ["FONT_METRICS"]
+
+    def test_invalid_file(self):
+        with open(self._path, "wb") as f:
+            f.write(b"not a snapshot")
+        with self.assertRaises(ValueError):
+            FontMetricsSnapshot(self._path)
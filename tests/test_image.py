@@ -0,0 +1,39 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import requests
+
+from md2gost.layout_tracker import LayoutState
+from md2gost.renderable.image import DOWNLOAD_TIMEOUT, Image
+from md2gost.template_cache import load_template
+
+_TEMPLATE_PATH = os.path.join(os.path.dirname(__file__), "..", "md2gost", "Template.docx")
+
+
+class TestImage(unittest.TestCase):
+    def setUp(self):
+        self._document = load_template(_TEMPLATE_PATH)
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+
+    def _assert_skipped(self, path: str):
+        with patch.dict(os.environ, {"WORKING_DIR": self._directory.name}), \
+                self.assertLogs(level="WARNING") as logs:
+            image = Image(self._document._body, path)
+        self.assertIn(path, logs.output[0])
+        self.assertEqual([], image.measure(None, LayoutState(1000, 1000)).items)
+
+    def test_missing_file(self):
+        self._assert_skipped("missing.png")
+
+    def test_not_an_image(self):
+        with open(os.path.join(self._directory.name, "text.png"), "w") as f:
+            f.write("not an image")
+        self._assert_skipped("text.png")
+
+    def test_download_error(self):
+        with patch("requests.get", side_effect=requests.ConnectionError) as get:
+            self._assert_skipped("https://example.com/image.png")
+        self.assertEqual(DOWNLOAD_TIMEOUT, get.call_args.kwargs["timeout"])
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from docx.oxml.ns import qn
+from lxml import etree
+
+from md2gost.converter import Converter
+from md2gost.incremental_renderer import IncrementalRenderer
+from md2gost.parser_ import Parser
+from md2gost.template_cache import load_template
+
+_TEMPLATE_PATH = os.path.join(os.path.dirname(__file__), "..", "md2gost", "Template.docx")
+_IMAGE_PATH = os.path.join(os.path.dirname(__file__), "..", "examples", "img.png")
+_REFERENCES = (qn("r:id"), qn("r:embed"))
+
+_CHAPTER = """
+# {title}
+
+Текст главы со [ссылкой](https://example.com/{title}).
+
+%table{title} Таблица
+
+| a | b |
+|---|---|
+| 1 | 2 |
+
+{text}
+
+```python
+print("{title}")
+```
+"""
+
+
+def _markdown(titles: list[str], inserted: str = "") -> str:
+    text = "# *Содержание\n\n[TOC]\n"
+    for i, title in enumerate(titles):
+        text += _CHAPTER.format(title=title, text="Длинный абзац текста. " * 40 * (i + 1))
+        if i == 0:
+            text += inserted
+    return text
+
+
+class TestIncrementalRenderer(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        os.environ["WORKING_DIR"] = self._directory.name
+        self._journal_path = os.path.join(self._directory.name, "layouts", "input.json")
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    @staticmethod
+    def _body(document) -> list[bytes]:
+        """Returns the body elements with the relationships they refer to replaced by their targets"""
+        part = document.part
+        elements = []
+        for element in document._body._element:
+            if element.tag == qn("w:sectPr"):
+                continue
+            for node in element.iter(etree.Element):
+                for name in _REFERENCES:
+                    if (r_id := node.get(name)) is not None:
+                        node.set(name, part.rels[r_id].target_ref)
+            elements.append(etree.tostring(element))
+        return elements
+
+    def _convert(self, text: str) -> list[bytes]:
+        path = os.path.join(self._directory.name, "input.md")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        converter = Converter(path, None, _TEMPLATE_PATH)
+        converter.convert()
+        return self._body(converter.document)
+
+    def _render(self, text: str) -> tuple[list[bytes], IncrementalRenderer, Parser]:
+        document = load_template(_TEMPLATE_PATH)
+        parser = Parser(document, text)
+        renderer = IncrementalRenderer(document, self._journal_path)
+        renderer.process_blocks(parser)
+        return self._body(document), renderer, parser
+
+    def test_same_as_renderer(self):
+        text = _markdown(["Первая", "Вторая", "Третья"])
+        elements, renderer, _ = self._render(text)
+        self.assertEqual(0, renderer.reused_blocks)
+        self.assertEqual(self._convert(text), elements)
+
+    def test_unchanged_blocks_are_reused(self):
+        self._render(_markdown(["Первая", "Вторая", "Третья"]))
+
+        # the paragraph shifts the next chapters by a page
+        text = _markdown(["Первая", "Вторая", "Третья"], "\n" + "Вставленный абзац. " * 150 + "\n")
+        elements, renderer, _ = self._render(text)
+        # the blocks before the paragraph but the table of contents, and the last chapter at least
+        self.assertGreaterEqual(renderer.reused_blocks, 6 + 5)
+        self.assertEqual(self._convert(text), elements)
+
+    def test_renumbered_blocks_are_rendered(self):
+        self._render(_markdown(["Первая", "Вторая", "Третья"]))
+
+        text = _markdown(["Первая", "Вторая", "Третья"], "\n%tablenew Таблица\n\n| a |\n|---|\n| 1 |\n")
+        elements, _, _ = self._render(text)
+        self.assertEqual(self._convert(text), elements)
+
+    def test_stale_journal_is_not_used(self):
+        text = _markdown(["Первая", "Вторая"])
+        self._render(text)
+        with open(self._journal_path, encoding="utf-8") as f:
+            journal = json.load(f)
+        journal["context"] = "stale"
+        with open(self._journal_path, "w", encoding="utf-8") as f:
+            json.dump(journal, f)
+
+        elements, renderer, _ = self._render(text)
+        self.assertEqual(0, renderer.reused_blocks)
+        self.assertEqual(self._convert(text), elements)
+
+    def test_images_are_restored(self):
+        shutil.copy(_IMAGE_PATH, self._directory.name)
+        image = '\n![](img.png "%image Рисунок")\n'
+        self._render(_markdown(["Первая", "Вторая", "Третья"]) + image)
+        with open(self._journal_path, encoding="utf-8") as f:
+            journal = json.load(f)
+        # the journal holds the digest of the image instead of its content
+        with open(_IMAGE_PATH, "rb") as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+        self.assertEqual([digest], [target for block in [*journal["blocks"], journal["end"]]
+                                    for _, _, target, is_external in block["relationships"] if not is_external])
+
+        text = _markdown(["Первая", "Вторая", "Третья"], "\n" + "Вставленный абзац. " * 150 + "\n") + image
+        elements, renderer, _ = self._render(text)
+        self.assertGreaterEqual(renderer.reused_blocks, 6 + 6)
+        self.assertEqual(self._convert(text), elements)
@@ -1,4 +1,5 @@
 import unittest
+from copy import copy
 
 from docx.shared import Mm
 
@@ -8,7 +9,7 @@ from md2gost.layout_tracker import LayoutState, LayoutTracker
 class TestLayoutState(unittest.TestCase):
     def setUp(self):
         self._state = LayoutState(Mm(297), Mm(210))
-        self._state._current_height += Mm(400)
+        self._state.add_height(Mm(400))
 
     def test_max_height(self):
         self.assertEqual(Mm(297), self._state.max_height)
@@ -25,6 +26,22 @@ class TestLayoutState(unittest.TestCase):
     def test_page(self):
         self.assertEqual(2, self._state.page)
 
+    def test_add_height(self):
+        self._state.add_height(Mm(600))
+        self.assertEqual(4, self._state.page)
+        self.assertEqual(Mm(109), self._state.current_page_height)
+        self._state.add_height(-Mm(600))
+        self.assertEqual(2, self._state.page)
+        self.assertEqual(Mm(103), self._state.current_page_height)
+
+    def test_copy(self):
+        state = copy(self._state)
+        state.add_height(Mm(200))
+        self.assertEqual(3, state.page)
+        self.assertEqual(2, self._state.page)
+        self.assertNotEqual(self._state, state)
+        self.assertEqual(self._state, copy(self._state))
+
 
 class TestLayoutTracker(unittest.TestCase):
     def test_add_height(self):
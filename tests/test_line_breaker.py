@@ -0,0 +1,68 @@
+import importlib.util
+import os
+import random
+import unittest
+from unittest.mock import patch
+
+from docx.shared import Cm, Pt
+
+from md2gost.renderable.paragraph_sizer import ParagraphSizer
+
+from . import _create_test_document
+
+_ALPHABET = "abcdefghijklmnopqrstuvwxyzабвгдеёжзийклмнопрстуфхцчшщъыьэюя.,-—"
+
+
+@unittest.skipUnless(importlib.util.find_spec("numpy"), "numpy is not installed")
+class TestLineBreakerEquivalence(unittest.TestCase):
+    """The numpy line breaker must give the same results as the default one"""
+
+    def setUp(self):
+        self._document, self._max_height, self._max_width = _create_test_document()
+
+    def _assert_equivalent(self, paragraph, max_width, first_line_indent, is_mono=False):
+        sizer = ParagraphSizer(paragraph, None, max_width)
+        with patch.dict(os.environ, {"LINE_BREAKER": "python"}):
+            expected = sizer.count_lines(paragraph.runs, max_width, paragraph.style.font, first_line_indent, is_mono)
+        with patch.dict(os.environ, {"LINE_BREAKER": "numpy"}):
+            actual = sizer.count_lines(paragraph.runs, max_width, paragraph.style.font, first_line_indent, is_mono)
+        self.assertEqual(expected, actual, paragraph.text)
+
+    def test_long_word(self):
+        paragraph = self._document.add_paragraph()
+        paragraph.add_run("verylongword" * 15)
+        self._assert_equivalent(paragraph, self._max_width, Cm(1.25))
+
+    def test_long_word_after_word(self):
+        paragraph = self._document.add_paragraph()
+        paragraph.add_run("someword " + "verylongword" * 15)
+        self._assert_equivalent(paragraph, self._max_width, Cm(1.25))
+
+    def test_leading_and_repeated_spaces(self):
+        paragraph = self._document.add_paragraph(style="Code")
+        paragraph.add_run("        if  x:   return   self._docx_paragraph.paragraph_format.first_line_indent  ")
+        self._assert_equivalent(paragraph, self._max_width - Pt(14), 0, True)
+
+    def test_word_across_runs(self):
+        paragraph = self._document.add_paragraph()
+        for text in ["Lorem ips", "um dolor", " sit", "amet, consectetur ", "adipiscing elit."] * 10:
+            paragraph.add_run(text).bold = len(text) % 2 == 0 or None
+        self._assert_equivalent(paragraph, self._max_width, Cm(1.25))
+
+    def test_empty(self):
+        paragraph = self._document.add_paragraph()
+        paragraph.add_run("")
+        self._assert_equivalent(paragraph, self._max_width, Cm(1.25))
+
+    def test_random_paragraphs(self):
+        rnd = random.Random(0)
+        for _ in range(200):
+            style = rnd.choice(["Normal", "Code"])
+            paragraph = self._document.add_paragraph(style=style)
+            for _ in range(rnd.randint(1, 5)):
+                words = ["".join(rnd.choice(_ALPHABET) for _ in range(rnd.choice([1, 2, 5, 8, 12, 60])))
+                         for _ in range(rnd.randint(0, 40))]
+                run = paragraph.add_run(" " * rnd.randint(0, 1) + (" " * rnd.randint(1, 3)).join(words))
+                run.bold = rnd.random() < 0.3 or None
+            self._assert_equivalent(paragraph, self._max_width - rnd.choice([0, Pt(14), Cm(3)]),
+                                    rnd.choice([0, Cm(1.25), -Cm(0.75)]), style == "Code")
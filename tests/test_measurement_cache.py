@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+from multiprocessing import get_context
+
+from md2gost.renderable.measurement_cache import MeasurementCache, make_key
+
+
+def _write_measurements(path: str, worker: int):
+    measurement_cache = MeasurementCache(path)
+    for i in range(300):
+        measurement_cache.put(make_key(worker, i), (0, i, 203200, 1.5, 127000))
+    measurement_cache.flush()
+
+
+class TestMeasurementCache(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self._path = os.path.join(self._directory.name, "measurements.sqlite")
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def test_get(self):
+        measurement_cache = MeasurementCache(self._path)
+        self.assertIsNone(measurement_cache.get(make_key("paragraph")))
+        measurement_cache.put(make_key("paragraph"), (0, 3, 203200, 1.5, 127000))
+        self.assertEqual((0, 3, 203200, 1.5, 127000), measurement_cache.get(make_key("paragraph")))
+        self.assertEqual(1, measurement_cache.hits)
+        self.assertEqual(1, measurement_cache.misses)
+
+    def test_persisted(self):
+        measurement_cache = MeasurementCache(self._path)
+        measurement_cache.put(make_key("paragraph"), (0, 3, 203200, 1.5, 127000))
+        measurement_cache.flush()
+
+        self.assertEqual((0, 3, 203200, 1.5, 127000), MeasurementCache(self._path).get(make_key("paragraph")))
+
+    def test_key(self):
+        self.assertNotEqual(make_key("ab", "c"), make_key("a", "bc"))
+        self.assertEqual(make_key("a", 1), make_key("a", 1))
+
+    def test_eviction(self):
+        measurement_cache = MeasurementCache(self._path, max_entries=10)
+        for i in range(10):
+            measurement_cache.put(make_key(i), (0, i, 203200, 1.5, 127000))
+        measurement_cache.flush()
+        measurement_cache.get(make_key(0))  # the first one is used again, so it is not evicted
+        for i in range(10, 15):
+            measurement_cache.put(make_key(i), (0, i, 203200, 1.5, 127000))
+        measurement_cache.flush()
+
+        self.assertEqual(10, len(measurement_cache))
+        self.assertIsNotNone(measurement_cache.get(make_key(0)))
+        self.assertIsNone(measurement_cache.get(make_key(1)))
+        self.assertIsNotNone(measurement_cache.get(make_key(14)))
+
+    def test_concurrent_writers(self):
+        with get_context("spawn").Pool(4) as pool:
+            pool.starmap(_write_measurements, [(self._path, worker) for worker in range(4)])
+
+        measurement_cache = MeasurementCache(self._path)
+        self.assertEqual(1200, len(measurement_cache))
+        self.assertEqual((0, 299, 203200, 1.5, 127000), measurement_cache.get(make_key(3, 299)))
@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from docx.oxml.ns import qn
+from lxml import etree
+
+from md2gost.converter import Converter
+from md2gost.measurement_stage import MeasurementStage
+from md2gost.parser_ import Parser
+from md2gost.renderable.paragraph_sizer import ParagraphSizer, get_measured_lines
+from md2gost.renderer import Renderer
+from md2gost.template_cache import load_template
+
+_TEMPLATE_PATH = os.path.join(os.path.dirname(__file__), "..", "md2gost", "Template.docx")
+
+_TEXT = """
+# Заголовок
+
+Абзац текста со [ссылкой](https://example.com). """ + "Длинный абзац текста. " * 60 + """
+
+* Первый элемент списка
+* Второй элемент списка, """ + "который не помещается в одну строку. " * 5 + """
+
+%table1 Таблица
+
+| Столбец | Другой столбец |
+|---|---|
+| """ + "Текст ячейки таблицы " * 10 + """ | 2 |
+
+```python
+print("Листинг")
+```
+"""
+
+# the table and the listing are split between the pages, so their continuations are measured too
+_SPLIT_TEXT = "%table2 Длинная таблица\n\n| Столбец | Другой столбец |\n|---|---|\n" \
+              + "".join(f"| Строка {i} | {i} |\n" for i in range(80)) \
+              + "\n%listing2 Длинный листинг\n\n```python\n" + "".join(f"print({i})\n" for i in range(100)) + "```\n"
+
+
+class TestMeasurementStage(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        os.environ["WORKING_DIR"] = self._directory.name
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def test_lines_are_not_counted_when_rendered(self):
+        for text, continued in ((_TEXT, set()), (_TEXT + _SPLIT_TEXT, {"таблицы", "листинга"})):
+            with self.subTest(continued=continued):
+                document = load_template(_TEMPLATE_PATH)
+                renderables = list(Parser(document, text).parse())
+                MeasurementStage(document, _TEMPLATE_PATH, 2).process(renderables)
+
+                self.assertTrue(get_measured_lines(document.part))
+                with patch.object(ParagraphSizer, "count_lines", side_effect=AssertionError("lines counted again")):
+                    Renderer(document).process(renderables)
+                self.assertEqual(continued, {t.text.split()[1] for t in document._body._element.iter(qn("w:t"))
+                                             if t.text.startswith("Продолжение")})
+
+    def test_same_as_renderer(self):
+        path = os.path.join(self._directory.name, "input.md")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(_TEXT * 5)
+
+        bodies = []
+        for measure_jobs in (1, 2):
+            converter = Converter(path, None, _TEMPLATE_PATH, measure_jobs=measure_jobs)
+            converter.convert()
+            bodies.append([etree.tostring(element) for element in converter.document._body._element
+                           if element.tag != qn("w:sectPr")])
+        self.assertEqual(bodies[0], bodies[1])
@@ -0,0 +1,69 @@
+import os
+import unittest
+from unittest.mock import patch
+
+from md2gost.page_estimator import PageEstimator
+from md2gost.parser_ import Parser
+from md2gost.renderable.heading import Heading
+from md2gost.renderer import Renderer
+from md2gost.template_cache import load_template
+
+_TEMPLATE_PATH = os.path.join(os.path.dirname(__file__), "..", "md2gost", "Template.docx")
+_EXAMPLES_PATH = os.path.join(os.path.dirname(__file__), "..", "examples")
+
+_WORDS = "текст абзаца разбивается на строки по ширине слов шрифта и переносится на следующую страницу".split()
+
+
+def _chapter(i: int) -> str:
+    """Chapter with the elements split between the pages: long paragraphs, a list, a table and a listing"""
+    paragraphs = "".join(" ".join(_WORDS[(i + j + k) % len(_WORDS)] for k in range(40 + 13 * j)) + "\n\n"
+                         for j in range(6))
+    items = "".join(f"{j + 1}. пункт списка {' '.join(_WORDS[:j + 3])}\n" for j in range(8))
+    rows = "".join(f"| {j} | {' '.join(_WORDS[:j % 7 + 1])} | {j * i} |\n" for j in range(30))
+    code = "\n".join(f"    value_{j} = compute({j}, {i})  # {' '.join(_WORDS[:j % 5])}" for j in range(40))
+    return f"# Глава {i}\n\n## Раздел {i}.1\n\n{paragraphs}{items}\n%t{i} Таблица\n\n| a | b | c |\n|---|---|---|\n" \
+           f"{rows}\nСм. таблицу @Таблица:t{i}.\n\n%l{i} Листинг\n\n```python\n{code}\n```\n\n$$\nx^{i}\n$$\n\n"
+
+
+_TEXT = "# *Содержание\n\n[TOC]\n\n" + "".join(_chapter(i) for i in range(1, 9))
+
+
+def _renderer_chapters(text: str) -> list[tuple[str, int]]:
+    """Pages of the chapters of the document laid out by Renderer, as Converter.estimate_pages counts them"""
+    document = load_template(_TEMPLATE_PATH)
+    renderables = list(Parser(document, text).parse())
+    renderer = Renderer(document)
+    renderer.process(renderables)
+    chapters = [("", 1)] + [(renderable.text, renderable.rendered_page) for renderable in renderables
+                            if isinstance(renderable, Heading) and renderable.level == 1]
+    ends = [first_page for _, first_page in chapters[1:]] + [renderer.page_count + 1]
+    return [(title, end - first_page) for (title, first_page), end in zip(chapters, ends)
+            if title or end > first_page]
+
+
+def _estimated_chapters(text: str) -> list[tuple[str, int]]:
+    document = load_template(_TEMPLATE_PATH)
+    return PageEstimator(document, Parser(document, text)).estimate()
+
+
+class TestPageEstimator(unittest.TestCase):
+    def setUp(self):
+        with open(os.path.join(_EXAMPLES_PATH, "example.md"), encoding="utf-8") as f:
+            self._corpus = [_TEXT, f.read()]
+
+    @patch.dict(os.environ, {"WORKING_DIR": _EXAMPLES_PATH, "MEASUREMENT": "exact"})
+    def test_same_pages_as_renderer(self):
+        for text in self._corpus:
+            chapters = _renderer_chapters(text)
+            self.assertGreater(len(chapters), 1)
+            self.assertEqual(chapters, _estimated_chapters(text))
+
+    @patch.dict(os.environ, {"WORKING_DIR": _EXAMPLES_PATH})
+    def test_draft_pages(self):
+        for text in self._corpus:
+            with patch.dict(os.environ, {"MEASUREMENT": "exact"}):
+                exact = sum(pages for _, pages in _estimated_chapters(text))
+            with patch.dict(os.environ, {"MEASUREMENT": "draft"}):
+                draft = sum(pages for _, pages in _estimated_chapters(text))
+            # the widths of the words are approximated, so a few lines differ
+            self.assertLessEqual(abs(draft - exact), max(1, exact // 20))
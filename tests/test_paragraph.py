@@ -1,6 +1,7 @@
 import unittest
 
 from md2gost.layout_tracker import LayoutTracker
+from md2gost.renderable.heading import Heading
 from md2gost.renderable.paragraph import Paragraph
 
 from . import _create_test_document, _EMUS_PER_PX
@@ -19,3 +20,31 @@ class TestParagraph(unittest.TestCase):
 
         self.assertAlmostEqual(45.5, info.height / _EMUS_PER_PX, delta=1/3)
 
+    def test_measure(self):
+        paragraph = Paragraph(self._document._body)
+        layout_tracker = LayoutTracker(self._max_height, self._max_width)
+        layout_state = layout_tracker.current_state
+
+        paragraph.add_run("hello world")
+        plan = paragraph.measure(None, layout_state)
+
+        self.assertEqual(0, layout_state.current_page_height)
+        self.assertEqual(list(paragraph.render(None, layout_state)), paragraph.commit(plan))
+
+    def test_heading_commit(self):
+        previous = Paragraph(self._document._body)
+        previous.add_run("hello world")
+        layout_tracker = LayoutTracker(self._max_height, self._max_width)
+        layout_tracker.add_height(self._max_height + 1)
+        previous_rendered = list(previous.render(None, layout_tracker.current_state))[0]
+
+        heading = Heading(self._document._body, 1, True)
+        heading.add_run("heading")
+        plan = heading.measure(previous_rendered, layout_tracker.current_state)
+
+        # a chapter starts on a new page, but the heading isn't changed until the plan is committed
+        self.assertTrue(plan.page_break_before)
+        self.assertFalse(heading.page_break_before)
+        heading.commit(plan)
+        self.assertTrue(heading.page_break_before)
+        self.assertEqual(3, heading.rendered_page)
@@ -1,9 +1,11 @@
+import os
 import unittest
+from unittest.mock import patch
 
 import docx
 from docx import Document
 
-from md2gost.renderable.paragraph_sizer import Font, ParagraphSizer
+from md2gost.renderable.paragraph_sizer import Font, FontCache, ParagraphSizer, TextSpans, WordWidthCache
 from md2gost.renderable.listing import LISTING_OFFSET
 from docx.shared import Pt, Mm, Cm
 
@@ -65,6 +67,172 @@ class TestFont(unittest.case.TestCase):
         font = Font("Times New Roman", False, False, 12)
         self.assertFalse(font.is_mono)
 
+
+class TestFontCache(unittest.TestCase):
+    def test_get_same_font(self):
+        cache = FontCache()
+        font = cache.get("Times New Roman", False, False, 14)
+        self.assertIs(font, cache.get("Times New Roman", None, None, 14.0))
+        self.assertEqual(1, cache.hits)
+        self.assertEqual(1, cache.misses)
+
+    def test_eviction(self):
+        cache = FontCache(2)
+        font = cache.get("Times New Roman", False, False, 14)
+        cache.get("Times New Roman", True, False, 14)
+        cache.get("Times New Roman", False, False, 14)
+        cache.get("Times New Roman", False, True, 14)
+        self.assertEqual(2, len(cache))
+        self.assertIs(font, cache.get("Times New Roman", False, False, 14))
+        cache.get("Times New Roman", True, False, 14)
+        self.assertEqual(4, cache.misses)
+
+
+class TestWordWidthCache(unittest.TestCase):
+    def test_get_text_width(self):
+        cache = WordWidthCache()
+        font = Font("Times New Roman", False, False, 14)
+        self.assertEqual(font.get_text_width("hello"), cache.get_text_width(font, "hello"))
+        self.assertEqual(font.get_text_width("hello"), cache.get_text_width(font, "hello"))
+        self.assertEqual(0.5, cache.hit_rate)
+
+    def test_font_identity(self):
+        cache = WordWidthCache()
+        cache.get_text_width(Font("Times New Roman", False, False, 14), "hello")
+        cache.get_text_width(Font("Times New Roman", True, False, 14), "hello")
+        cache.get_text_width(Font("Times New Roman", False, False, 20), "hello")
+        self.assertEqual(3, cache.misses)
+
+    def test_eviction(self):
+        font = Font("Times New Roman", False, False, 14)
+        cache = WordWidthCache(1000)
+        for i in range(100):
+            cache.get_text_width(font, f"word{i}")
+        self.assertLessEqual(cache.size_bytes, 1000)
+        self.assertLess(len(cache), 100)
+        cache.get_text_width(font, "word99")
+        self.assertEqual(1, cache.hits)
+
+
+class TestDraftMeasurement(unittest.TestCase):
+    def setUp(self):
+        self._document, self._max_height, self._max_width = _create_test_document()
+
+    def _count_lines(self, paragraph, measurement, first_line_indent=Cm(1.25), is_mono=False):
+        ps = ParagraphSizer(paragraph, None, self._max_width)
+        with patch.dict(os.environ, {"MEASUREMENT": measurement}):
+            return ps.count_lines(paragraph.runs, self._max_width, paragraph.style.font, first_line_indent, is_mono)
+
+    def test_average_char_width(self):
+        font = Font("Times New Roman", False, False, 14)
+        self.assertLess(font.get_text_width("i"), font.get_average_char_width())
+        self.assertLess(font.get_average_char_width(), font.get_text_width("m"))
+
+    def test_average_char_width_mono(self):
+        font = Font("Courier New", False, False, 12)
+        self.assertEqual(font.get_text_width("m"), font.get_average_char_width())
+
+    def test_count_lines_close_to_exact(self):
+        paragraph = self._document.add_paragraph()
+        paragraph.add_run("Для решения поставленной задачи был проведен анализ существующих методов обработки "
+                          "данных, выбраны средства реализации и составлен план тестирования программного "
+                          "обеспечения. Результаты анализа показали, что существующие решения не позволяют "
+                          "обрабатывать данные в реальном времени, поэтому была разработана новая архитектура "
+                          "системы, основанная на потоковой обработке событий.")
+        self.assertAlmostEqual(self._count_lines(paragraph, "exact"), self._count_lines(paragraph, "draft"),
+                               delta=1)
+
+    def test_count_lines_mono(self):
+        paragraph = self._document.add_paragraph(style="Code")
+        paragraph.add_run("        return self._docx_paragraph.paragraph_format.first_line_indent" * 3)
+        self.assertEqual(self._count_lines(paragraph, "exact", 0, True), self._count_lines(paragraph, "draft", 0, True))
+
+
+class TestMonospace(unittest.TestCase):
+    def setUp(self):
+        self._document, self._max_height, self._max_width = _create_test_document()
+
+    def test_count_mono_lines(self):
+        self.assertEqual(1, ParagraphSizer.count_mono_lines("x" * 10, Pt(7), Pt(70), 0, Pt(36)))
+        self.assertEqual(1, ParagraphSizer.count_mono_lines("x" * 10 + "   ", Pt(7), Pt(70), 0, Pt(36)))
+        self.assertEqual(2, ParagraphSizer.count_mono_lines("x" * 11, Pt(7), Pt(70), 0, Pt(36)))
+        self.assertEqual(2, ParagraphSizer.count_mono_lines("xxxx xxxx xxxx", Pt(7), Pt(70), 0, Pt(36)))
+
+    def test_count_mono_lines_tabs(self):
+        # tab stops every 5 characters
+        self.assertEqual(1, ParagraphSizer.count_mono_lines("\txxxxx", Pt(7), Pt(70), 0, Pt(35)))
+        self.assertEqual(2, ParagraphSizer.count_mono_lines("xxxxx\txxxxx", Pt(7), Pt(70), 0, Pt(35)))
+        self.assertEqual(1, ParagraphSizer.count_mono_lines("xx\txxxxx", Pt(7), Pt(70), 0, Pt(35)))
+
+    def test_calculate_heights(self):
+        lines = ["def add_link(self, text: str, url: str, is_bold: bool = None, is_italic: bool = None):",
+                 "    link = Link(url, self._docx_paragraph)", "", "    return link" * 10]
+        paragraphs = []
+        for line in lines:
+            paragraph = self._document.add_paragraph(style="Code")
+            paragraph.add_run(line)
+            paragraphs.append(paragraph)
+        max_width = self._max_width - LISTING_OFFSET
+
+        expected = [ParagraphSizer(paragraph, paragraphs[i-1] if i else None, max_width).calculate_height()
+                    for i, paragraph in enumerate(paragraphs)]
+        self.assertEqual(expected, ParagraphSizer.calculate_heights(paragraphs, max_width))
+
+    def test_count_span_lines_mono(self):
+        paragraph = self._document.add_paragraph(style="Code")
+        paragraph.add_run("return self._docx_paragraph.paragraph_format " * 3)
+        spans = TextSpans.from_runs(paragraph.runs, paragraph.style.font)
+        word_width_cache = WordWidthCache()
+
+        with patch("md2gost.renderable.paragraph_sizer.word_width_cache", word_width_cache):
+            lines = ParagraphSizer.count_span_lines(spans, self._max_width, 0, True, Pt(36))
+
+        self.assertEqual(ParagraphSizer.count_mono_lines(spans.text, spans.paragraph_font.get_average_char_width(),
+                                                         self._max_width, 0, Pt(36)), lines)
+        self.assertEqual(0, word_width_cache.misses)
+
+    def test_count_span_lines_mixed_fonts(self):
+        paragraph = self._document.add_paragraph(style="Code")
+        paragraph.add_run("return self._docx_paragraph.paragraph_format " * 3)
+        paragraph.add_run("return self._docx_paragraph.paragraph_format " * 3).font.size = Pt(24)
+        spans = TextSpans.from_runs(paragraph.runs, paragraph.style.font)
+
+        # the larger run takes more lines than the text in the paragraph font
+        mono_lines = ParagraphSizer.count_mono_lines(spans.text, spans.paragraph_font.get_average_char_width(),
+                                                     self._max_width, 0, Pt(36))
+        self.assertLess(mono_lines, ParagraphSizer.count_span_lines(spans, self._max_width, 0, True, Pt(36)))
+
+
+class TestTextSpans(unittest.TestCase):
+    def setUp(self):
+        self._document, self._max_height, self._max_width = _create_test_document()
+
+    def test_from_runs(self):
+        paragraph = self._document.add_paragraph()
+        paragraph.add_run("Lorem ")
+        paragraph.add_run("ipsum").bold = True
+        paragraph.add_run(" dolor")
+
+        spans = TextSpans.from_runs(paragraph.runs, paragraph.style.font)
+
+        self.assertEqual("Lorem ipsum dolor ", spans.text)
+        self.assertEqual([0, 6, 11, 18], list(spans.offsets))
+        self.assertEqual([0, 1, 0], list(spans.font_ids))
+        self.assertEqual(2, len(spans.fonts))
+        self.assertEqual(["Lorem ", "ipsum", " dolor "], [text for text, _ in spans])
+
+    def test_line_counts_reused(self):
+        paragraph = self._document.add_paragraph()
+        paragraph.add_run("Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 5)
+        ps = ParagraphSizer(paragraph, None, self._max_width)
+        lines = ps.calculate_height().lines
+        spans = ps.spans
+
+        spans.text = ""  # the lines are not counted again for the same width
+        self.assertEqual(lines, ParagraphSizer(paragraph, None, self._max_width, spans).calculate_height().lines)
+        self.assertEqual(1, ParagraphSizer(paragraph, None, self._max_width * 2, spans).calculate_height().lines)
+
+
 class TestParagraphSizer(unittest.TestCase):
     def setUp(self):
         self._document, self._max_height, self._max_width = _create_test_document()
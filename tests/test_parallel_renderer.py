@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+
+from docx.oxml.ns import qn
+from lxml import etree
+
+from md2gost.converter import Converter
+from md2gost.parallel_renderer import _split_chapters
+from md2gost.parser_ import Parser
+
+from . import _create_test_document
+
+_TEMPLATE_PATH = os.path.join(os.path.dirname(__file__), "..", "md2gost", "Template.docx")
+_REFERENCES = (qn("r:id"), qn("r:embed"))
+
+_CHAPTER = """
+# {title}
+
+Текст главы со [ссылкой](https://example.com/{title}).
+
+%table{title} Таблица
+
+| a | b |
+|---|---|
+| 1 | 2 |
+
+{text}
+
+```python
+print("{title}")
+```
+"""
+
+
+def _markdown(titles: list[str], toc: bool) -> str:
+    text = "# *Содержание\n\n[TOC]\n" if toc else ""
+    for i, title in enumerate(titles):
+        text += _CHAPTER.format(title=title, text="Длинный абзац текста. " * 40 * (i + 1))
+    return text
+
+
+class TestParallelRenderer(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        os.environ["WORKING_DIR"] = self._directory.name
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def _convert(self, text: str, jobs: int) -> list[bytes]:
+        """Returns the body elements with the relationships they refer to replaced by their targets"""
+        path = os.path.join(self._directory.name, "input.md")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        converter = Converter(path, None, _TEMPLATE_PATH, jobs=jobs)
+        converter.convert()
+
+        part = converter.document.part
+        elements = []
+        for element in converter.document._body._element:
+            if element.tag == qn("w:sectPr"):
+                continue
+            for node in element.iter(etree.Element):
+                for name in _REFERENCES:
+                    if (r_id := node.get(name)) is not None:
+                        node.set(name, part.rels[r_id].target_ref)
+            elements.append(etree.tostring(element))
+        return elements
+
+    def test_split_chapters(self):
+        document, _, _ = _create_test_document()
+        parser = Parser(document, _markdown(["Первая", "Вторая"], False))
+        chapters = _split_chapters(parser.elements)
+
+        self.assertEqual([None, "Первая", "Вторая"],
+                         [chapter.heading and chapter.heading.children[0].children for chapter in chapters])
+        # the chapters end with the heading of the next one
+        self.assertIs(chapters[1].heading, chapters[0].elements[-1])
+        self.assertIs(chapters[2].heading, chapters[1].elements[-1])
+        self.assertEqual([{}, {}, {"Таблица": 1, "Листинг": 1}], [chapter.numbers for chapter in chapters])
+        self.assertEqual(parser.elements, [element for chapter in chapters for element in chapter.elements])
+
+    def test_same_as_renderer(self):
+        text = _markdown(["Первая", "Вторая", "Третья", "Четвертая"], True)
+        self.assertEqual(self._convert(text, 1), self._convert(text, 2))
+
+    def test_chapter_on_first_page(self):
+        # the first chapter doesn't start a new page, so the next one is laid out again
+        text = _markdown(["Первая", "Вторая", "Третья"], False)
+        self.assertEqual(self._convert(text, 1), self._convert(text, 2))
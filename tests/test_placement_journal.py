@@ -0,0 +1,104 @@
+import os
+import tempfile
+import unittest
+
+from docx.oxml.ns import qn
+from docx.shared import Mm
+
+from md2gost.parser_ import Parser
+from md2gost.placement_journal import PlacementJournal
+from md2gost.renderable.heading import Heading
+from md2gost.renderer import Renderer
+from md2gost.template_cache import load_template
+
+from . import _create_test_document
+
+_TEMPLATE_PATH = os.path.join(os.path.dirname(__file__), "..", "md2gost", "Template.docx")
+
+_TEXT = """
+# Первая глава
+
+""" + "Длинный абзац текста. " * 300 + """
+
+%table1 Таблица
+
+| a | b |
+|---|---|
+| 1 | 2 |
+
+# Вторая глава
+
+Текст.
+"""
+
+
+class TestPlacementJournal(unittest.TestCase):
+    def setUp(self):
+        document, _, _ = _create_test_document()
+        self._journal = PlacementJournal(Mm(100))
+        # two elements on the first page, one spanning the second and the third and one on the third
+        for i, (height, page, offset, numbering) in enumerate((
+                (Mm(30), 1, 0, None), (Mm(70), 1, Mm(30), ("Таблица", 1)),
+                (Mm(150), 2, 0, ("Таблица", 2)), (Mm(10), 3, Mm(50), None))):
+            self._journal.append(document.add_paragraph(), i, height, page, offset, numbering)
+
+    def test_on_page(self):
+        self.assertEqual(range(0, 2), self._journal.on_page(1))
+        self.assertEqual(range(2, 3), self._journal.on_page(2))
+        self.assertEqual(range(4, 4), self._journal.on_page(4))
+
+    def test_at(self):
+        self.assertEqual(0, self._journal.at(1, 0))
+        self.assertEqual(1, self._journal.at(1, Mm(30)))
+        self.assertEqual(2, self._journal.at(3, Mm(20)))
+        self.assertEqual(3, self._journal.at(3, Mm(55)))
+        self.assertIsNone(self._journal.at(3, Mm(60)))
+
+    def test_last_page(self):
+        self.assertEqual(1, self._journal.last_page(1))
+        self.assertEqual(3, self._journal.last_page(2))
+
+    def test_numbering(self):
+        self.assertIsNone(self._journal.numbering(0))
+        self.assertEqual(("Таблица", 2), self._journal.numbering(2))
+        self.assertEqual(2, self._journal.find("Таблица", 2))
+        self.assertIsNone(self._journal.find("Рисунок", 1))
+
+    def test_to_json(self):
+        data = self._journal.to_json()
+        self.assertEqual([0, 1, 2, 3], data["id"])
+        self.assertEqual([1, 1, 2, 3], data["page"])
+        self.assertEqual([None, "Таблица", "Таблица", None], data["category"])
+        self.assertEqual([0, 1, 2, 0], data["number"])
+
+
+class TestRendererPlacements(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        os.environ["WORKING_DIR"] = self._directory.name
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def test_placements(self):
+        document = load_template(_TEMPLATE_PATH)
+        renderables = list(Parser(document, _TEXT).parse())
+        renderer = Renderer(document)
+        renderer.process(renderables)
+        placements = renderer.placements
+
+        self.assertEqual(len(document._body._element) - 1, len(placements))  # but sectPr
+        # every element of the body but sectPr, in the order they are laid out
+        body = document._body._element
+        ids = [placements.id(i) for i in range(len(placements))]
+        self.assertEqual([i for i, element in enumerate(body) if element.tag != qn("w:sectPr")], ids)
+        self.assertEqual([placements.kind(i) == "table" for i in range(len(placements))],
+                         [body[i].tag == qn("w:tbl") for i in ids])
+        headings = [renderable for renderable in renderables if isinstance(renderable, Heading)]
+        self.assertEqual([heading.rendered_page for heading in headings],
+                         [placements.last_page(i) for i in range(len(placements))
+                          if placements.kind(i) == "heading"])
+        # the caption and the table
+        table = placements.find("Таблица", 1)
+        self.assertEqual(["paragraph", "table"], [placements.kind(table), placements.kind(table + 1)])
+        self.assertEqual(("Таблица", 1), placements.numbering(table + 1))
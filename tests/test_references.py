@@ -0,0 +1,107 @@
+import os
+import tempfile
+import unittest
+
+from md2gost.parser_ import Parser
+from md2gost.renderer import Renderer
+from md2gost.template_cache import load_template
+
+_TEMPLATE_PATH = os.path.join(os.path.dirname(__file__), "..", "md2gost", "Template.docx")
+
+_TEXT = """
+Таблицы @Таблица:second и @Таблица:first.
+
+%first Первая таблица
+
+| a | b |
+|---|---|
+| 1 | 2 |
+
+%second Вторая таблица
+
+| a | b |
+|---|---|
+| см. @Таблица:first | 2 |
+
+%code Листинг
+
+```python
+print()
+```
+
+- листинг @Листинг:code
+- таблица @Таблица:second
+"""
+
+
+class _UnestimatedParser(Parser):
+    """Expects no numbers of the labeled elements, so the forward references are written after the layout"""
+    @property
+    def label_numbers(self):
+        return {}
+
+
+class TestReferences(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        os.environ["WORKING_DIR"] = self._directory.name
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def _convert(self, text: str, parser_class: type[Parser] = Parser) -> list[str]:
+        document = load_template(_TEMPLATE_PATH)
+        parser = parser_class(document, text)
+        Renderer(document).process(parser.parse(), parser)
+        return [paragraph.text for paragraph in document.paragraphs] \
+            + [cell.text for table in document.tables for row in table.rows for cell in row.cells]
+
+    def test_label_numbers(self):
+        document = load_template(_TEMPLATE_PATH)
+        self.assertEqual({"first": ("Таблица", 1), "second": ("Таблица", 2), "code": ("Листинг", 1)},
+                         Parser(document, _TEXT).label_numbers)
+
+    def test_references_are_resolved(self):
+        for parser_class in (Parser, _UnestimatedParser):
+            with self.subTest(parser_class.__name__):
+                texts = self._convert(_TEXT, parser_class)
+                # forward references
+                self.assertIn("Таблицы 2 и 1.", texts)
+                # backward references in a list and a table
+                self.assertIn("листинг 1", "\n".join(texts))
+                self.assertIn("таблица 2", "\n".join(texts))
+                self.assertIn("см. 1", texts)
+
+    def test_unknown_label(self):
+        with self.assertLogs(level="WARNING") as logs:
+            texts = self._convert("Таблица @Таблица:missing.\n")
+        self.assertIn("Таблица ?.", texts)
+        self.assertIn("missing", logs.output[0])
+
+    def test_wrong_type(self):
+        text = "Таблицы @Таблица:image и @Таблица:table.\n\n![](image.png \"%image Рисунок\")\n\n" \
+               "%table Таблица\n\n| a |\n|---|\n| 1 |\n\nТаблица @Рисунок:table.\n"
+        for parser_class in (Parser, _UnestimatedParser):
+            with self.subTest(parser_class.__name__), self.assertLogs(level="WARNING") as logs:
+                texts = self._convert(text, parser_class)
+                self.assertIn("Таблицы ? и 1.", texts)
+                self.assertIn("Таблица ?.", texts)
+                self.assertEqual(2, sum("labels" in output for output in logs.output))
+
+    def test_references_in_links_and_emphasis(self):
+        text = "[Таблица @Таблица:table](https://example.com), **@Таблица:table**, *~~@Таблица:table~~*.\n\n" \
+               "%table Таблица\n\n| a |\n|---|\n| 1 |\n"
+        for parser_class in (Parser, _UnestimatedParser):
+            with self.subTest(parser_class.__name__):
+                document = load_template(_TEMPLATE_PATH)
+                parser = parser_class(document, text)
+                Renderer(document).process(parser.parse(), parser)
+
+                runs = document.paragraphs[0].runs
+                self.assertEqual(", 1, 1.", "".join(run.text for run in runs))
+                self.assertEqual([True, None], [runs[1].bold, runs[1].italic])
+                self.assertEqual([None, True, True], [runs[3].bold, runs[3].italic, runs[3].font.strike])
+                link_runs = document.paragraphs[0]._p.xpath("w:hyperlink/w:r")
+                self.assertEqual(["Таблица ", "1"], [run.xpath("string(w:t)") for run in link_runs])
+                self.assertEqual(["Hyperlink", "Hyperlink"], [run.xpath("string(w:rPr/w:rStyle/@w:val)")
+                                                              for run in link_runs])
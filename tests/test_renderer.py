@@ -0,0 +1,87 @@
+import gc
+import os
+import tempfile
+import unittest
+import weakref
+
+from md2gost.parser_ import Parser
+from md2gost.renderable.toc import ToC
+from md2gost.renderer import Renderer
+from md2gost.template_cache import load_template
+
+_TEMPLATE_PATH = os.path.join(os.path.dirname(__file__), "..", "md2gost", "Template.docx")
+
+_TEXT = """
+# *Содержание
+
+[TOC]
+
+# Первая глава
+
+Текст.
+
+# Вторая глава
+
+Текст.
+"""
+
+# the table of contents of the chapters takes a few pages
+_LONG_TEXT = "# *Содержание\n\n[TOC]\n\n" + "".join(f"# Глава {i}\n\nТекст.\n\n" for i in range(1, 81))
+
+
+class _UnestimatedParser(Parser):
+    """Reserves no lines for the table of contents, so it's laid out again"""
+    def estimate_toc(self):
+        return []
+
+
+class TestRenderer(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        os.environ["WORKING_DIR"] = self._directory.name
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def test_renderables_are_freed(self):
+        document = load_template(_TEMPLATE_PATH)
+        references = []
+
+        def renderables():
+            # the table of contents is kept to be filled after the layout
+            for renderable in Parser(document, _TEXT).parse():
+                if not isinstance(renderable, ToC):
+                    references.append(weakref.ref(renderable))
+                yield renderable
+
+        Renderer(document).process(renderables())
+        gc.collect()
+        self.assertTrue(references)
+        self.assertEqual([], [reference for reference in references if reference() is not None])
+
+    def test_toc_is_filled(self):
+        document = load_template(_TEMPLATE_PATH)
+        renderer = Renderer(document)
+        renderer.process(Parser(document, _TEXT).parse())
+
+        text = "\n".join(paragraph.text for paragraph in document.paragraphs)
+        # the headings and the items of the table of contents
+        self.assertEqual(2, text.count("Первая глава"))
+        self.assertEqual(2, text.count("Вторая глава"))
+
+    def _placements(self, parser_class: type[Parser]) -> dict:
+        document = load_template(_TEMPLATE_PATH)
+        parser = parser_class(document, _LONG_TEXT)
+        renderer = Renderer(document)
+        renderer.process(parser.parse(), parser)
+        return renderer.placements.to_json()
+
+    def test_toc_reserves_its_lines(self):
+        placements = self._placements(Parser)
+        # the heading of the table of contents, its paragraph, the page break and the first chapter
+        toc_pages = placements["page"][2] - placements["page"][1] + 1
+        self.assertGreater(toc_pages, 1)
+        self.assertEqual(placements["page"][1] + toc_pages, placements["page"][3])
+
+    def test_toc_pages_converge(self):
+        self.assertEqual(self._placements(Parser), self._placements(_UnestimatedParser))
@@ -0,0 +1,119 @@
+import unittest
+
+from docx.enum.style import WD_STYLE_TYPE
+from docx.enum.text import WD_LINE_SPACING
+from docx.oxml import OxmlElement
+from docx.shared import Pt
+
+from md2gost.renderable.style_resolver import ResolvedFont, StyleResolver, get_style_resolver
+
+from . import _create_test_document
+
+
+class TestStyleResolver(unittest.TestCase):
+    def setUp(self):
+        self._document, self._max_height, self._max_width = _create_test_document()
+        self._resolver = StyleResolver(self._document.styles.element)
+
+    def test_paragraph_font(self):
+        paragraph = self._document.add_paragraph()
+        self.assertEqual(ResolvedFont("Times New Roman", None, None, Pt(14)),
+                         self._resolver.paragraph_font(paragraph))
+
+    def test_base_style(self):
+        self._document.styles["Code"].base_style = self._document.styles["Normal"]
+        self._document.styles["Code"].font.name = None
+        paragraph = self._document.add_paragraph(style="Code")
+
+        self.assertEqual(ResolvedFont("Times New Roman", None, None, Pt(12)),
+                         self._resolver.paragraph_font(paragraph))
+
+    def test_paragraph_format(self):
+        paragraph = self._document.add_paragraph(style="Code")
+        paragraph_format = self._resolver.paragraph_format(paragraph)
+
+        self.assertEqual(0, paragraph_format.first_line_indent)
+        self.assertEqual(0, paragraph_format.space_after)
+        self.assertEqual(1, paragraph_format.line_spacing)
+        self.assertEqual(WD_LINE_SPACING.SINGLE, paragraph_format.line_spacing_rule)
+        self.assertFalse(paragraph_format.contextual_spacing)
+
+    def test_direct_formatting(self):
+        paragraph = self._document.add_paragraph()
+        paragraph.paragraph_format.left_indent = Pt(20)
+        plain_paragraph = self._document.add_paragraph()
+
+        self.assertEqual(Pt(20), self._resolver.paragraph_format(paragraph).left_indent)
+        self.assertEqual(self._document.styles["Normal"].paragraph_format.first_line_indent,
+                         self._resolver.paragraph_format(paragraph).first_line_indent)
+        self.assertIsNone(self._resolver.paragraph_format(plain_paragraph).left_indent)
+
+    def test_contextual_spacing(self):
+        paragraph = self._document.add_paragraph()
+        paragraph.paragraph_format._element.get_or_add_pPr().append(OxmlElement("w:contextualSpacing"))
+
+        self.assertTrue(self._resolver.paragraph_format(paragraph).contextual_spacing)
+
+    def test_run_font(self):
+        paragraph = self._document.add_paragraph()
+        run = paragraph.add_run("bold")
+        run.bold = True
+        paragraph_font = self._resolver.paragraph_font(paragraph)
+
+        self.assertEqual(ResolvedFont("Times New Roman", True, None, Pt(14)),
+                         self._resolver.run_font(paragraph_font, run._r.rPr))
+        self.assertIs(paragraph_font, self._resolver.run_font(paragraph_font, None))
+
+    def test_unknown_style(self):
+        paragraph = self._document.add_paragraph()
+        paragraph._p.style = "Unknown"
+
+        self.assertEqual("Normal", self._resolver.paragraph_style_id(paragraph))
+
+    def test_get_style_id(self):
+        self.assertEqual(self._document.styles["Code"].style_id,
+                         self._resolver.get_style_id("Code", WD_STYLE_TYPE.PARAGRAPH))
+        self.assertEqual(self._document.styles["Heading 1"].style_id,
+                         self._resolver.get_style_id("heading 1", WD_STYLE_TYPE.PARAGRAPH))
+        # the default style is not referenced, like python-docx does
+        self.assertIsNone(self._resolver.get_style_id("Normal", WD_STYLE_TYPE.PARAGRAPH))
+
+    def test_get_style_id_errors(self):
+        with self.assertRaises(KeyError):
+            self._resolver.get_style_id("Unknown", WD_STYLE_TYPE.PARAGRAPH)
+        with self.assertRaises(ValueError):
+            self._resolver.get_style_id("Table Grid", WD_STYLE_TYPE.PARAGRAPH)
+
+    def test_set_paragraph_style(self):
+        paragraph = self._document.add_paragraph()
+        expected = self._document.add_paragraph()
+        self._resolver.set_paragraph_style(paragraph, "Code")
+        expected.style = "Code"
+
+        self.assertEqual(expected._p.style, paragraph._p.style)
+        self.assertEqual("Code", paragraph.style.name)
+
+    def test_invalidate(self):
+        paragraph = self._document.add_paragraph()
+        self._resolver.paragraph_font(paragraph)
+        self._document.styles["Normal"].font.size = Pt(12)
+
+        self.assertEqual(Pt(14), self._resolver.paragraph_font(paragraph).size)
+        self._resolver.invalidate()
+        self.assertEqual(Pt(12), self._resolver.paragraph_font(paragraph).size)
+
+    def test_added_style(self):
+        paragraph = self._document.add_paragraph()
+        self._resolver.paragraph_font(paragraph)
+        style = self._document.styles.add_style("Added", WD_STYLE_TYPE.PARAGRAPH)
+        style.base_style = self._document.styles["Code"]
+        style.font.bold = True
+
+        self._resolver.set_paragraph_style(paragraph, "Added")
+        self.assertEqual(style.style_id, self._resolver.paragraph_style_id(paragraph))
+        self.assertEqual(ResolvedFont("Courier New", True, None, Pt(12)), self._resolver.paragraph_font(paragraph))
+
+    def test_resolver_per_document(self):
+        document, _, _ = _create_test_document()
+        self.assertIs(get_style_resolver(self._document.part), get_style_resolver(self._document.part))
+        self.assertIsNot(get_style_resolver(self._document.part), get_style_resolver(document.part))
@@ -0,0 +1,54 @@
+import os
+import unittest
+
+from docx.oxml.ns import qn
+
+from md2gost.layout_tracker import LayoutTracker
+from md2gost.renderable.table import Table
+from md2gost.renderer import BOTTOM_MARGIN
+from md2gost.renderable.template_profile import get_template_profile
+from md2gost.template_cache import load_template
+
+_TEMPLATE_PATH = os.path.join(os.path.dirname(__file__), "..", "md2gost", "Template.docx")
+
+
+class TestTable(unittest.TestCase):
+    def setUp(self):
+        self._document = load_template(_TEMPLATE_PATH)
+        profile = get_template_profile(self._document.part)
+        self._layout_tracker = LayoutTracker(profile.page_height - profile.top_margin - BOTTOM_MARGIN,
+                                             profile.text_width)
+
+    def _table(self, rows: int) -> Table:
+        table = Table(self._document._body, rows, 2, None)
+        table.set_number(1)
+        for row in range(rows):
+            for col in range(2):
+                table.add_paragraph_to_cell(row, col).add_run(f"cell {row} {col}")
+        return table
+
+    def test_measure_splits_rows(self):
+        table = self._table(40)
+        layout_state = self._layout_tracker.current_state
+        layout_state.add_height(layout_state.max_height / 2)
+        plan = table.measure(None, layout_state)
+
+        texts = [info.docx_element.text for info in plan.items if info.docx_element is not None]
+        self.assertIn("Продолжение таблицы", texts)
+        # the tables are created once the plan is committed
+        self.assertEqual(2, sum(info.docx_element is None for info in plan.items))
+        self.assertEqual(2, len(plan.parts))
+        self.assertEqual(layout_state.max_height / 2, layout_state.current_page_height)
+
+        items = table.commit(plan)
+        self.assertEqual([info.height for info in plan.items], [info.height for info in items])
+        tables = [info.docx_element for info in items if info.docx_element._element.tag == qn("w:tbl")]
+        rows = [len(docx_table.rows) for docx_table in tables]
+        self.assertEqual(40, sum(rows))
+        self.assertEqual(plan.parts[1], rows[0])
+        self.assertEqual(["cell 39 0", "cell 39 1"], [cell.text for cell in tables[-1].rows[-1].cells])
+
+    def test_render(self):
+        items = list(self._table(3).render(None, self._layout_tracker.current_state))
+        self.assertEqual([qn("w:p"), qn("w:tbl")], [info.docx_element._element.tag for info in items])
+        self.assertEqual(3, len(items[1].docx_element.rows))
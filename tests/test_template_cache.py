@@ -0,0 +1,64 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+from unittest.mock import patch
+
+import docx
+from docx.shared import Cm
+
+from md2gost.renderable.template_profile import get_template_profile
+from md2gost.template_cache import load_template
+
+_TEMPLATE_PATH = os.path.join(os.path.dirname(__file__), "..", "md2gost", "Template.docx")
+
+
+def _parts(document) -> dict[str, bytes]:
+    stream = io.BytesIO()
+    document.save(stream)
+    with zipfile.ZipFile(stream) as package:
+        return {name: package.read(name) for name in package.namelist()}
+
+
+class TestTemplateCache(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self._environ = patch.dict(os.environ, {"XDG_CACHE_HOME": self._directory.name})
+        self._environ.start()
+
+    def tearDown(self):
+        self._environ.stop()
+        self._directory.cleanup()
+
+    def test_same_as_loaded(self):
+        document = docx.Document(_TEMPLATE_PATH)
+        document._body.clear_content()
+
+        self.assertEqual(_parts(document), _parts(load_template(_TEMPLATE_PATH)))
+
+    def test_independent(self):
+        document = load_template(_TEMPLATE_PATH)
+        other = load_template(_TEMPLATE_PATH)
+        document.add_paragraph("text")
+        document.styles["Normal"].font.size = None
+
+        self.assertEqual(0, len(other.paragraphs))
+        self.assertIsNotNone(other.styles["Normal"].font.size)
+        self.assertIsNot(document.part.package, other.part.package)
+
+    def test_profile(self):
+        document = load_template(_TEMPLATE_PATH)
+        self.assertIs(get_template_profile(document.part), get_template_profile(load_template(_TEMPLATE_PATH).part))
+
+    def test_reloaded_when_changed(self):
+        path = os.path.join(self._directory.name, "template.docx")
+        shutil.copy(_TEMPLATE_PATH, path)
+        load_template(path)
+
+        document = docx.Document(path)
+        document.sections[0].left_margin = Cm(5)
+        document.save(path)
+
+        self.assertEqual(docx.Document(path).sections[0].left_margin, load_template(path).sections[0].left_margin)
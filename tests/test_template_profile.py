@@ -0,0 +1,67 @@
+import os
+import pickle
+import tempfile
+import unittest
+
+import docx
+
+from md2gost.renderable.style_resolver import StyleResolver
+from md2gost.renderable.template_profile import TemplateProfile, get_template_profile, load_template_profile
+from md2gost.util import create_element
+
+from . import _create_test_document
+
+class TestTemplateProfile(unittest.TestCase):
+    def setUp(self):
+        self._document, self._max_height, self._max_width = _create_test_document()
+        self._directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def test_geometry(self):
+        profile = get_template_profile(self._document.part)
+        section = self._document.sections[0]
+
+        self.assertEqual(section.page_height, profile.page_height)
+        self.assertEqual(section.page_width - section.left_margin - section.right_margin, profile.text_width)
+
+    def test_resolved_styles(self):
+        profile = get_template_profile(self._document.part)
+        style_resolver = StyleResolver(self._document.styles.element)
+        style_id = self._document.styles["Code"].style_id
+
+        self.assertEqual(style_resolver.style_font(style_id), profile.style_fonts[style_id])
+        self.assertEqual(style_resolver.style_paragraph_format(style_id), profile.style_paragraph_formats[style_id])
+        self.assertIn("Courier New", profile.font_names)
+
+    def test_font_names(self):
+        self._document.styles["Normal"].font.element.get_or_add_rPr().append(
+            create_element("w:rFonts", {"w:hAnsi": "Arial", "w:cs": "Tahoma"}))
+        profile = TemplateProfile.compute(self._document, "digest")
+        self.assertTrue({"Arial", "Tahoma"} <= set(profile.font_names))
+        # referred to through the minor font of the theme
+        self.assertIn("Cambria", profile.font_names)
+
+    def test_json(self):
+        profile = get_template_profile(self._document.part)
+        self.assertEqual(profile, TemplateProfile.from_json(profile.to_json()))
+
+    def test_pickle(self):
+        # the fonts of the styles are in the keys of the lines the measurement workers send back
+        profile = TemplateProfile.compute(self._document, "digest")
+        self.assertEqual(profile.style_fonts, pickle.loads(pickle.dumps(profile.style_fonts)))
+
+    def test_saved(self):
+        # a template no other test has loaded, so its profile is not in memory yet
+        path = os.path.join(self._directory.name, "template.docx")
+        self._document.save(path)
+        profiles_path = os.path.join(self._directory.name, "profiles")
+
+        document = docx.Document(path)
+        profile = load_template_profile(document, path, profiles_path)
+
+        self.assertIs(profile, get_template_profile(document.part))
+        self.assertEqual([f"{profile.digest}.json"], os.listdir(profiles_path))
+        with open(os.path.join(profiles_path, f"{profile.digest}.json"), encoding="utf-8") as f:
+            self.assertEqual(profile, TemplateProfile.from_json(f.read()))
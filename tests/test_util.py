@@ -0,0 +1,95 @@
+import itertools
+import os
+import unittest
+from unittest.mock import patch
+
+from docx.shared import RGBColor
+from lxml import etree
+
+from md2gost.renderable.paragraph import Paragraph
+from md2gost.template_cache import load_template
+from md2gost.util import cache_dir, create_element, create_run
+
+_TEMPLATE_PATH = os.path.join(os.path.dirname(__file__), "..", "md2gost", "Template.docx")
+
+_TEXTS = ["text", " leading", "trailing ", " both ", "two  spaces", "tab\there", "\ttab", "line\nbreak",
+          "line\r\nbreak", "tab\tand\nbreak ", " ", ""]
+_VALUES = [None, True, False]
+_COLORS = [None, RGBColor.from_string("FF0000")]
+
+
+def _xml(element) -> bytes:
+    # the namespaces the element inherits from the document are left out
+    return etree.tostring(element, method="c14n", exclusive=True)
+
+
+class TestCreateRun(unittest.TestCase):
+    def setUp(self):
+        self._document = load_template(_TEMPLATE_PATH)
+        self._paragraph = self._document.add_paragraph()
+
+    def _docx_run(self, text: str, style: str | None, bold: bool | None, italic: bool | None,
+                  color: RGBColor | None, strike: bool | None):
+        """The run made with the python-docx setters, without the empty rPr they leave"""
+        run = self._paragraph.add_run(text, style)
+        run.bold = bold
+        run.italic = italic
+        run.font.color.rgb = color
+        run.font.strike = strike
+        if run._r.rPr is not None and len(run._r.rPr) == 0:
+            run._r.remove(run._r.rPr)
+        return run._r
+
+    def test_same_as_python_docx(self):
+        for text, style, bold, italic, color, strike in itertools.product(
+                _TEXTS, [None, "Hyperlink"], _VALUES, _VALUES, _COLORS, _VALUES):
+            with self.subTest(text=text, style=style, bold=bold, italic=italic, color=color, strike=strike):
+                expected = self._docx_run(text, style, bold, italic, color, strike)
+                style_id = self._document.styles[style].style_id if style else None
+                self.assertEqual(_xml(expected), _xml(create_run(text, style_id, bold, italic, color, strike)))
+
+    def test_runs_are_independent(self):
+        first = create_run("first", None, True)
+        second = create_run("second", None, True)
+        first.rPr.remove(first.rPr[0])
+        self.assertEqual("second", second.text)
+        self.assertEqual(1, len(second.rPr))
+
+
+class TestLink(unittest.TestCase):
+    def setUp(self):
+        self._document = load_template(_TEMPLATE_PATH)
+
+    def test_add_run_hyphens(self):
+        paragraph = self._document.add_paragraph()
+        link = Paragraph(self._document._body).add_link("https://example.com/a-b")
+        for text, bold, italic, color, strike in itertools.product(
+                ["a-b", "-leading", "trailing-", "a--b", " a - b "], _VALUES, _VALUES, _COLORS, _VALUES):
+            with self.subTest(text=text, bold=bold, italic=italic, color=color, strike=strike):
+                del link.element[:]
+                link.add_run(text, bold, italic, color, strike)
+
+                expected = []
+                for i, part in enumerate(text.split("-")):
+                    if i:
+                        expected.append(create_element("w:r", [create_element("w:noBreakHyphen")]))
+                    run = paragraph.add_run(part, "Hyperlink")
+                    run.bold = bold
+                    run.italic = italic
+                    run.font.color.rgb = color
+                    run.font.strike = strike
+                    expected.append(run._r)
+                self.assertEqual([_xml(run) for run in expected], [_xml(run) for run in link.element])
+                self.assertEqual(text, "".join("-" if run.xpath("w:noBreakHyphen") else run.text
+                                               for run in link.element))
+
+
+class TestCacheDir(unittest.TestCase):
+    def test_xdg_cache_home(self):
+        with patch.dict(os.environ, {"XDG_CACHE_HOME": "/cache"}):
+            self.assertEqual(os.path.join("/cache", "md2gost", "layouts", "a.json"), cache_dir("layouts", "a.json"))
+
+    def test_default(self):
+        with patch.dict(os.environ, {"HOME": "/home/user"}):
+            os.environ.pop("XDG_CACHE_HOME", None)
+            self.assertEqual(os.path.join("/home/user", ".cache", "md2gost"), cache_dir())